@@ -1,4 +1,4 @@
-from typing import Dict, Iterable, List, Union
+from typing import Dict, Iterable, List, Tuple, Union
 
 import numpy as np
 import numpy.typing as npt
@@ -10,8 +10,16 @@ ActionType = Union[
     List[Union[int, float]],
     Dict[str, Union[int, float]],
     npt.NDArray[Union[np.float64, np.int64]],
+    # (continuous, discrete) parts of a `HybridAction`
+    Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]],
 ]
 
+# pystk.Action fields, the columns of a batch of actions of every action class
+ACTIONS = ["acceleration", "brake", "steer", "fire", "drift", "nitro", "rescue"]
+# the on/off fields
+BINARY_ACTIONS = ["brake", "fire", "drift", "nitro", "rescue"]
+_BINARY = np.isin(ACTIONS, BINARY_ACTIONS)
+
 
 def get_stk_action_obj(
     action_names: Iterable[str], actions_values: Iterable[Union[int, float]]
@@ -29,12 +37,47 @@ def get_stk_action_obj(
 
     for name, action in zip(action_names, actions_values):
         if name == "steer":
-            setattr(current_action, name, action - 1)
+            action = action - 1
         setattr(current_action, name, action)
 
     return current_action
 
 
+def get_stk_action_objs(values: npt.NDArray[np.float64]) -> List[pystk.Action]:
+    """
+    Returns one pystk.Action object per row of `values`, which are already in pystk's ranges.
+
+    :param values: array of shape (num_agents, len(ACTIONS)), columns in `ACTIONS` order
+    """
+    values = np.asarray(values, dtype=np.float64)
+    assert values.ndim == 2 and values.shape[1] == len(ACTIONS)
+    # python scalars per column, setting them is the only per agent work left
+    columns = [
+        (name, (values[:, i] > 0.5).tolist() if binary else values[:, i].tolist())
+        for i, (name, binary) in enumerate(zip(ACTIONS, _BINARY))
+    ]
+    current_actions = [pystk.Action() for _ in range(len(values))]
+    for name, column in columns:
+        for current_action, value in zip(current_actions, column):
+            setattr(current_action, name, value)
+    return current_actions
+
+
+def _dict_to_row(actions: Dict[str, Union[int, float]]) -> npt.NDArray[np.float64]:
+    """A batch of one action from a dict, the fields that aren't given keep pystk's default."""
+    values = np.zeros((1, len(ACTIONS)), dtype=np.float64)
+    for name, value in actions.items():
+        values[0, ACTIONS.index(name)] = value
+    return values
+
+
+def clip_actions(
+    values: npt.ArrayLike, low: npt.NDArray[np.float32], high: npt.NDArray[np.float32]
+) -> npt.NDArray[np.float64]:
+    """Clips a batch of actions, (num_agents, len(ACTIONS)), to the bounds of every column."""
+    return np.clip(np.asarray(values, dtype=np.float64), low, high)
+
+
 class MultiDiscreteAction:
     """
     A dynamic user-defined MultiDiscrete action space.
@@ -52,7 +95,7 @@ class MultiDiscreteAction:
     -----------------------------------------------------------------
     """
 
-    ACTIONS = ["acceleration", "brake", "steer", "fire", "drift", "nitro", "rescue"]
+    ACTIONS = ACTIONS
 
     def __init__(self):
         self.action_space = spaces.MultiDiscrete([2, 2, 3, 2, 2, 2, 2])
@@ -90,6 +133,155 @@ class MultiDiscreteAction:
             return actions
         raise NotImplementedError
 
+    def get_pystk_actions(
+        self, actions: npt.NDArray[Union[np.float64, np.int64]]
+    ) -> List[pystk.Action]:
+        """
+        Converts a batch of actions, one row per agent, to a list of pystk.Action objects.
+
+        :param actions: array of shape (num_agents, len(ACTIONS))
+        """
+        actions = np.array(actions, dtype=np.float64)
+        assert actions.ndim == 2 and actions.shape[1] == len(MultiDiscreteAction.ACTIONS)
+        actions[:, ACTIONS.index("steer")] -= 1
+        return get_stk_action_objs(actions)
+
     def space(self) -> spaces.MultiDiscrete:
         """The action space."""
         return self.action_space
+
+
+class ContinuousAction:
+    """
+    A Box action space, smooth steering and acceleration with coarser env steps.
+
+    -----------------------------------------------------------------
+    |         ACTIONS               |       POSSIBLE VALUES         |
+    -----------------------------------------------------------------
+    |       Acceleration            |          [0, 1]               |
+    |       Brake                   |          [0, 1], on over 0.5  |
+    |       Steer                   |         [-1, 1]               |
+    |       Fire                    |          [0, 1], on over 0.5  |
+    |       Drift                   |          [0, 1], on over 0.5  |
+    |       Nitro                   |          [0, 1], on over 0.5  |
+    |       Rescue                  |          [0, 1], on over 0.5  |
+    -----------------------------------------------------------------
+
+    Values out of the bounds (e.g. from an unsquashed gaussian policy) are clipped.
+    """
+
+    ACTIONS = ACTIONS
+
+    def __init__(self):
+        self.low = np.array([0, 0, -1, 0, 0, 0, 0], dtype=np.float32)
+        self.high = np.ones(len(ACTIONS), dtype=np.float32)
+        self.action_space = spaces.Box(self.low, self.high, dtype=np.float32)
+
+    def get_pystk_action(self, actions: ActionType) -> pystk.Action:
+        if isinstance(actions, pystk.Action):
+            return actions
+        if isinstance(actions, dict):
+            return self.get_pystk_actions(_dict_to_row(actions))[0]
+        if isinstance(actions, (list, np.ndarray)):
+            return self.get_pystk_actions(np.asarray(actions)[None])[0]
+        raise NotImplementedError
+
+    def get_pystk_actions(
+        self, actions: npt.NDArray[Union[np.float32, np.float64]]
+    ) -> List[pystk.Action]:
+        """
+        Converts a batch of actions, one row per agent, to a list of pystk.Action objects.
+
+        :param actions: array of shape (num_agents, len(ACTIONS))
+        """
+        return get_stk_action_objs(clip_actions(actions, self.low, self.high))
+
+    def space(self) -> spaces.Box:
+        """The action space."""
+        return self.action_space
+
+
+class HybridAction:
+    """
+    Continuous steering and acceleration, on/off brake, fire, drift, nitro and rescue.
+
+    -----------------------------------------------------------------
+    |         ACTIONS               |       POSSIBLE VALUES         |
+    -----------------------------------------------------------------
+    |       Acceleration            |          [0, 1]               |
+    |       Steer                   |         [-1, 1]               |
+    -----------------------------------------------------------------
+    |       Brake                   |           (0, 1)              |
+    |       Fire                    |           (0, 1)              |
+    |       Drift                   |           (0, 1)              |
+    |       Nitro                   |           (0, 1)              |
+    |       Rescue                  |           (0, 1)              |
+    -----------------------------------------------------------------
+
+    The space is a Tuple of the continuous and the discrete part. Batches (for `step_batch`
+    and the pools) are arrays of shape (num_agents, len(ACTIONS)) like for the other action
+    classes, or a tuple of the two parts of shapes (num_agents, 2) and (num_agents, 5).
+    """
+
+    ACTIONS = ACTIONS
+    CONTINUOUS_ACTIONS = ["acceleration", "steer"]
+    DISCRETE_ACTIONS = BINARY_ACTIONS
+
+    def __init__(self):
+        self.low = np.array([0, 0, -1, 0, 0, 0, 0], dtype=np.float32)
+        self.high = np.ones(len(ACTIONS), dtype=np.float32)
+        continuous = [ACTIONS.index(name) for name in HybridAction.CONTINUOUS_ACTIONS]
+        discrete = [ACTIONS.index(name) for name in HybridAction.DISCRETE_ACTIONS]
+        self._columns = np.array(continuous + discrete)
+        self.action_space = spaces.Tuple(
+            (
+                spaces.Box(self.low[continuous], self.high[continuous], dtype=np.float32),
+                spaces.MultiDiscrete([2] * len(discrete)),
+            )
+        )
+
+    def _to_flat(
+        self,
+        actions: Union[
+            npt.NDArray[np.float64], Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]]
+        ],
+    ) -> npt.NDArray[np.float64]:
+        """A batch of actions as one array, columns in `ACTIONS` order."""
+        if not isinstance(actions, tuple):
+            return np.asarray(actions, dtype=np.float64)
+        continuous, discrete = actions
+        values = np.empty((len(continuous), len(ACTIONS)), dtype=np.float64)
+        values[:, self._columns] = np.concatenate((continuous, discrete), axis=1)
+        return values
+
+    def get_pystk_action(self, actions: ActionType) -> pystk.Action:
+        if isinstance(actions, pystk.Action):
+            return actions
+        if isinstance(actions, dict):
+            return self.get_pystk_actions(_dict_to_row(actions))[0]
+        if isinstance(actions, tuple):
+            continuous, discrete = actions
+            return self.get_pystk_actions(
+                (np.asarray(continuous)[None], np.asarray(discrete)[None])
+            )[0]
+        if isinstance(actions, (list, np.ndarray)):
+            return self.get_pystk_actions(np.asarray(actions)[None])[0]
+        raise NotImplementedError
+
+    def get_pystk_actions(
+        self,
+        actions: Union[
+            npt.NDArray[np.float64], Tuple[npt.NDArray[np.float32], npt.NDArray[np.int64]]
+        ],
+    ) -> List[pystk.Action]:
+        """
+        Converts a batch of actions, one row per agent, to a list of pystk.Action objects.
+
+        :param actions: array of shape (num_agents, len(ACTIONS)), or the (continuous,
+            discrete) parts of the actions
+        """
+        return get_stk_action_objs(clip_actions(self._to_flat(actions), self.low, self.high))
+
+    def space(self) -> spaces.Tuple:
+        """The action space."""
+        return self.action_space
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import numpy as np
+import numpy.typing as npt
+
+
+class TrackCoverage:
+    """
+    Where karts go on one track: visits and events counted per path node and on a 2D grid over
+    the track's x/z plane.
+
+    Steps are buffered and binned with `np.bincount` once the buffer is full, so recording a
+    step only copies a few values.
+    """
+
+    EVENTS = ["visits", "off_track", "backward", "no_movement"]
+
+    def __init__(
+        self,
+        track: str,
+        path_nodes: npt.ArrayLike,
+        grid_size: int = 64,
+        buffer_size: int = 4096,
+    ):
+        """
+        :param path_nodes: the track's path nodes in forward order, shape (num_nodes, 2, 3)
+        :param grid_size: number of grid cells along each axis
+        :param buffer_size: number of kart steps binned at once
+        """
+        self.track = track
+        self.path_nodes = np.asarray(path_nodes, dtype=np.float32).reshape(-1, 2, 3)
+        self.grid_size = grid_size
+        self.buffer_size = buffer_size
+
+        xz = self.path_nodes[..., [0, 2]].reshape(-1, 2)
+        margin = 0.05 * (xz.max(axis=0) - xz.min(axis=0)) + 10.0
+        # (min, max) of x and z, the grid covers the path plus a margin for off track karts
+        self.bounds = np.stack((xz.min(axis=0) - margin, xz.max(axis=0) + margin))
+        num_events = len(TrackCoverage.EVENTS)
+        self.node_counts = np.zeros((num_events, len(self.path_nodes)), dtype=np.int64)
+        self.grid_counts = np.zeros((num_events, grid_size, grid_size), dtype=np.int64)
+        self._make_buffers()
+
+    def _make_buffers(self):
+        self._node_idxs = np.empty(self.buffer_size, dtype=np.int64)
+        self._cells = np.empty(self.buffer_size, dtype=np.int64)
+        self._events = np.empty((self.buffer_size, len(TrackCoverage.EVENTS)), dtype=bool)
+        self._count = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # only the counts travel between processes, the buffers are rebuilt
+        self.flush()
+        state = self.__dict__.copy()
+        for name in ("_node_idxs", "_cells", "_events", "_count"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._make_buffers()
+
+    def grid_cells(self, locations: npt.ArrayLike) -> npt.NDArray[np.int64]:
+        """Flat grid cell index (x bin * grid_size + z bin) of every location."""
+        xz = np.asarray(locations, dtype=np.float32).reshape(-1, 3)[:, [0, 2]]
+        scaled = (xz - self.bounds[0]) / (self.bounds[1] - self.bounds[0]) * self.grid_size
+        bins = np.clip(scaled.astype(np.int64), 0, self.grid_size - 1)
+        return bins[:, 0] * self.grid_size + bins[:, 1]
+
+    def record(
+        self,
+        node_idxs: npt.ArrayLike,
+        locations: npt.ArrayLike,
+        events: npt.ArrayLike,
+    ):
+        """
+        :param node_idxs: path node of every kart, in forward order, shape (num_karts,)
+        :param locations: kart locations, shape (num_karts, 3)
+        :param events: off track, backward and no movement flags, shape (num_karts, 3)
+        """
+        node_idxs = np.asarray(node_idxs, dtype=np.int64)
+        num_karts = len(node_idxs)
+        assert num_karts <= self.buffer_size
+        if self._count + num_karts > self.buffer_size:
+            self.flush()
+        rows = slice(self._count, self._count + num_karts)
+        self._node_idxs[rows] = node_idxs
+        self._cells[rows] = self.grid_cells(locations)
+        self._events[rows, 0] = True
+        self._events[rows, 1:] = events
+        self._count += num_karts
+
+    def flush(self):
+        """Bins the buffered steps into the counts."""
+        if self._count == 0:
+            return
+        rows, events = np.nonzero(self._events[: self._count])
+        num_events, num_nodes = self.node_counts.shape
+        num_cells = self.grid_size * self.grid_size
+        self.node_counts += np.bincount(
+            events * num_nodes + self._node_idxs[rows], minlength=num_events * num_nodes
+        ).reshape(self.node_counts.shape)
+        self.grid_counts += np.bincount(
+            events * num_cells + self._cells[rows], minlength=num_events * num_cells
+        ).reshape(self.grid_counts.shape)
+        self._count = 0
+
+    def merge(self, other: TrackCoverage):
+        assert other.track == self.track, f"can't merge {other.track} into {self.track}"
+        assert other.grid_counts.shape == self.grid_counts.shape
+        other.flush()
+        self.node_counts += other.node_counts
+        self.grid_counts += other.grid_counts
+
+    def rates(self, event: str) -> npt.NDArray[np.float64]:
+        """Fraction of the visits of every path node where `event` happened."""
+        self.flush()
+        counts = self.node_counts[TrackCoverage.EVENTS.index(event)]
+        return counts / np.maximum(self.node_counts[0], 1)
+
+
+def _compact(counts: npt.NDArray[np.int64]) -> npt.NDArray:
+    # counts are stored with the smallest unsigned type that holds them
+    return counts.astype(np.min_scalar_type(int(counts.max(initial=0))))
+
+
+class Coverage:
+    """Track coverage of every track an env (or a pool of them) raced on."""
+
+    def __init__(self, grid_size: int = 64):
+        self.grid_size = grid_size
+        self.tracks: Dict[str, TrackCoverage] = {}
+
+    def track(self, track: str, path_nodes: npt.ArrayLike) -> TrackCoverage:
+        """The coverage of `track`, created on first use."""
+        coverage = self.tracks.get(track)
+        if coverage is None:
+            coverage = TrackCoverage(track, path_nodes, self.grid_size)
+            self.tracks[track] = coverage
+        return coverage
+
+    def merge(self, other: Coverage):
+        """Adds the counts of another collector, typically the one of a worker process."""
+        for name, coverage in other.tracks.items():
+            if name in self.tracks:
+                self.tracks[name].merge(coverage)
+            else:
+                self.tracks[name] = TrackCoverage(name, coverage.path_nodes, coverage.grid_size)
+                self.tracks[name].merge(coverage)
+
+    def save(self, path: str):
+        """Writes the counts to a compressed npz file, arrays are keyed by `<track>/<name>`."""
+        arrays = {}
+        for name, coverage in self.tracks.items():
+            coverage.flush()
+            arrays[f"{name}/path_nodes"] = coverage.path_nodes
+            arrays[f"{name}/node_counts"] = _compact(coverage.node_counts)
+            arrays[f"{name}/grid_counts"] = _compact(coverage.grid_counts)
+        np.savez_compressed(path, **arrays)
+
+    @staticmethod
+    def load(path: str) -> Coverage:
+        with np.load(path) as data:
+            names = sorted({key.split("/")[0] for key in data.files})
+            coverage = None
+            for name in names:
+                grid_counts = data[f"{name}/grid_counts"].astype(np.int64)
+                if coverage is None:
+                    coverage = Coverage(grid_counts.shape[-1])
+                track = coverage.track(name, data[f"{name}/path_nodes"])
+                track.node_counts += data[f"{name}/node_counts"]
+                track.grid_counts += grid_counts
+        return Coverage() if coverage is None else coverage
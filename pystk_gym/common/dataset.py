@@ -0,0 +1,334 @@
+"""
+Offline datasets of env steps, written as fixed size shards of memory-mapped `.npy` files and
+streamed back in batches without loading them into RAM.
+
+    writer = DatasetWriter("data/lighthouse", shard_size=4096)
+    obs, _ = env.reset_batch()
+    for _ in range(num_steps):
+        actions = policy(obs)
+        next_obs, rewards, terminated, truncated, _ = env.step_batch(actions)
+        writer.add(obs, actions, rewards, terminated, truncated)
+        obs = env.reset_batch()[0] if not env.agents else next_obs
+    writer.close()
+
+    dataset = ShardDataset("data/lighthouse")
+    for batch in dataset.iter_batches(256, sequence_length=4, seed=0):
+        ...
+"""
+
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+META_FILE = "meta.json"
+# per step arrays of a shard, every one but `episode` has the agent axis after the step axis
+FIELDS = ["obs", "actions", "rewards", "terminated", "truncated", "valid", "episode"]
+
+
+class Batch(NamedTuple):
+    """
+    Arrays of shape (batch_size, ...) for single steps and (batch_size, sequence_length, ...)
+    for sequences, the agent axis is gone: every row is one agent.
+    """
+
+    obs: npt.NDArray[np.uint8]
+    actions: np.ndarray
+    rewards: npt.NDArray[np.float32]
+    terminated: npt.NDArray[np.bool_]
+    truncated: npt.NDArray[np.bool_]
+
+
+class DatasetWriter:
+    """
+    Writes the steps of one env to shards of `shard_size` steps. A shard only becomes visible to
+    `ShardDataset` once it is complete (or the writer is closed), so a dataset can be read while
+    it is being written and survives a crash of the writer, minus the last shard.
+
+    Episodes are tracked like `RaceEnv.agents`: an agent races until it is terminated or
+    truncated, the episode ends once no agent races anymore.
+    """
+
+    def __init__(self, directory: str, shard_size: int = 4096):
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        self._num_shards = len(_shard_dirs(directory))
+        self._episode = _last_episode(directory) + 1
+        self._arrays: Optional[Dict[str, np.memmap]] = None
+        self._racing: Optional[npt.NDArray[np.bool_]] = None
+        self._length = 0
+
+    def _open_shard(self, obs: np.ndarray, actions: np.ndarray):
+        path = os.path.join(self.directory, f"shard_{self._num_shards:05d}")
+        os.makedirs(path, exist_ok=True)
+        num_agents = len(obs)
+        layouts = {
+            "obs": (obs.dtype, obs.shape),
+            "actions": (actions.dtype, actions.shape),
+            "rewards": (np.float32, (num_agents,)),
+            "terminated": (np.bool_, (num_agents,)),
+            "truncated": (np.bool_, (num_agents,)),
+            "valid": (np.bool_, (num_agents,)),
+            "episode": (np.int64, ()),
+        }
+        # the files are sparse until written, a shard that is closed early takes no extra space
+        self._arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"),
+                mode="w+",
+                dtype=dtype,
+                shape=(self.shard_size, *shape),
+            )
+            for name, (dtype, shape) in layouts.items()
+        }
+        self._length = 0
+
+    def _close_shard(self):
+        if self._arrays is None:
+            return
+        for array in self._arrays.values():
+            array.flush()
+        path = os.path.join(self.directory, f"shard_{self._num_shards:05d}")
+        meta = {"length": self._length, "num_agents": int(self._arrays["valid"].shape[1])}
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        self._arrays = None
+        self._num_shards += 1
+
+    def add(
+        self,
+        obs: np.ndarray,
+        actions: np.ndarray,
+        rewards: npt.NDArray[np.float32],
+        terminated: npt.NDArray[np.bool_],
+        truncated: npt.NDArray[np.bool_],
+    ):
+        """
+        :param obs: the observations the actions were taken from, (num_agents, height, width, 3)
+        :param actions: the actions of the step, (num_agents, ...)
+        """
+        obs, actions = np.asarray(obs), np.asarray(actions)
+        if self._arrays is None:
+            self._open_shard(obs, actions)
+        if self._racing is None:
+            self._racing = np.ones(len(obs), dtype=bool)
+        row = self._length
+        self._arrays["obs"][row] = obs
+        self._arrays["actions"][row] = actions
+        self._arrays["rewards"][row] = rewards
+        self._arrays["terminated"][row] = terminated
+        self._arrays["truncated"][row] = truncated
+        self._arrays["valid"][row] = self._racing
+        self._arrays["episode"][row] = self._episode
+        self._length += 1
+
+        self._racing = self._racing & ~(np.asarray(terminated) | np.asarray(truncated))
+        if not self._racing.any():
+            self._racing = None
+            self._episode += 1
+        if self._length == self.shard_size:
+            self._close_shard()
+
+    def close(self):
+        """Completes the current shard, the following steps start a new episode."""
+        if self._arrays is not None and self._length > 0:
+            self._close_shard()
+        self._arrays = None
+        if self._racing is not None:
+            self._racing = None
+            self._episode += 1
+
+
+def _shard_dirs(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("shard_") and os.path.isfile(os.path.join(directory, name, META_FILE))
+    )
+
+
+def _last_episode(directory: str) -> int:
+    shards = _shard_dirs(directory)
+    if not shards:
+        return -1
+    episodes = np.load(os.path.join(shards[-1], "episode.npy"), mmap_mode="r")
+    with open(os.path.join(shards[-1], META_FILE), "r", encoding="utf-8") as file:
+        length = json.load(file)["length"]
+    return int(episodes[length - 1])
+
+
+class Shard:
+    """The memory-mapped arrays of one shard, trimmed to the steps that were written."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        self.length: int = meta["length"]
+        self.num_agents: int = meta["num_agents"]
+        self.arrays: Dict[str, np.ndarray] = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")[: self.length]
+            for name in FIELDS
+        }
+        # the batch fields with the step and agent axes merged, still views into the files
+        self.flat: Dict[str, np.ndarray] = {
+            name: self.arrays[name].reshape(-1, *self.arrays[name].shape[2:])
+            for name in Batch._fields
+        }
+
+    def starts(self, sequence_length: int) -> Tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """
+        (step, agent) of every sequence of `sequence_length` steps of one agent that stays in
+        one episode and in which the agent races throughout.
+        """
+        valid = np.asarray(self.arrays["valid"])
+        episode = np.asarray(self.arrays["episode"])
+        num_starts = self.length - sequence_length + 1
+        if num_starts <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        invalid = np.concatenate(
+            (np.zeros((1, self.num_agents), dtype=np.int64), np.cumsum(~valid, axis=0))
+        )
+        racing = invalid[sequence_length:] - invalid[:num_starts] == 0
+        same_episode = episode[:num_starts] == episode[sequence_length - 1 :]
+        steps, agents = np.nonzero(racing & same_episode[:, None])
+        return steps, agents
+
+
+class ShardDataset:
+    """
+    Reads the shards written by `DatasetWriter`. The arrays stay memory-mapped, only the
+    samples of a batch are copied out of the page cache.
+
+    A sample is one agent at one step, or a sequence of `sequence_length` consecutive steps
+    of one agent (frame stacks). Sequences never cross an episode or shard boundary and only
+    cover steps where the agent was racing.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.shards = [Shard(path) for path in _shard_dirs(directory)]
+        assert self.shards, f"no complete shard in {directory}"
+        # (shard, step, agent) of every sample, per sequence length
+        self._indexes: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def index(self, sequence_length: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Global index of the samples, built once per sequence length."""
+        if sequence_length not in self._indexes:
+            shard_ids, steps, agents = [], [], []
+            for shard_id, shard in enumerate(self.shards):
+                shard_steps, shard_agents = shard.starts(sequence_length)
+                shard_ids.append(np.full(len(shard_steps), shard_id, dtype=np.int32))
+                steps.append(shard_steps.astype(np.int32))
+                agents.append(shard_agents.astype(np.int16))
+            self._indexes[sequence_length] = (
+                np.concatenate(shard_ids),
+                np.concatenate(steps),
+                np.concatenate(agents),
+            )
+        return self._indexes[sequence_length]
+
+    def num_samples(self, sequence_length: int = 1) -> int:
+        return len(self.index(sequence_length)[0])
+
+    def sample_view(self, sample: int, sequence_length: int = 1) -> Batch:
+        """
+        One sample as views into the memory-mapped shard, nothing is read until the arrays are
+        used. Single steps keep their time axis of length 1.
+        """
+        shard_ids, steps, agents = self.index(sequence_length)
+        arrays = self.shards[shard_ids[sample]].arrays
+        rows = slice(int(steps[sample]), int(steps[sample]) + sequence_length)
+        agent = int(agents[sample])
+        return Batch(*(arrays[name][rows, agent] for name in Batch._fields))
+
+    def read(self, samples: npt.ArrayLike, sequence_length: int = 1) -> Batch:
+        """
+        Copies the samples into one batch of `(batch_size, sequence_length, ...)` arrays, with
+        one gather per field and run of samples from the same shard. Sorted samples make for
+        the fewest runs.
+        """
+        samples = np.asarray(samples)
+        shard_ids, steps, agents = (column[samples] for column in self.index(sequence_length))
+        offsets = np.arange(sequence_length)
+        run_starts = np.flatnonzero(np.diff(shard_ids, prepend=-1))
+        run_ends = np.append(run_starts[1:], len(samples))
+        batch: Dict[str, np.ndarray] = {}
+        for start, end in zip(run_starts, run_ends):
+            shard = self.shards[shard_ids[start]]
+            rows = (steps[start:end, None] + offsets) * shard.num_agents + agents[start:end, None]
+            for field in Batch._fields:
+                flat = shard.flat[field]
+                if field not in batch:
+                    batch[field] = np.empty(
+                        (len(samples), sequence_length, *flat.shape[1:]), dtype=flat.dtype
+                    )
+                # copies straight from the page cache into the batch, "raise" would buffer
+                np.take(flat, rows, axis=0, out=batch[field][start:end], mode="clip")
+        return Batch(*(batch[field] for field in Batch._fields))
+
+    def _stream(
+        self, sequence_length: int, shuffle_buffer: int, rng: np.random.Generator
+    ) -> Iterator[int]:
+        # shards in random order, samples in file order within a shard so that reads stay
+        # mostly sequential, and a bounded buffer to mix them
+        shard_ids = self.index(sequence_length)[0]
+        bounds = np.searchsorted(shard_ids, np.arange(len(self.shards) + 1))
+        buffer: List[int] = []
+        for shard_id in rng.permutation(len(self.shards)):
+            for sample in range(bounds[shard_id], bounds[shard_id + 1]):
+                if len(buffer) < shuffle_buffer:
+                    buffer.append(sample)
+                    continue
+                slot = int(rng.integers(shuffle_buffer))
+                yield buffer[slot]
+                buffer[slot] = sample
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        sequence_length: Optional[int] = None,
+        shuffle_buffer: int = 16384,
+        prefetch: int = 4,
+        num_threads: int = 2,
+        drop_last: bool = True,
+        seed: Optional[int] = None,
+    ) -> Iterator[Batch]:
+        """
+        One pass over the dataset in batches, read ahead by background threads.
+
+        :param sequence_length: steps per sample, single steps without a time axis if None
+        :param shuffle_buffer: number of samples mixed at once, 1 keeps the file order
+        :param prefetch: number of batches read ahead
+        :param num_threads: threads copying the batches out of the shards
+        """
+        rng = np.random.default_rng(seed)
+        stream = self._stream(
+            1 if sequence_length is None else sequence_length, max(shuffle_buffer, 1), rng
+        )
+        pending: Deque = deque()
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            while True:
+                while len(pending) < prefetch:
+                    samples = [sample for _, sample in zip(range(batch_size), stream)]
+                    if not samples or (drop_last and len(samples) < batch_size):
+                        break
+                    # the order within a batch doesn't matter, sorted samples read faster
+                    pending.append(
+                        executor.submit(self.read, np.sort(samples), sequence_length or 1)
+                    )
+                if not pending:
+                    return
+                batch = pending.popleft().result()
+                if sequence_length is None:
+                    batch = Batch(*(array[:, 0] for array in batch))
+                yield batch
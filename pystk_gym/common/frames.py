@@ -0,0 +1,183 @@
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+# (compress, decompress), both take any contiguous buffer
+Codec = Tuple[Callable[[Any], bytes], Callable[[Any], bytes]]
+
+
+def get_codec(name: str, level: int = 1) -> Codec:
+    """(compress, decompress) functions of a codec, "zlib", "lz4" or "none"."""
+    if name == "zlib":
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+    if name == "lz4":
+        try:
+            import lz4.frame
+        except ImportError as e:
+            raise ImportError(
+                "the lz4 codec needs lz4, install it with `pip install pystk_gym[compression]`."
+            ) from e
+        return (lambda data: lz4.frame.compress(data, level)), lz4.frame.decompress
+    if name == "none":
+        return bytes, bytes
+    raise ValueError(f"unknown codec {name}")
+
+
+class FrameStore:
+    """
+    Compressed in-memory store of observation frames, for replay buffers and frame stacking.
+
+    Every `keyframe_interval` frames (and at every episode start) a frame is stored whole, the
+    frames in between as their XOR with that keyframe, which is mostly zeros for consecutive
+    frames and compresses well. Any frame decodes from its keyframe and its own delta, without
+    a chain over the frames between them.
+
+    The compressed frames are appended to a fixed size byte arena, an index keeps the offset,
+    size and keyframe of every frame by its id. Once the arena or the index is full the oldest
+    frames are dropped, ids keep growing. Replay entries store frame ids, so a frame shared by
+    several stacked observations is stored once.
+    """
+
+    def __init__(
+        self,
+        capacity_bytes: int,
+        max_frames: int = 1 << 20,
+        keyframe_interval: int = 8,
+        codec: str = "zlib",
+        level: int = 1,
+    ):
+        """
+        :param capacity_bytes: size of the byte arena
+        :param max_frames: number of frames the index holds
+        :param keyframe_interval: frames per keyframe, 1 compresses every frame on its own
+        :param codec: see `get_codec`
+        """
+        self.capacity_bytes = capacity_bytes
+        self.max_frames = max_frames
+        self.keyframe_interval = keyframe_interval
+        self._compress, self._decompress = get_codec(codec, level)
+
+        self._arena = np.empty(capacity_bytes, dtype=np.uint8)
+        self._offsets = np.zeros(max_frames, dtype=np.int64)
+        self._sizes = np.zeros(max_frames, dtype=np.int64)
+        self._keyframes = np.zeros(max_frames, dtype=np.int64)
+        self.frame_shape: Optional[Tuple[int, ...]] = None
+        # ids of the oldest stored frame and of the next one
+        self.first_id = 0
+        self.next_id = 0
+        self._cursor = 0
+        self._keyframe_id = -1
+        self._keyframe: Optional[npt.NDArray[np.uint8]] = None
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def __len__(self) -> int:
+        return self.next_id - self.first_id
+
+    @property
+    def compression_ratio(self) -> float:
+        """Raw over compressed size of the frames stored so far, dropped ones included."""
+        return self.raw_bytes / max(self.stored_bytes, 1)
+
+    def _evict_oldest(self):
+        self.first_id += 1
+        if len(self) == 0:
+            self._cursor = 0
+
+    def _reserve(self, size: int) -> int:
+        """Offset of `size` free bytes at the write cursor, dropping the oldest frames."""
+        assert size <= self.capacity_bytes, "a frame doesn't fit into the arena"
+        if len(self) == self.max_frames:
+            self._evict_oldest()
+        if self._cursor + size > self.capacity_bytes:
+            # the tail is left unused, frames never wrap around the arena's end. The frames
+            # after the cursor are older than the ones before it, they go first.
+            while len(self) > 0 and self._offsets[self.first_id % self.max_frames] >= self._cursor:
+                self._evict_oldest()
+            self._cursor = 0
+        while len(self) > 0:
+            oldest = self._offsets[self.first_id % self.max_frames]
+            if not self._cursor <= oldest < self._cursor + size:
+                break
+            self._evict_oldest()
+        return self._cursor
+
+    def add(self, frame: npt.NDArray[np.uint8], episode_start: bool = False) -> int:
+        """
+        :param frame: one observation, (height, width, 3)
+        :param episode_start: store the frame whole, the first frame of an episode shares
+            nothing with the previous one
+        :returns: id of the frame
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+        assert frame.shape == self.frame_shape
+        frame_id = self.next_id
+        keyframe = (
+            episode_start
+            or self._keyframe_id < self.first_id
+            or frame_id - self._keyframe_id >= self.keyframe_interval
+        )
+        data = self._compress(frame if keyframe else np.bitwise_xor(frame, self._keyframe))
+        offset = self._reserve(len(data))
+        if not keyframe and self._keyframe_id < self.first_id:
+            # making room dropped the keyframe, this frame becomes the next one
+            keyframe = True
+            data = self._compress(frame)
+            offset = self._reserve(len(data))
+        if keyframe:
+            self._keyframe_id = frame_id
+            self._keyframe = frame.copy()
+
+        self._arena[offset : offset + len(data)] = np.frombuffer(data, dtype=np.uint8)
+        slot = frame_id % self.max_frames
+        self._offsets[slot] = offset
+        self._sizes[slot] = len(data)
+        self._keyframes[slot] = self._keyframe_id
+        self._cursor = offset + len(data)
+        self.next_id += 1
+        self.raw_bytes += frame.nbytes
+        self.stored_bytes += len(data)
+        return frame_id
+
+    def contains(self, frame_ids: npt.ArrayLike) -> npt.NDArray[np.bool_]:
+        """Whether the frames can still be decoded, their keyframe may be gone before them."""
+        frame_ids = np.asarray(frame_ids, dtype=np.int64)
+        stored = (frame_ids >= self.first_id) & (frame_ids < self.next_id)
+        keyframes = self._keyframes[frame_ids % self.max_frames]
+        return stored & (keyframes >= self.first_id)
+
+    def _decode(self, frame_id: int) -> npt.NDArray[np.uint8]:
+        slot = frame_id % self.max_frames
+        offset, size = self._offsets[slot], self._sizes[slot]
+        data = self._decompress(self._arena[offset : offset + size])
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.frame_shape)
+
+    def get(self, frame_ids: npt.ArrayLike, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decodes a batch of frames. Frames and keyframes referenced several times (like the
+        frames of overlapping stacks) are decoded once.
+
+        :param frame_ids: ids of any shape, e.g. (batch_size, stack_size) for stacked frames
+        :param out: array of shape (*frame_ids.shape, height, width, 3) to decode into
+        """
+        frame_ids = np.asarray(frame_ids, dtype=np.int64)
+        assert self.contains(frame_ids).all(), "some frames were dropped from the store"
+        unique_ids, inverse = np.unique(frame_ids, return_inverse=True)
+        keyframes: Dict[int, npt.NDArray[np.uint8]] = {}
+        decoded = np.empty((len(unique_ids), *self.frame_shape), dtype=np.uint8)
+        for i, frame_id in enumerate(unique_ids.tolist()):
+            keyframe_id = int(self._keyframes[frame_id % self.max_frames])
+            if keyframe_id not in keyframes:
+                keyframes[keyframe_id] = self._decode(keyframe_id)
+            if keyframe_id == frame_id:
+                decoded[i] = keyframes[keyframe_id]
+            else:
+                np.bitwise_xor(self._decode(frame_id), keyframes[keyframe_id], out=decoded[i])
+        if out is None:
+            out = np.empty((*frame_ids.shape, *self.frame_shape), dtype=np.uint8)
+        out.reshape(-1, *self.frame_shape)[:] = decoded[inverse.reshape(-1)]
+        return out
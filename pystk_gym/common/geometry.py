@@ -0,0 +1,93 @@
+import os
+from importlib import metadata
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pystk
+
+# the geometry of the tracks loaded so far by this process
+_cache: Dict[str, "TrackGeometry"] = {}
+
+
+class TrackGeometry(NamedTuple):
+    """The static path of a track, as read from pystk.Track in forward order."""
+
+    path_nodes: npt.NDArray[np.float32]  # (num_nodes, 2, 3) segment end points
+    path_width: npt.NDArray[np.float32]  # (num_nodes, 1)
+    path_distance: npt.NDArray[np.float32]  # (num_nodes, 2) distance down track of the ends
+    length: float
+
+
+def data_version() -> str:
+    """Version of the installed pystk and its game data, caches are kept per version."""
+    versions = []
+    for dist in ("PySuperTuxKart", "PySuperTuxKartData"):
+        try:
+            versions.append(metadata.version(dist))
+        except metadata.PackageNotFoundError:
+            versions.append("unknown")
+    return "-".join(versions)
+
+
+def cache_dir() -> str:
+    return os.path.join(
+        os.path.expanduser("~"), ".cache", "pystk_gym", "geometry", data_version()
+    )
+
+
+def _path(track: str) -> str:
+    return os.path.join(cache_dir(), f"{track}.npz")
+
+
+def _load(track: str) -> Optional[TrackGeometry]:
+    try:
+        with np.load(_path(track)) as data:
+            return TrackGeometry(
+                data["path_nodes"],
+                data["path_width"],
+                data["path_distance"],
+                float(data["length"]),
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def get(track: str) -> Optional[TrackGeometry]:
+    """The geometry of a track from the process cache or the disk cache, None if unknown."""
+    geometry = _cache.get(track)
+    if geometry is None:
+        geometry = _load(track)
+        if geometry is not None:
+            _cache[track] = geometry
+    return geometry
+
+
+def put(track: str, pystk_track: pystk.Track) -> TrackGeometry:
+    """Caches the geometry of an updated pystk.Track, in the process and on disk."""
+    geometry = TrackGeometry(
+        np.array(pystk_track.path_nodes, dtype=np.float32),
+        np.array(pystk_track.path_width, dtype=np.float32),
+        np.array(pystk_track.path_distance, dtype=np.float32),
+        float(pystk_track.length),
+    )
+    _cache[track] = geometry
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        # written next to the final file and renamed, concurrent workers never read half a file
+        tmp_path = f"{_path(track)}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **geometry._asdict())
+        os.replace(tmp_path, _path(track))
+    except OSError:
+        pass
+    return geometry
+
+
+def preload(tracks: Iterable[str]) -> int:
+    """
+    Loads the disk cache of the tracks into the process cache, processes forked afterwards
+    inherit it.
+
+    :returns: number of tracks that were cached on disk
+    """
+    return sum(get(track) is not None for track in tracks)
@@ -1,4 +1,8 @@
+from collections import abc
 from enum import Enum, auto
+from typing import Any, Callable, Dict, Iterator, Mapping, Sequence
+
+import numpy as np
 
 
 class Info(Enum):
@@ -20,3 +24,81 @@ class Info(Enum):
     NO_MOVEMENT = auto()
     RANK = auto()
     NITRO = auto()
+
+
+def stack_infos(infos: Sequence[Mapping[Info, Any]]) -> Dict[Info, np.ndarray]:
+    """
+    Stacks per agent info dicts into one array per Info key. Enum values (like the pystk powerup
+    and attachment types) are stored as their integer values.
+
+    :param infos: info dicts in agent index order
+    """
+    if len(infos) == 0:
+        return {}
+    columns = {}
+    for key in infos[0]:
+        values = [info[key] for info in infos]
+        if hasattr(values[0], "value") and not isinstance(values[0], (int, float)):
+            values = [value.value for value in values]
+        columns[key] = np.asarray(values)
+    return columns
+
+
+class StepInfo(abc.Mapping):
+    """
+    Info mapping of a single kart step.
+
+    Fields are computed the first time they are accessed and memoized for the rest of the step.
+    The mapping is sealed before the race moves on, so reading it later never computes a field
+    from a newer state.
+    """
+
+    __slots__ = ("_resolvers", "_keys", "_values")
+
+    def __init__(
+        self,
+        resolvers: Mapping[Info, Callable[[], Any]],
+        keys: Sequence[Info],
+    ):
+        """
+        :param resolvers: functions computing each lazily evaluated field
+        :param keys: the fields exposed when iterating over the mapping
+        """
+        self._resolvers = resolvers
+        self._keys = keys
+        self._values: Dict[Info, Any] = {}
+
+    def __getitem__(self, key: Info) -> Any:
+        if key in self._values:
+            return self._values[key]
+        value = self._resolvers[key]()
+        self._values[key] = value
+        return value
+
+    def __setitem__(self, key: Info, value: Any):
+        self._values[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._values or key in self._resolvers
+
+    def __iter__(self) -> Iterator[Info]:
+        return (key for key in self._keys if key in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"StepInfo({self._values!r})"
+
+    def seal(self, resolve: bool = True):
+        """
+        Drops the resolvers, the mapping only holds the fields computed so far afterwards.
+
+        :param resolve: computes the exposed fields that were not read yet first, only valid
+            while the state the mapping belongs to is still current
+        """
+        if resolve:
+            for key in self._keys:
+                if key not in self._values and key in self._resolvers:
+                    self._values[key] = self._resolvers[key]()
+        self._resolvers = {}
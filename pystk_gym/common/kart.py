@@ -1,10 +1,10 @@
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 import numpy as np
 import numpy.typing as npt
 import pystk
 
-from .info import Info
+from .info import Info, StepInfo
 from .race import LineType
 
 
@@ -16,22 +16,49 @@ class Kart:
         path_width: npt.NDArray[np.float32],
         path_lines: List[LineType],
         path_distance: npt.NDArray[np.float32],
-        return_info: bool = True,
+        info_keys: Optional[Iterable[Info]] = None,
     ):
+        """
+        :param info_keys: the Info fields that will be read, None for all of them. The counters
+            are only maintained when they are part of this.
+        """
         self.kart = kart
         self.id = kart.id
         self.is_reverse = is_reverse
         self.path_width = path_width
         self.path_lines = path_lines
         self.path_distance = path_distance
-        self.return_info = return_info
+        self.info_keys = list(Info) if info_keys is None else list(info_keys)
 
         self.jump_count = 0
-        self._prev_info = None
         self.backward_count = 0
         self.no_movement_count = 0
         self.out_of_track_count = 0
         self._node_idx = 0
+        self._node_idx_stale = True
+        self._distance: Optional[float] = None
+        self._prev_distance: Optional[float] = None
+        self._prev_jumping: Optional[bool] = None
+        self._info: Optional[StepInfo] = None
+
+        self._resolvers: Dict[Info, Callable[[], Any]] = {
+            Info.DONE: self.is_done,
+            Info.JUMPING: self._get_jumping,
+            Info.POWERUP: self._get_powerup,
+            Info.LOCATION: self._get_location,
+            Info.VELOCITY: self._get_velocity,
+            Info.ATTACHMENT: self._get_attachment,
+            Info.FINISH_TIME: self._get_finish_time,
+            Info.IS_INSIDE_TRACK: self._get_is_inside_track,
+            Info.OVERALL_DISTANCE: self._get_distance_down_track,
+            Info.DELTA_DIST: self._get_delta_dist,
+            Info.BACKWARD: self._get_backward,
+            Info.NO_MOVEMENT: self._get_no_movement,
+        }
+
+    def add_info_resolver(self, key: Info, resolver: Callable[[], Any]):
+        """Registers a lazily evaluated field that depends on more than this kart (like RANK)."""
+        self._resolvers[key] = resolver
 
     @staticmethod
     def get_dist_bw_line_and_point(
@@ -70,6 +97,14 @@ class Kart:
         else:
             self._node_idx = idxs.item()
 
+    @property
+    def node_idx(self) -> int:
+        """Index of the path node the kart is on, only looked up when it is needed."""
+        if self._node_idx_stale:
+            self._update_node_idx()
+            self._node_idx_stale = False
+        return self._node_idx
+
     def _get_jumping(self) -> bool:
         return self.kart.jumping
 
@@ -93,80 +128,77 @@ class Kart:
 
     def _get_kart_dist_from_center(self) -> float:
         kart_loc = np.array(self.kart.location, dtype=np.float32)
-        path_node = self.path_lines[self._node_idx]
+        path_node = self.path_lines[self.node_idx]
         dist = Kart.get_dist_bw_line_and_point(path_node, kart_loc)
         return dist
 
     def _get_is_inside_track(self) -> bool:
-        curr_path_width = self.path_width[self._node_idx][0]
+        curr_path_width = self.path_width[self.node_idx][0]
         kart_dist = self._get_kart_dist_from_center()
         return abs(kart_dist) <= (curr_path_width / 2)
 
     def _get_velocity(self) -> float:
         return np.sqrt(np.sum(np.array(self.kart.velocity) ** 2))
 
-    def is_done(self) -> bool:
-        return self.kart.finish_time > 0
+    def _get_delta_dist(self) -> float:
+        if self._prev_distance is None:
+            return 0
+        return self._distance - self._prev_distance
 
-    def get_info(self) -> Dict[Info, Any]:
-        info = {}
-
-        # basic info
-        info[Info.DONE] = self.is_done()
-        info[Info.JUMPING] = self._get_jumping()
-        info[Info.POWERUP] = self._get_powerup()
-        info[Info.LOCATION] = self._get_location()
-        info[Info.VELOCITY] = self._get_velocity()
-        info[Info.ATTACHMENT] = self._get_attachment()
-        info[Info.FINISH_TIME] = self._get_finish_time()
-        info[Info.IS_INSIDE_TRACK] = self._get_is_inside_track()
-        info[Info.OVERALL_DISTANCE] = self._get_distance_down_track()
-
-        # info based on _prev_info
-        if self._prev_info:
-            delta_dist = (
-                info[Info.OVERALL_DISTANCE] - self._prev_info[Info.OVERALL_DISTANCE]
-            )
-            info[Info.DELTA_DIST] = delta_dist
-            if delta_dist < 0:
-                info[Info.BACKWARD] = True
-                info[Info.NO_MOVEMENT] = False
-            elif delta_dist == 0:
-                info[Info.BACKWARD] = False
-                info[Info.NO_MOVEMENT] = True
-            else:
-                info[Info.BACKWARD] = False
-                info[Info.NO_MOVEMENT] = False
-        else:
-            info[Info.DELTA_DIST] = 0
-            info[Info.BACKWARD] = False
-            info[Info.NO_MOVEMENT] = False
+    def _get_backward(self) -> bool:
+        return self._get_delta_dist() < 0
 
-        return info
+    def _get_no_movement(self) -> bool:
+        return self._prev_distance is not None and self._get_delta_dist() == 0
+
+    def is_done(self) -> bool:
+        return self.kart.finish_time > 0
 
-    def step(self) -> Dict[Info, Any]:
-        self._update_node_idx()
-        if self.return_info:
-            info = self.get_info()
+    def get_info(self) -> StepInfo:
+        """A lazily evaluated info mapping for the current state of the kart."""
+        return StepInfo(self._resolvers, self.info_keys)
+
+    def seal_info(self):
+        """Resolves the fields of the last step's info, has to happen before the race steps."""
+        if self._info is not None:
+            self._info.seal()
+
+    def step(self) -> StepInfo:
+        if self._info is not None:
+            # the race has already moved on, whatever was not read (or sealed) is dropped
+            self._info.seal(resolve=False)
+        self._node_idx_stale = True
+        self._prev_distance, self._distance = self._distance, self._get_distance_down_track()
+
+        # the counters have to see every step, so the fields they depend on are always computed
+        info = self.get_info()
+        if Info.OUT_OF_TRACK_COUNT in self.info_keys:
             self.out_of_track_count += not info[Info.IS_INSIDE_TRACK]
-            self.backward_count += info[Info.BACKWARD]
-            self.no_movement_count += info[Info.NO_MOVEMENT]
-            if info[Info.JUMPING] and (
-                self._prev_info is not None and not self._prev_info[Info.JUMPING]
-            ):
-                self.jump_count += 1
             info[Info.OUT_OF_TRACK_COUNT] = self.out_of_track_count
+        if Info.BACKWARD_COUNT in self.info_keys:
+            self.backward_count += info[Info.BACKWARD]
             info[Info.BACKWARD_COUNT] = self.backward_count
+        if Info.NO_MOVEMENT_COUNT in self.info_keys:
+            self.no_movement_count += info[Info.NO_MOVEMENT]
             info[Info.NO_MOVEMENT_COUNT] = self.no_movement_count
+        if Info.JUMP_COUNT in self.info_keys:
+            jumping = info[Info.JUMPING]
+            if jumping and self._prev_jumping is not None and not self._prev_jumping:
+                self.jump_count += 1
+            self._prev_jumping = jumping
             info[Info.JUMP_COUNT] = self.jump_count
-            self._prev_info = info
-        else:
-            info = {}
+        self._info = info
         return info
 
     def reset(self):
+        if self._info is not None:
+            self._info.seal(resolve=False)
+        self._info = None
         self.jump_count = 0
-        self._prev_info = None
         self.backward_count = 0
         self.no_movement_count = 0
         self.out_of_track_count = 0
+        self._node_idx_stale = True
+        self._distance = None
+        self._prev_distance = None
+        self._prev_jumping = None
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+
+class RunningMeanStd:
+    """
+    Running mean and variance (Welford), updated with whole batches and mergeable with the
+    statistics of other processes (Chan et al. parallel variance).
+    """
+
+    def __init__(self, shape: Tuple[int, ...] = ()):
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=np.float64)
+        # sum of the squared deviations from the mean
+        self.m2 = np.zeros(shape, dtype=np.float64)
+
+    @property
+    def var(self) -> npt.NDArray[np.float64]:
+        return self.m2 / self.count if self.count > 0 else np.ones_like(self.m2)
+
+    @property
+    def std(self) -> npt.NDArray[np.float64]:
+        return np.sqrt(self.var)
+
+    def _combine(self, count: int, mean: npt.NDArray[np.float64], m2: npt.NDArray[np.float64]):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (count / total)
+        self.m2 = self.m2 + m2 + np.square(delta) * (self.count * count / total)
+        self.count = total
+
+    def update(self, batch: npt.ArrayLike):
+        """:param batch: array of shape (batch_size, *shape)"""
+        batch = np.asarray(batch, dtype=np.float64).reshape((-1,) + self.mean.shape)
+        if len(batch) == 0:
+            return
+        mean = batch.mean(axis=0)
+        self._combine(len(batch), mean, np.square(batch - mean).sum(axis=0))
+
+    def merge(self, other: RunningMeanStd):
+        assert other.mean.shape == self.mean.shape
+        self._combine(other.count, other.mean, other.m2)
+
+
+class Normalizer:
+    """
+    Normalization statistics of the relative features (see `Race.relative_features`) and of the
+    rewards of one or more envs.
+
+    Features are standardized per column, rewards are divided by the standard deviation of the
+    discounted returns, which keeps their sign and the optimal policy. The discounted returns
+    themselves are tracked by the envs, a normalizer can be shared by the envs of a process.
+
+    The updates since the last `sync` are also kept apart, so that the normalizers of the
+    workers of a pool can be combined without counting any sample twice (see
+    `SupervisedPool.sync_normalizers`).
+    """
+
+    def __init__(
+        self,
+        num_features: int = 8,
+        gamma: float = 0.99,
+        clip: Optional[float] = 10.0,
+        epsilon: float = 1e-8,
+    ):
+        """
+        :param num_features: leading feature columns to normalize, the other ones are flags
+            that are passed through. The default covers the continuous relative features.
+        :param gamma: discount of the returns the rewards are scaled by, the one of the learner
+        :param clip: bound of the normalized values, None to not clip
+        """
+        self.num_features = num_features
+        self.gamma = gamma
+        self.clip = clip
+        self.epsilon = epsilon
+        self.frozen = False
+        self.features = RunningMeanStd((num_features,))
+        self.returns = RunningMeanStd()
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._pending_features = RunningMeanStd((self.num_features,))
+        self._pending_returns = RunningMeanStd()
+
+    def freeze(self):
+        """Stops the updates, for evaluation. Frozen statistics are synced like any other."""
+        self.frozen = True
+
+    def unfreeze(self):
+        self.frozen = False
+
+    def _clip(self, values: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        return values if self.clip is None else np.clip(values, -self.clip, self.clip)
+
+    def update_features(self, features: npt.ArrayLike):
+        """:param features: feature rows, shape (..., num_columns), without padding rows"""
+        if self.frozen:
+            return
+        features = np.asarray(features)[..., : self.num_features]
+        self.features.update(features)
+        self._pending_features.update(features)
+
+    def normalize_features(self, features: npt.ArrayLike) -> npt.NDArray[np.float32]:
+        """Standardized copy of the leading `num_features` columns, the others are kept."""
+        normalized = np.array(features, dtype=np.float32)
+        columns = normalized[..., : self.num_features]
+        columns -= self.features.mean.astype(np.float32)
+        columns /= np.sqrt(self.features.var + self.epsilon).astype(np.float32)
+        normalized[..., : self.num_features] = self._clip(columns)
+        return normalized
+
+    def update_returns(self, returns: npt.ArrayLike):
+        """:param returns: discounted returns of the agents that are racing"""
+        if self.frozen:
+            return
+        self.returns.update(returns)
+        self._pending_returns.update(returns)
+
+    def scale_rewards(self, rewards: npt.ArrayLike) -> npt.NDArray[np.float32]:
+        scale = np.sqrt(self.returns.var + self.epsilon)
+        return self._clip(np.asarray(rewards, dtype=np.float32) / np.float32(scale))
+
+    def merge(self, other: Normalizer):
+        """Adds the statistics of another normalizer, which has to have the same config."""
+        assert other.num_features == self.num_features and other.gamma == self.gamma
+        self.features.merge(other.features)
+        self.returns.merge(other.returns)
+
+    def sync(self, shared: Optional[Normalizer]) -> Normalizer:
+        """
+        Takes over the statistics combined over all processes, on top of which the local
+        updates continue. They have to include the updates of this normalizer, collected by
+        a sync without statistics first, or those are lost.
+
+        :param shared: combined statistics, or None to only collect the updates
+        :returns: the updates since the previous sync, as a normalizer with the same config
+        """
+        updates = deepcopy(self)
+        updates.features, updates.returns = self._pending_features, self._pending_returns
+        updates._reset_pending()
+        if shared is not None:
+            self.features = deepcopy(shared.features)
+            self.returns = deepcopy(shared.returns)
+            self.frozen = shared.frozen
+        self._reset_pending()
+        return updates
+
+    def save(self, path: str):
+        """Writes the statistics and config to a npz file."""
+        np.savez(
+            path,
+            num_features=self.num_features,
+            gamma=self.gamma,
+            clip=np.nan if self.clip is None else self.clip,
+            epsilon=self.epsilon,
+            features_count=self.features.count,
+            features_mean=self.features.mean,
+            features_m2=self.features.m2,
+            returns_count=self.returns.count,
+            returns_mean=self.returns.mean,
+            returns_m2=self.returns.m2,
+        )
+
+    @staticmethod
+    def load(path: str, frozen: bool = False) -> Normalizer:
+        """
+        :param frozen: freeze the loaded statistics, as for evaluation
+        """
+        with np.load(path) as data:
+            clip = float(data["clip"])
+            normalizer = Normalizer(
+                int(data["num_features"]),
+                float(data["gamma"]),
+                None if np.isnan(clip) else clip,
+                float(data["epsilon"]),
+            )
+            for name in ("features", "returns"):
+                stats: RunningMeanStd = getattr(normalizer, name)
+                stats.count = int(data[f"{name}_count"])
+                stats.mean = data[f"{name}_mean"]
+                stats.m2 = data[f"{name}_m2"]
+        normalizer.frozen = frozen
+        return normalizer
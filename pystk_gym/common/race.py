@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import functools
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import numpy.typing as npt
 import pystk
 
+from . import geometry
+
 ObsType = np.ndarray[np.ndarray, np.dtype[np.uint8]]
 LineType = np.ndarray[np.ndarray, np.dtype[np.float32]]
 
@@ -47,19 +48,43 @@ class RaceConfig:
         self.step_size = step_size
         self.num_karts_controlled = num_karts_controlled
 
-    def build(self) -> pystk.RaceConfig:
+    def build(
+        self, rng: Optional[np.random.Generator] = None, seed: Optional[int] = None
+    ) -> pystk.RaceConfig:
+        """
+        :param rng: draws the unspecified track, direction and karts, seeded with `seed` if None
+        :param seed: pystk race seed, `self.seed` if None
+        """
         return RaceConfig.get_race_config(
             self.track,
             self.kart,
             self.num_karts,
             self.laps,
             self.reverse,
-            self.seed,
+            self.seed if seed is None else seed,
             self.difficulty,
             self.step_size,
             self.num_karts_controlled,
+            rng,
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "track": self.track,
+            "kart": self.kart,
+            "num_karts": self.num_karts,
+            "laps": self.laps,
+            "reverse": self.reverse,
+            "seed": self.seed,
+            "difficulty": self.difficulty,
+            "step_size": self.step_size,
+            "num_karts_controlled": self.num_karts_controlled,
+        }
+
+    @staticmethod
+    def from_dict(config: Dict[str, Any]) -> RaceConfig:
+        return RaceConfig(**config)
+
     @staticmethod
     def default_config() -> RaceConfig:
         return RaceConfig(
@@ -84,9 +109,12 @@ class RaceConfig:
         difficulty: int = 1,
         step_size: float = 0.09,
         num_karts_controlled: int = 4,
+        rng: Optional[np.random.Generator] = None,
     ) -> pystk.RaceConfig:
-        track = np.random.choice(RaceConfig.TRACKS) if track is None else track
-        reverse = np.random.choice([True, False]) if reverse is None else reverse
+        # never the global np.random, so that every env owns its stream
+        rng = np.random.default_rng(seed) if rng is None else rng
+        track = str(rng.choice(RaceConfig.TRACKS)) if track is None else track
+        reverse = bool(rng.choice([True, False])) if reverse is None else reverse
         assert num_karts >= num_karts_controlled
 
         # TODO: add fps kinda thing in hertz like highway_env - is this what step_size does?
@@ -99,7 +127,7 @@ class RaceConfig:
             assert karts in RaceConfig.KARTS, f"{karts} is not a valid kart."
             karts = [karts] * num_karts_controlled
         elif karts is None:
-            karts = list(np.random.choice(RaceConfig.KARTS, size=num_karts_controlled))
+            karts = [str(kart) for kart in rng.choice(RaceConfig.KARTS, size=num_karts_controlled)]
         else:
             raise ValueError(f"does not support type {type(karts)} for list of karts.")
 
@@ -123,7 +151,7 @@ class RaceConfig:
             )
         else:
             first_player_config = pystk.PlayerConfig(
-                np.random.choice(RaceConfig.KARTS),
+                str(rng.choice(RaceConfig.KARTS)),
                 pystk.PlayerConfig.Controller.AI_CONTROL,
                 1,
             )
@@ -140,7 +168,7 @@ class RaceConfig:
         for _ in range(num_karts + num_karts_controlled - len(config.players)):
             config.players.append(
                 pystk.PlayerConfig(
-                    np.random.choice(RaceConfig.KARTS),
+                    str(rng.choice(RaceConfig.KARTS)),
                     pystk.PlayerConfig.Controller.AI_CONTROL,
                     1,
                 )
@@ -150,6 +178,11 @@ class RaceConfig:
 
 
 class Race:
+    # last axis of the opponent-relative feature tensors, positions and velocities are world frame
+    RELATIVE_FEATURES = [
+        "dx", "dy", "dz", "dvx", "dvy", "dvz", "distance", "progress_gap", "is_controlled", "valid"
+    ]  # fmt: skip
+
     def __init__(self, config: pystk.RaceConfig):
         self.config = config
         self.race = pystk.Race(self.config)
@@ -159,8 +192,17 @@ class Race:
         self.race.start()
         self.race.step()
         self.state.update()
-        self.track.update()
-        self.reset()
+        # the path never changes, it is read from pystk once per track and process (or from the
+        # disk cache a template process preloaded)
+        self.geometry = geometry.get(config.track)
+        if self.geometry is None:
+            self.track.update()
+            self.geometry = geometry.put(config.track, self.track)
+        # resolved once, caching it with lru_cache on the method would keep every Race alive
+        self._controlled_kart_mask = self._make_controlled_kart_mask()
+        self._controlled_kart_idxs = np.flatnonzero(self._controlled_kart_mask)
+        self._relative_features: Optional[npt.NDArray[np.float32]] = None
+        self._frame_shape: Optional[Tuple[int, ...]] = None
 
     def get_race_info(self) -> Dict[str, Any]:
         info = {}
@@ -174,21 +216,20 @@ class Race:
 
     def get_path_lines(self) -> List[LineType]:
         if self.config.reverse:
-            return self.track.path_nodes[::-1]
-        return self.track.path_nodes
+            return self.geometry.path_nodes[::-1]
+        return self.geometry.path_nodes
 
     def get_path_width(self) -> npt.NDArray[np.float32]:
         if self.config.reverse:
-            return self.track.path_width[::-1]
-        return self.track.path_width
+            return self.geometry.path_width[::-1]
+        return self.geometry.path_width
 
     def get_path_distance(self) -> npt.NDArray[np.float32]:
         if self.config.reverse:
-            return self.track.path_distance[::-1]
-        return self.track.path_distance
+            return self.geometry.path_distance[::-1]
+        return self.geometry.path_distance
 
-    @functools.lru_cache(maxsize=None)
-    def get_controlled_kart_mask(self) -> List[bool]:
+    def _make_controlled_kart_mask(self) -> List[bool]:
         # there are better ways to do this but i think this is the best way to be sure that we are
         # getting the correct player karts
         controlled_karts_idxs = []
@@ -202,6 +243,9 @@ class Race:
             )
         return controlled_karts_idxs
 
+    def get_controlled_kart_mask(self) -> List[bool]:
+        return self._controlled_kart_mask
+
     def get_all_karts(self) -> List[pystk.Kart]:
         return self.state.karts
 
@@ -226,10 +270,81 @@ class Race:
             )
         }
 
-    def observe(self) -> ObsType:
-        return np.array(
-            list(map(lambda x: x.image, self.race.render_data)), dtype=np.uint8
-        )[self.get_controlled_kart_mask()]
+    def get_kart_states(
+        self,
+    ) -> Tuple[npt.NDArray[np.float32], npt.NDArray[np.float32], npt.NDArray[np.float32]]:
+        """Locations (N, 3), velocities (N, 3) and overall distances (N,) of all the karts."""
+        karts = self.get_all_karts()
+        locations = np.array([kart.location for kart in karts], dtype=np.float32).reshape(-1, 3)
+        velocities = np.array([kart.velocity for kart in karts], dtype=np.float32).reshape(-1, 3)
+        distances = np.array([kart.overall_distance for kart in karts], dtype=np.float32)
+        return locations, velocities, distances
+
+    def relative_features(self) -> npt.NDArray[np.float32]:
+        """
+        How every kart, AI karts included, looks from every controlled kart, see
+        `RELATIVE_FEATURES`. Computed once per step in a single broadcasted pass.
+
+        :returns: array of shape (num_controlled, num_karts, len(RELATIVE_FEATURES)), the row of
+            a kart about itself is all zeros
+        """
+        if self._relative_features is not None:
+            return self._relative_features
+        locations, velocities, distances = self.get_kart_states()
+        idxs = self._controlled_kart_idxs
+        num_karts = len(distances)
+
+        features = np.empty(
+            (len(idxs), num_karts, len(Race.RELATIVE_FEATURES)), dtype=np.float32
+        )
+        delta_locations = locations[None, :, :] - locations[idxs, None, :]
+        features[..., 0:3] = delta_locations
+        features[..., 3:6] = velocities[None, :, :] - velocities[idxs, None, :]
+        features[..., 6] = np.linalg.norm(delta_locations, axis=-1)
+        features[..., 7] = distances[None, :] - distances[idxs, None]
+        features[..., 8] = self._controlled_kart_mask
+        features[..., 9] = 1.0
+        features[np.arange(len(idxs)), idxs] = 0.0
+        self._relative_features = features
+        return features
+
+    def nearest_relative_features(self, k: int) -> npt.NDArray[np.float32]:
+        """
+        `relative_features` of the k nearest opponents of every controlled kart, closest first.
+        The shape doesn't depend on the number of karts, missing opponents are zero rows with
+        `valid` set to 0.
+
+        :returns: array of shape (num_controlled, k, len(RELATIVE_FEATURES))
+        """
+        features = self.relative_features()
+        num_controlled, num_karts, num_features = features.shape
+        distances = features[..., 6].copy()
+        # a kart is never its own opponent
+        distances[np.arange(num_controlled), self._controlled_kart_idxs] = np.inf
+        order = np.argsort(distances, axis=1, kind="stable")[:, : min(k, num_karts - 1)]
+
+        nearest = np.zeros((num_controlled, k, num_features), dtype=np.float32)
+        nearest[:, : order.shape[1]] = np.take_along_axis(features, order[..., None], axis=1)
+        return nearest
+
+    def observe(self, active: Optional[npt.NDArray[np.bool_]] = None) -> ObsType:
+        """
+        :param active: controlled karts whose frames are copied, the rows of the others are
+            zeros. All of them if None.
+        """
+        render_data = self.race.render_data
+        if active is None or active.all():
+            obs = np.array(
+                [render_data[i].image for i in self._controlled_kart_idxs], dtype=np.uint8
+            )
+            self._frame_shape = obs.shape[1:]
+            return obs
+        if self._frame_shape is None:
+            self._frame_shape = np.shape(render_data[self._controlled_kart_idxs[0]].image)
+        obs = np.zeros((len(self._controlled_kart_idxs), *self._frame_shape), dtype=np.uint8)
+        for row in np.flatnonzero(active):
+            obs[row] = render_data[self._controlled_kart_idxs[row]].image
+        return obs
 
     def observe_all(self) -> ObsType:
         return np.array(
@@ -237,18 +352,30 @@ class Race:
         )
 
     def step(
-        self, actions: Optional[Union[pystk.Action, Iterable[pystk.Action]]]
-    ) -> ObsType:
+        self,
+        actions: Optional[Union[pystk.Action, Iterable[pystk.Action]]],
+        observe: bool = True,
+        active: Optional[npt.NDArray[np.bool_]] = None,
+    ) -> Optional[ObsType]:
+        """
+        :param observe: copy out the rendered frames, skipped for intermediate frame skip steps
+        :param active: controlled karts whose frames are copied, see `observe`
+        """
         if actions is not None:
             self.race.step(actions)
         else:
             self.race.step()
 
         self.state.update()
-        self.track.update()
-        return self.observe()
+        self._relative_features = None
+        return self.observe(active) if observe else None
 
     def reset(self) -> ObsType:
+        """Restarts the race on the same track with the same karts, much cheaper than a new Race."""
+        self.race.restart()
+        self.race.step()
+        self.state.update()
+        self._relative_features = None
         return self.observe()
 
     def close(self):
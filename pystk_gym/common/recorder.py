@@ -0,0 +1,199 @@
+import os
+import signal
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pystk
+
+MAGIC = b"PSTKFLT1"
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("num_agents", np.int64),
+        ("capacity", np.int64),
+        # number of records written so far, the next one goes to cursor % capacity
+        ("cursor", np.int64),
+        ("episode", np.int64),
+    ]
+)
+# phases of an env step that are timed, in seconds
+PHASES = ["race", "info", "reward", "terminal", "total"]
+# pystk.Action fields, in MultiDiscreteAction.ACTIONS order
+ACTION_FIELDS = ["acceleration", "brake", "steer", "fire", "drift", "nitro", "rescue"]
+COUNTERS = ["jump_count", "backward_count", "no_movement_count", "out_of_track_count"]
+
+
+def record_dtype(num_agents: int) -> np.dtype:
+    """Layout of one step record, every field has a fixed size so records can be overwritten."""
+    return np.dtype(
+        [
+            ("step", np.int64),
+            ("episode", np.int64),
+            ("wall_time", np.float64),
+            ("actions", np.float32, (num_agents, len(ACTION_FIELDS))),
+            ("location", np.float32, (num_agents, 3)),
+            ("velocity", np.float32, (num_agents, 3)),
+            ("overall_distance", np.float32, (num_agents,)),
+            ("reward", np.float32, (num_agents,)),
+            ("terminated", np.bool_, (num_agents,)),
+            ("counters", np.int32, (num_agents, len(COUNTERS))),
+            ("timings", np.float32, (len(PHASES),)),
+        ]
+    )
+
+
+class FlightRecorder:
+    """
+    Fixed size circular log of the last `capacity` env steps, in a memory-mapped file.
+
+    Every step overwrites one record in place, so the cost per step is constant and the file
+    never grows. The records live in the page cache of the file, they survive a crash of the
+    process and can be read back with `read_records`.
+    """
+
+    def __init__(self, path: str, num_agents: int, capacity: int = 4096):
+        """
+        :param path: file backing the recorder, it is overwritten
+        :param num_agents: number of controlled karts of the env
+        :param capacity: number of steps kept
+        """
+        self.path = path
+        self.num_agents = num_agents
+        self.capacity = capacity
+        self.dtype = record_dtype(num_agents)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as file:
+            file.truncate(HEADER_DTYPE.itemsize + capacity * self.dtype.itemsize)
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        self._header["magic"] = MAGIC
+        self._header["num_agents"] = num_agents
+        self._header["capacity"] = capacity
+        self._header["cursor"] = 0
+        self._header["episode"] = 0
+        self._records = np.memmap(
+            path, dtype=self.dtype, mode="r+", offset=HEADER_DTYPE.itemsize, shape=(capacity,)
+        )
+        self._cursor = 0
+        self._episode = 0
+        self._actions = np.zeros((num_agents, len(ACTION_FIELDS)), dtype=np.float32)
+
+    def mark_reset(self):
+        """Starts a new episode, the following records carry its index."""
+        self._episode += 1
+        self._header["episode"] = self._episode
+
+    def record(
+        self,
+        step: int,
+        wall_time: float,
+        actions: Sequence[pystk.Action],
+        karts: Sequence[pystk.Kart],
+        counters: npt.ArrayLike,
+        rewards: npt.NDArray[np.float32],
+        terminated: npt.NDArray[np.bool_],
+        timings: Sequence[float],
+    ):
+        """
+        Writes the record of one env step over the oldest one.
+
+        :param karts: pystk karts of the agents, in agent index order
+        :param counters: array of shape (num_agents, len(COUNTERS))
+        :param timings: seconds spent in every one of the `PHASES`
+        """
+        for i, action in enumerate(actions):
+            self._actions[i] = [getattr(action, name) for name in ACTION_FIELDS]
+        # a one element slice is a view into the file, a scalar index would be a copy
+        record = self._records[self._cursor % self.capacity : self._cursor % self.capacity + 1]
+        record["step"] = step
+        record["episode"] = self._episode
+        record["wall_time"] = wall_time
+        record["actions"] = self._actions
+        record["location"] = [kart.location for kart in karts]
+        record["velocity"] = [kart.velocity for kart in karts]
+        record["overall_distance"] = [kart.overall_distance for kart in karts]
+        record["reward"] = rewards
+        record["terminated"] = terminated
+        record["counters"] = counters
+        record["timings"] = timings
+        # the cursor moves only once the record is complete
+        self._cursor += 1
+        self._header["cursor"] = self._cursor
+
+    def records(self, last: Optional[int] = None) -> np.ndarray:
+        """Copy of the recorded steps, oldest first, only the `last` ones if given."""
+        return _ordered(self._records, self._cursor, self.capacity, last)
+
+    def dump(self, path: Optional[str] = None, last: Optional[int] = None) -> str:
+        """
+        Writes the recorded steps to a npz file, one array per record field.
+
+        :param path: npz file, next to the recorder file if None
+        """
+        path = f"{self.path}.dump.npz" if path is None else path
+        dump_records(self.records(last), path)
+        return path
+
+    def dump_on_signal(self, signum: int = signal.SIGUSR1, path: Optional[str] = None):
+        """Dumps the recorded steps whenever the process receives `signum`, main thread only."""
+
+        def handler(*_):
+            self.dump(path)
+
+        signal.signal(signum, handler)
+
+    def flush(self):
+        self._records.flush()
+        self._header.flush()
+
+    def close(self):
+        self.flush()
+        del self._records
+        del self._header
+
+
+def _ordered(
+    records: np.ndarray, cursor: int, capacity: int, last: Optional[int] = None
+) -> np.ndarray:
+    count = min(cursor, capacity)
+    count = count if last is None else min(count, last)
+    idxs = np.arange(cursor - count, cursor) % capacity
+    return np.array(records[idxs])
+
+
+def read_records(path: str, last: Optional[int] = None) -> np.ndarray:
+    """Reads the steps of a recorder file, oldest first, also after the writer crashed."""
+    header = np.memmap(path, dtype=HEADER_DTYPE, mode="r", shape=(1,))[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a flight recorder file.")
+    records = np.memmap(
+        path,
+        dtype=record_dtype(int(header["num_agents"])),
+        mode="r",
+        offset=HEADER_DTYPE.itemsize,
+        shape=(int(header["capacity"]),),
+    )
+    return _ordered(records, int(header["cursor"]), int(header["capacity"]), last)
+
+
+def dump_records(records: np.ndarray, path: str):
+    fields: Dict[str, np.ndarray] = {name: records[name] for name in records.dtype.names}
+    np.savez(path, phases=np.array(PHASES), counter_names=np.array(COUNTERS), **fields)
+
+
+def format_records(records: np.ndarray, agent: int = 0) -> List[str]:
+    """One line per step for one agent, the most useful fields for a quick look."""
+    lines = [
+        f"{'episode':>7} {'step':>6} {'reward':>8} {'done':>5} {'dist':>8} {'speed':>7} "
+        + " ".join(f"{phase:>8}" for phase in PHASES)
+    ]
+    for record in records:
+        speed = float(np.linalg.norm(record["velocity"][agent]))
+        lines.append(
+            f"{record['episode']:>7} {record['step']:>6} {record['reward'][agent]:>8.3f} "
+            f"{bool(record['terminated'][agent])!s:>5} "
+            f"{record['overall_distance'][agent]:>8.1f} {speed:>7.2f} "
+            + " ".join(f"{timing * 1e3:>6.2f}ms" for timing in record["timings"])
+        )
+    return lines
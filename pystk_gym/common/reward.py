@@ -1,4 +1,4 @@
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Mapping
 
 import numpy as np
 import pystk
@@ -21,7 +21,7 @@ def get_reward_fn() -> Callable:
 
     no_movement_threshold = 5
 
-    def reward_fn(action: pystk.Action, info: Dict[Info, Any]) -> float:
+    def reward_fn(action: pystk.Action, info: Mapping[Info, Any]) -> float:
         reward = -0.02
         if action.nitro and info[Info.NITRO]:
             reward += Reward.NITRO
@@ -67,4 +67,18 @@ def get_reward_fn() -> Callable:
 
         return np.clip(reward, -10, 10)
 
+    # the Info fields read above, RaceEnv makes sure they are tracked
+    reward_fn.info_keys = [
+        Info.NITRO,
+        Info.VELOCITY,
+        Info.POWERUP,
+        Info.DONE,
+        Info.RANK,
+        Info.IS_INSIDE_TRACK,
+        Info.BACKWARD,
+        Info.NO_MOVEMENT,
+        Info.DELTA_DIST,
+        Info.NO_MOVEMENT_COUNT,
+        Info.JUMPING,
+    ]
     return reward_fn
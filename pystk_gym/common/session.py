@@ -0,0 +1,47 @@
+import threading
+from typing import Optional, Tuple
+
+import pystk
+
+from .graphics import GraphicConfig
+
+# pystk can only be initialized once per process, so every env in the process shares one session.
+_lock = threading.Lock()
+_graphics_key: Optional[Tuple[int, int, str]] = None
+_refcount = 0
+
+
+def _key(graphic_config: GraphicConfig) -> Tuple[int, int, str]:
+    return (graphic_config.width, graphic_config.height, graphic_config.graphic_quality.name)
+
+
+def acquire(graphic_config: GraphicConfig):
+    """
+    Initializes pystk with the graphic config, or reuses the running session if it was started
+    with the same config.
+    """
+    global _graphics_key, _refcount
+    with _lock:
+        key = _key(graphic_config)
+        if _graphics_key != key:
+            if _refcount > 0:
+                raise RuntimeError(
+                    f"pystk is already running with graphics {_graphics_key}, "
+                    f"can't start another session with {key} in the same process."
+                )
+            if _graphics_key is not None:
+                pystk.clean()
+            pystk.init(graphic_config.get_pystk_config())
+            _graphics_key = key
+        _refcount += 1
+
+
+def release():
+    """Releases a session acquired with `acquire`, pystk is cleaned up with the last one."""
+    global _graphics_key, _refcount
+    with _lock:
+        assert _refcount > 0, "release called without a matching acquire"
+        _refcount -= 1
+        if _refcount == 0:
+            pystk.clean()
+            _graphics_key = None
@@ -0,0 +1,109 @@
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+
+
+class StallConfig(NamedTuple):
+    """
+    When an agent counts as stalled, judged over its last `window` env steps. Every enabled
+    check can flag an agent on its own, None disables a check.
+    """
+
+    window: int = 50
+    # distance down the track covered over the window, negative when driving backwards
+    min_progress: Optional[float] = 5.0
+    # mean speed over the window
+    min_speed: Optional[float] = 1.0
+    # path nodes advanced over the window, looking the node up costs time so it is off by default
+    min_node_advance: Optional[int] = None
+    # rescue stalled agents (pystk puts the kart back on the track) instead of truncating them
+    rescue: bool = False
+    # rescues per agent and episode, agents that stall again afterwards are truncated
+    max_rescues: int = 2
+
+
+class StallDetector:
+    """
+    Windowed stall checks over the recent progress of every agent.
+
+    The per step progress, speed and node advance of the agents go to a ring buffer of
+    `window` rows and running sums over it are kept, so an update costs the same whatever the
+    window. An agent is only judged once it has a full window since its last reset.
+    """
+
+    SIGNALS = ["progress", "speed", "node_advance"]
+
+    def __init__(self, config: StallConfig, num_agents: int, num_nodes: int = 1):
+        """
+        :param num_nodes: number of path nodes of the track, node advances wrap around it
+        """
+        self.config = config
+        self.num_nodes = num_nodes
+        window = config.window
+        # bounds of the window sums, the speed one is a mean
+        limits = [
+            config.min_progress,
+            None if config.min_speed is None else config.min_speed * window,
+            config.min_node_advance,
+        ]
+        self._enabled = np.array([limit is not None for limit in limits])
+        self._limits = np.array([0.0 if limit is None else limit for limit in limits])[:, None]
+
+        num_signals = len(StallDetector.SIGNALS)
+        self._values = np.zeros((window, num_signals, num_agents), dtype=np.float64)
+        self._sums = np.zeros((num_signals, num_agents), dtype=np.float64)
+        self._counts = np.zeros(num_agents, dtype=np.int64)
+        self._cursor = 0
+        self._distances = np.zeros(num_agents, dtype=np.float64)
+        self._node_idxs = np.zeros(num_agents, dtype=np.int64)
+
+    def reset(
+        self,
+        agents: Union[slice, npt.NDArray[np.int64]],
+        distances: npt.ArrayLike,
+        node_idxs: npt.ArrayLike,
+    ):
+        """
+        Clears the window of some agents, after a rescue or a reset.
+
+        :param agents: the agents to clear, `slice(None)` for all of them
+        :param distances: their distance down the track, the baseline of their progress
+        :param node_idxs: their path node
+        """
+        self._values[:, :, agents] = 0
+        self._sums[:, agents] = 0
+        self._counts[agents] = 0
+        self._distances[agents] = distances
+        self._node_idxs[agents] = node_idxs
+
+    def update(
+        self,
+        racing: npt.NDArray[np.bool_],
+        distances: npt.NDArray[np.float64],
+        speeds: npt.NDArray[np.float64],
+        node_idxs: npt.NDArray[np.int64],
+    ) -> npt.NDArray[np.bool_]:
+        """
+        Accounts for one env step, the readings of the agents that aren't racing are ignored.
+
+        :param distances: distance down the track of every agent, growing over the laps
+        :param speeds: speed of every agent
+        :param node_idxs: path node of every agent, zeros if the node check is disabled
+        :returns: the agents that stalled
+        """
+        advance = (node_idxs - self._node_idxs) % self.num_nodes
+        # going back over the start line is a small negative advance, not a large positive one
+        advance = np.where(advance > self.num_nodes // 2, advance - self.num_nodes, advance)
+        row = np.stack((distances - self._distances, speeds, advance)) * racing
+
+        slot = self._values[self._cursor]
+        self._sums += row - slot
+        slot[:] = row
+        self._cursor = (self._cursor + 1) % self.config.window
+        self._counts += racing
+        self._distances = np.where(racing, distances, self._distances)
+        self._node_idxs = np.where(racing, node_idxs, self._node_idxs)
+
+        below = (self._sums < self._limits)[self._enabled].any(axis=0)
+        return racing & (self._counts >= self.config.window) & below
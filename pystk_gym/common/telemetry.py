@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+
+class RingBuffer:
+    """Fixed size numpy ring buffer of rows, appending is O(1) and never allocates."""
+
+    def __init__(self, capacity: int, width: int = 1, dtype: npt.DTypeLike = np.float64):
+        self.capacity = capacity
+        self.data = np.zeros((capacity, width), dtype=dtype)
+        self.count = 0
+
+    def append(self, row: Any):
+        self.data[self.count % self.capacity] = row
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def values(self) -> npt.NDArray:
+        """The stored rows, oldest first."""
+        if self.count <= self.capacity:
+            return self.data[: self.count]
+        start = self.count % self.capacity
+        return np.concatenate((self.data[start:], self.data[:start]))
+
+
+class Telemetry:
+    """
+    Rolling episode telemetry. Episodes are kept in fixed size ring buffers per (track, kart) and
+    aggregated only when a snapshot is requested, recording is O(1).
+    """
+
+    EPISODE_FIELDS = [
+        "return",
+        "length",
+        "finish_time",
+        "rank",
+        "out_of_track",
+        "backward",
+        "no_movement",
+    ]
+    PREFIX = "pystk_gym"
+
+    def __init__(self, capacity: int = 1024):
+        """
+        :param capacity: number of episodes (and resets) kept per track and kart
+        """
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._episodes: Dict[Tuple[str, str], RingBuffer] = {}
+        self._reset_latency: Dict[str, RingBuffer] = {}
+        self._steps_per_sec: Dict[str, RingBuffer] = {}
+        self._counters: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # collectors are sent back from worker processes, locks and servers stay behind
+        state = self.__dict__.copy()
+        state["_counters"] = dict(self._counters)
+        del state["_lock"], state["_server"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._counters = defaultdict(float, self._counters)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _buffer(self, buffers: Dict[Any, RingBuffer], key: Any, width: int = 1) -> RingBuffer:
+        buffer = buffers.get(key)
+        if buffer is None:
+            buffer = buffers[key] = RingBuffer(self.capacity, width)
+        return buffer
+
+    def record_episode(self, track: str, kart: str, values: Sequence[float]):
+        """
+        :param values: one value per field in `EPISODE_FIELDS`
+        """
+        with self._lock:
+            self._buffer(self._episodes, (track, kart), len(Telemetry.EPISODE_FIELDS)).append(
+                values
+            )
+
+    def record_reset(self, track: str, latency: float):
+        with self._lock:
+            self._buffer(self._reset_latency, track).append(latency)
+
+    def record_steps_per_sec(self, track: str, steps_per_sec: float):
+        with self._lock:
+            self._buffer(self._steps_per_sec, track).append(steps_per_sec)
+
+    def increment(self, name: str, value: float = 1, track: str = ""):
+        """Increments a monotonic counter like crashes or saved steps."""
+        with self._lock:
+            self._counters[(name, track)] += value
+
+    def merge(self, other: Telemetry):
+        """Adds the episodes and counters recorded by another collector (e.g. of a worker)."""
+        groups = (
+            (self._episodes, other._episodes, len(Telemetry.EPISODE_FIELDS)),
+            (self._reset_latency, other._reset_latency, 1),
+            (self._steps_per_sec, other._steps_per_sec, 1),
+        )
+        with self._lock:
+            for buffers, other_buffers, width in groups:
+                for key, other_buffer in other_buffers.items():
+                    buffer = self._buffer(buffers, key, width)
+                    for row in other_buffer.values():
+                        buffer.append(row)
+            for key, value in other._counters.items():
+                self._counters[key] += value
+
+    @staticmethod
+    def _summary(values: npt.NDArray) -> Dict[str, float]:
+        if len(values) == 0:
+            return {"count": 0}
+        return {
+            "count": int(len(values)),
+            "mean": float(np.mean(values)),
+            "p50": float(np.percentile(values, 50)),
+            "p90": float(np.percentile(values, 90)),
+            "min": float(np.min(values)),
+            "max": float(np.max(values)),
+        }
+
+    def _group_episodes(self, key_idx: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+        groups: Dict[str, List[npt.NDArray]] = defaultdict(list)
+        for key, buffer in self._episodes.items():
+            groups[key[key_idx]].append(buffer.values())
+        return {
+            name: {
+                field: Telemetry._summary(episodes[:, i])
+                for i, field in enumerate(Telemetry.EPISODE_FIELDS)
+            }
+            for name, episodes in ((name, np.concatenate(rows)) for name, rows in groups.items())
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregates everything recorded so far per track and per kart."""
+        with self._lock:
+            return {
+                "tracks": self._group_episodes(0),
+                "karts": self._group_episodes(1),
+                "reset_latency": {
+                    track: Telemetry._summary(buffer.values()[:, 0])
+                    for track, buffer in self._reset_latency.items()
+                },
+                "steps_per_sec": {
+                    track: Telemetry._summary(buffer.values()[:, 0])
+                    for track, buffer in self._steps_per_sec.items()
+                },
+                "counters": [
+                    {"name": name, "track": track, "value": value}
+                    for (name, track), value in self._counters.items()
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        """The snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def add_summaries(metric: str, label: str, summaries: Dict[str, Dict[str, float]]):
+            for name, summary in summaries.items():
+                for stat, value in summary.items():
+                    lines.append(f'{self.PREFIX}_{metric}_{stat}{{{label}="{name}"}} {value}')
+
+        for group, label in (("tracks", "track"), ("karts", "kart")):
+            for name, fields in snapshot[group].items():
+                for field, summary in fields.items():
+                    add_summaries(f"episode_{field}", label, {name: summary})
+        add_summaries("reset_latency_seconds", "track", snapshot["reset_latency"])
+        add_summaries("steps_per_sec", "track", snapshot["steps_per_sec"])
+        for counter in snapshot["counters"]:
+            labels = f'{{track="{counter["track"]}"}}' if counter["track"] else ""
+            lines.append(f'{self.PREFIX}_{counter["name"]}_total{labels} {counter["value"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, fmt: str = "json"):
+        """
+        Writes a snapshot to a local file.
+
+        :param fmt: either "json" or "prometheus"
+        """
+        if fmt == "json":
+            content = json.dumps(self.snapshot(), indent=2)
+        elif fmt == "prometheus":
+            content = self.to_prometheus()
+        else:
+            raise ValueError(f"unknown telemetry format {fmt}")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def serve(self, port: int = 9464) -> ThreadingHTTPServer:
+        """
+        Serves `/metrics` (Prometheus) and `/json` on localhost from a daemon thread.
+        """
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = telemetry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/json":
+                    body, content_type = json.dumps(telemetry.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.close()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,29 +1,51 @@
 import functools
+import json
 import time
 from abc import abstractmethod
 from copy import copy
 from typing import (
+    TYPE_CHECKING,
     Any,
     Callable,
     Dict,
+    Iterable,
     List,
     Literal,
+    Mapping,
     Optional,
     Protocol,
     Tuple,
+    Type,
     TypeVar,
+    Union,
 )
 
 import numpy as np
+import numpy.typing as npt
 import pystk
 from gymnasium import spaces
 from pettingzoo import ParallelEnv
 
-from ..common.actions import ActionType, MultiDiscreteAction
-from ..common.graphics import EnvViewer, GraphicConfig
-from ..common.info import Info
+from ..common import session
+from ..common.actions import (
+    ActionType,
+    ContinuousAction,
+    HybridAction,
+    MultiDiscreteAction,
+)
+from ..common.coverage import Coverage
+from ..common.graphics import GraphicConfig
+from ..common.info import Info, StepInfo, stack_infos
 from ..common.kart import Kart
+from ..common.normalization import Normalizer
 from ..common.race import ObsType, Race, RaceConfig
+from ..common.recorder import ACTION_FIELDS, PHASES, FlightRecorder
+from ..common.reward import get_reward_fn
+from ..common.stall import StallConfig, StallDetector
+from ..common.telemetry import Telemetry
+
+if TYPE_CHECKING:
+    from ..common.viewer import EnvViewer
 
 # https://github.com/python/typing/issues/59
 C = TypeVar("C", bound="Comparable")
@@ -42,6 +64,15 @@ class Comparable(Protocol):
 
 class RaceEnv(ParallelEnv):
     TERMINAL_LIMIT = 100
+    # sent to pystk for the karts of agents that finished their episode
+    IDLE_ACTION = pystk.Action()
+    # fields read by `_terminal`
+    TERMINAL_INFO_KEYS = [
+        Info.DONE,
+        Info.BACKWARD_COUNT,
+        Info.NO_MOVEMENT_COUNT,
+        Info.OUT_OF_TRACK_COUNT,
+    ]
     metadata = {
         "render.modes": ["agent", "human", "rgb_array"],
     }
@@ -54,37 +85,141 @@ class RaceEnv(ParallelEnv):
         max_step_cnt: int = 1000,
         return_info: bool = True,
         render_mode: Literal["agent", "human", "rgb_array"] = "rgb_array",
+        info_keys: Optional[Iterable[Info]] = None,
+        telemetry: Optional[Telemetry] = None,
+        frame_skip: int = 1,
+        flight_recorder: Optional[Union[str, FlightRecorder]] = None,
+        coverage: Optional[Coverage] = None,
+        normalizer: Optional[Normalizer] = None,
+        stall_detection: Optional[StallConfig] = None,
+        action_class: Type[
+            Union[MultiDiscreteAction, ContinuousAction, HybridAction]
+        ] = MultiDiscreteAction,
     ):
-        self.action_class = MultiDiscreteAction()
+        """
+        :param info_keys: the Info fields the caller needs, None for all of them. Fields used by
+            the termination check and by `reward_func.info_keys` (if set) are always added.
+        :param telemetry: collector for episode statistics, can be shared between envs
+        :param frame_skip: number of race steps every action is repeated for
+        :param flight_recorder: recorder (or the path of a new one) keeping the last steps of
+            the env for post-mortem debugging
+        :param coverage: collector for where the karts go on each track, can be shared between
+            envs. Finding the path node of every kart costs time, so it is off by default.
+        :param normalizer: statistics the rewards and relative features are normalized with,
+            can be shared between envs. The telemetry and flight recorder keep the raw rewards.
+        :param stall_detection: truncates (or rescues) agents that stopped making progress,
+            long before the termination counters or the step limit would end their episode
+        :param action_class: the action space of every agent, `ContinuousAction` and
+            `HybridAction` steer and accelerate smoothly, which allows coarser steps
+        """
+        self.action_class = action_class()
         self.graphic_config = graphic_config
         self.max_step_cnt = max_step_cnt
         self.reward_func = reward_func
         self.render_mode = render_mode
+        self.return_info = return_info
         self.steps = 0
 
         self.graphics = graphic_config.get_pystk_config()
-        pystk.init(self.graphics)
-        self.race = Race(race_config.build())
+        session.acquire(graphic_config)
+        self.race_config = race_config
+        self.frame_skip = frame_skip
+        # every env owns its random stream, `reset(seed=...)` reseeds it
+        self.np_random = np.random.default_rng(race_config.seed)
         self.observation_shape = (
             self.graphics.screen_height,
             self.graphics.screen_width,
             3,
         )
-        self._make_karts(return_info)
-        self.nitro_locs = self.race.get_nitro_locs()
+        # spaces are shared by all agents, lru_cache on the methods would keep every env alive
+        self._observation_space = spaces.Box(
+            low=np.zeros(self.observation_shape, dtype=np.uint8),
+            high=np.full(self.observation_shape, 255, dtype=np.uint8),
+            dtype=np.uint8,
+        )
+        self.info_keys = self._resolve_info_keys(info_keys)
+        self._rankings: Optional[Dict[int, int]] = None
+        self.race: Optional[Race] = None
+        self._build_race(race_config.build(self.np_random))
 
-        self.env_viewer: Optional[EnvViewer] = None
+        self.env_viewer: Optional["EnvViewer"] = None
         if render_mode in ("human", "agent"):
             assert race_config.num_karts_controlled == 1 or race_config.num_karts == 1
+            # imported here so that headless envs never pay for pygame
+            from ..common.viewer import EnvViewer
+
             self.env_viewer = EnvViewer(
                 self.graphic_config, human_controlled=render_mode == "human"
             )
 
+        # agent index order used by the batch api, resolved once
         self.possible_agents = [kart.id for kart in self.get_controlled_karts()]
         self.agents = copy(self.possible_agents)
         self.start_time = time.time()
 
-    def _make_karts(self, return_info: bool):
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        self.coverage = coverage
+        self._active = np.ones(len(self.possible_agents), dtype=bool)
+        self._episode_returns = np.zeros(len(self.possible_agents), dtype=np.float64)
+        self.normalizer = normalizer
+        # discounted returns the reward scale is estimated from
+        self._discounted_returns = np.zeros(len(self.possible_agents), dtype=np.float64)
+        # the features of a step are counted once, whichever accessor reads them
+        self._features_counted_step = -1
+        self._final_infos: List[Optional[Dict[Info, Any]]] = [None] * len(self.possible_agents)
+        # the flags each agent ended its episode with, reported until the reset
+        self._terminated = np.zeros(len(self.possible_agents), dtype=bool)
+        self._truncated = np.zeros(len(self.possible_agents), dtype=bool)
+
+        self.stall_detection = stall_detection
+        # built on reset, the window checks of the current track
+        self._stall_detector: Optional[StallDetector] = None
+        self._rescues = np.zeros(len(self.possible_agents), dtype=np.int64)
+        self._rescue_pending = np.zeros(len(self.possible_agents), dtype=bool)
+
+        # a recorder created from a path belongs to the env and is closed with it
+        self._owns_flight_recorder = isinstance(flight_recorder, str)
+        if isinstance(flight_recorder, str):
+            flight_recorder = FlightRecorder(flight_recorder, len(self.possible_agents))
+        self.flight_recorder: Optional[FlightRecorder] = flight_recorder
+
+    @classmethod
+    def from_config_file(
+        cls, path: str, reward_func: Optional[Callable] = None, **kwargs: Any
+    ) -> "RaceEnv":
+        """
+        Builds an env from a json config file, like the one written by `pystk_gym.tools.autotune`.
+
+        :param path: json file with `graphic_config`, `race_config` and optional `env_kwargs`
+        :param reward_func: reward function, the default one if None
+        :param kwargs: override the `env_kwargs` of the file
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            config = json.load(file)
+        return cls(
+            GraphicConfig.from_dict(config["graphic_config"]),
+            RaceConfig.from_dict(config["race_config"]),
+            get_reward_fn() if reward_func is None else reward_func,
+            **{**config.get("env_kwargs", {}), **kwargs},
+        )
+
+    def _resolve_info_keys(self, info_keys: Optional[Iterable[Info]]) -> List[Info]:
+        if info_keys is None:
+            return list(Info)
+        required = set(info_keys) | set(RaceEnv.TERMINAL_INFO_KEYS)
+        required |= set(getattr(self.reward_func, "info_keys", list(Info)))
+        return [key for key in Info if key in required]
+
+    def _build_race(self, config: pystk.RaceConfig):
+        # pystk only runs one race at a time
+        if self.race is not None:
+            self.race.close()
+        self.race = Race(config)
+        self._race_fresh = True
+        self.nitro_locs = np.array(self.race.get_nitro_locs(), dtype=np.float32).reshape(-1, 3)
+        self._make_karts()
+
+    def _make_karts(self):
         is_reverse, path_width, path_lines, path_distance = (
             self.race.get_race_info()["reverse"],
             self.race.get_path_width(),
@@ -98,106 +233,403 @@ class RaceEnv(ParallelEnv):
                 path_width,
                 path_lines,
                 path_distance,
-                return_info=return_info,
+                info_keys=self.info_keys,
             )
             for kart in self.race.get_controlled_karts()
         ]
+        for kart in self.controlled_karts:
+            kart.add_info_resolver(Info.RANK, functools.partial(self._get_rank, kart))
+            kart.add_info_resolver(Info.NITRO, functools.partial(self._is_on_nitro, kart))
 
-    def _to_stk_action(
-        self, actions: Dict[AgentId, ActionType]
-    ) -> Dict[AgentId, pystk.Action]:
-        return {
-            agent_id: self.action_class.get_pystk_action(action)
-            for agent_id, action in actions.items()
-        }
-
-    def _update_info_dict_with_race_info(self, infos: Dict[AgentId, Dict[Info, Any]]):
-        all_kart_rankings = self.race.get_all_kart_rankings()
-        for info, kart in zip(infos.values(), self.get_controlled_karts()):
-            info[Info.RANK] = all_kart_rankings[kart.id]
-            kart_loc = np.array(info[Info.LOCATION])
-            info[Info.NITRO] = any(
-                np.sqrt(np.sum(np.square(kart_loc - nitro_loc))) <= 2
-                for nitro_loc in self.nitro_locs
-            )
+    def _get_rank(self, kart: Kart) -> int:
+        # the rankings are shared by all karts, so they are computed once per step
+        if self._rankings is None:
+            self._rankings = self.race.get_all_kart_rankings()
+        return self._rankings[kart.id]
+
+    def _is_on_nitro(self, kart: Kart) -> bool:
+        if len(self.nitro_locs) == 0:
+            return False
+        kart_loc = np.array(kart.kart.location)
+        return bool(np.any(np.sum(np.square(self.nitro_locs - kart_loc), axis=1) <= 4))
 
     def _get_reward(
-        self, actions: Dict[AgentId, ActionType], infos: Dict[AgentId, dict]
-    ) -> Dict[AgentId, float]:
-        return {
-            agent_id: self.reward_func(
-                self.action_class.get_pystk_action(actions[agent_id]), infos[agent_id]
-            )
-            for agent_id in actions.keys()
-        }
-
-    def _terminal(self, infos: Dict[AgentId, dict]) -> Dict[AgentId, bool]:
-        step_limit_reached = self.steps > self.max_step_cnt
-        return {
-            agent_id: info[Info.OUT_OF_TRACK_COUNT] > RaceEnv.TERMINAL_LIMIT
-            or info[Info.BACKWARD_COUNT] > RaceEnv.TERMINAL_LIMIT
-            or info[Info.NO_MOVEMENT_COUNT] > RaceEnv.TERMINAL_LIMIT
-            or info[Info.DONE]
-            or step_limit_reached
-            for agent_id, info in infos.items()
-        }
-
-    @functools.lru_cache(maxsize=None)
+        self, actions: List[pystk.Action], infos: List[StepInfo]
+    ) -> npt.NDArray[np.float32]:
+        return np.array(
+            [self.reward_func(action, info) for action, info in zip(actions, infos)],
+            dtype=np.float32,
+        )
+
+    def _terminal(self, infos: List[StepInfo]) -> npt.NDArray[np.bool_]:
+        # reaching `max_step_cnt` is a truncation, see `_step`
+        return np.array(
+            [
+                info[Info.OUT_OF_TRACK_COUNT] > RaceEnv.TERMINAL_LIMIT
+                or info[Info.BACKWARD_COUNT] > RaceEnv.TERMINAL_LIMIT
+                or info[Info.NO_MOVEMENT_COUNT] > RaceEnv.TERMINAL_LIMIT
+                or info[Info.DONE]
+                for info in infos
+            ],
+            dtype=bool,
+        )
+
     def get_controlled_karts(self) -> List[Kart]:
         return self.controlled_karts
 
+    def get_normalizer(self) -> Optional[Normalizer]:
+        """The statistics the env normalizes with, None if it doesn't normalize."""
+        return self.normalizer
+
     def is_done(self) -> List[bool]:
         return [
             self.steps > self.max_step_cnt or kart.is_done()
             for kart in self.get_controlled_karts()
         ]
 
-    @functools.lru_cache(maxsize=None)
-    def observation_space(self, agent) -> spaces.Box:
-        return spaces.Box(
-            low=np.zeros(self.observation_shape, dtype=np.uint8),
-            high=np.full(self.observation_shape, 255, dtype=np.uint8),
-            dtype=np.uint8,
+    def relative_features(self) -> npt.NDArray[np.float32]:
+        """
+        Opponent-relative features of the current step, rows follow `self.possible_agents`.
+        See `Race.relative_features`, normalized if the env has a normalizer.
+        """
+        return self._normalize_features(self.race.relative_features())
+
+    def nearest_relative_features(self, k: int) -> npt.NDArray[np.float32]:
+        """Fixed size version of `relative_features`, see `Race.nearest_relative_features`."""
+        return self._normalize_features(self.race.nearest_relative_features(k))
+
+    def _normalize_features(self, features: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+        if self.normalizer is None:
+            return features
+        if self._features_counted_step != self.steps:
+            self._features_counted_step = self.steps
+            all_features = self.race.relative_features()
+            # `valid` is the last column, it is unset in the rows of karts about themselves
+            self.normalizer.update_features(all_features[all_features[..., -1] > 0])
+        # padding rows stay zero
+        return self.normalizer.normalize_features(features) * features[..., -1:]
+
+    def _normalize_rewards(
+        self, rewards: npt.NDArray[np.float32], done: npt.NDArray[np.bool_]
+    ) -> npt.NDArray[np.float32]:
+        racing = self._active
+        self._discounted_returns[racing] = (
+            self._discounted_returns[racing] * self.normalizer.gamma + rewards[racing]
         )
+        self.normalizer.update_returns(self._discounted_returns[racing])
+        self._discounted_returns[done] = 0
+        return self.normalizer.scale_rewards(rewards)
+
+    def observation_space(self, agent) -> spaces.Box:
+        return self._observation_space
 
-    @functools.lru_cache(maxsize=None)
-    def action_space(self, agent) -> spaces.MultiDiscrete:
+    def action_space(self, agent) -> spaces.Space:
         return self.action_class.space()
 
+    def _step(self, actions: List[pystk.Action]) -> Tuple[
+        ObsType,
+        npt.NDArray[np.float32],
+        npt.NDArray[np.bool_],
+        npt.NDArray[np.bool_],
+        List[StepInfo],
+    ]:
+        """
+        Steps the race `frame_skip` times with one pystk.Action per agent, in agent index order.
+        Rewards are summed over the skipped frames, the observation and infos are the ones of the
+        last frame.
+
+        Agents that finished their episode are skipped: their kart gets `IDLE_ACTION`, they
+        get no reward, their observation rows are zeros and their infos are the final ones.
+        They keep the terminated and truncated flags of the step that ended their episode until
+        the next reset.
+        """
+        if self.render_mode == "human":
+            actions[0] = self.env_viewer.current_action
+
+        step_start = time.perf_counter()
+        num_agents = len(self.possible_agents)
+        rewards = np.zeros(num_agents, dtype=np.float32)
+        # the agents racing at the start of the step get an observation
+        observed = self._active.copy()
+        done = ~observed
+        terminated = self._terminated.copy()
+        timings = [0.0] * len(PHASES)
+        if self._rescue_pending.any():
+            actions = self._rescue_actions(actions)
+        if self.return_info:
+            # the infos handed out by the last step keep their fields once the race moves on
+            for kart in self.get_controlled_karts():
+                kart.seal_info()
+        for frame in range(self.frame_skip):
+            racing = ~done
+            if not racing.all():
+                actions = [
+                    action if is_racing else RaceEnv.IDLE_ACTION
+                    for action, is_racing in zip(actions, racing)
+                ]
+            self.steps += 1
+            if self.env_viewer is not None:
+                # keep the race in sync with the wall clock only when someone is watching
+                delta_t = self.steps * self.race.config.step_size - (
+                    time.time() - self.start_time
+                )
+                if delta_t > 0:
+                    time.sleep(delta_t)
+
+            is_last_frame = frame == self.frame_skip - 1
+            phase_start = time.perf_counter()
+            obs = self.race.step(actions, observe=is_last_frame, active=observed)
+            self._race_fresh = False
+            self._rankings = None
+            phase_end = time.perf_counter()
+            timings[0] += phase_end - phase_start
+            infos = [
+                kart.step() if is_racing else self._final_infos[i]
+                for i, (kart, is_racing) in enumerate(zip(self.get_controlled_karts(), racing))
+            ]
+            idxs = np.flatnonzero(racing)
+            racing_infos = [infos[i] for i in idxs]
+            phase_start, phase_end = phase_end, time.perf_counter()
+            timings[1] += phase_end - phase_start
+            rewards[idxs] += self._get_reward([actions[i] for i in idxs], racing_infos)
+            phase_start, phase_end = phase_end, time.perf_counter()
+            timings[2] += phase_end - phase_start
+            terminated[idxs] = done[idxs] = self._terminal(racing_infos)
+            for i in idxs[terminated[idxs]]:
+                # the last infos of an agent are all it reports until the reset
+                self._final_infos[i] = dict(infos[i])
+            timings[3] += time.perf_counter() - phase_end
+            step_limit_reached = self.steps > self.max_step_cnt
+            if (done.all() or step_limit_reached) and not is_last_frame:
+                obs = self.race.observe(observed)
+                break
+
+        # the episode is cut by the step limit, not ended by the race, values should bootstrap
+        truncated = np.full(num_agents, step_limit_reached) & ~done
+        if self._stall_detector is not None and not step_limit_reached:
+            truncated |= self._detect_stalls(~done)
+        for i in np.flatnonzero(truncated):
+            self._final_infos[i] = dict(infos[i])
+        truncated |= self._truncated
+        self._terminated[:], self._truncated[:] = terminated, truncated
+        if self.coverage is not None:
+            self._record_coverage(infos)
+        scaled_rewards = rewards
+        if self.normalizer is not None:
+            scaled_rewards = self._normalize_rewards(rewards, terminated | truncated)
+        self._record_telemetry(rewards, terminated | truncated)
+        if self.flight_recorder is not None:
+            timings[4] = time.perf_counter() - step_start
+            self._record_flight(actions, rewards, terminated, timings)
+        self.agents = [
+            agent
+            for agent, done in zip(self.possible_agents, terminated | truncated)
+            if not done
+        ]
+        return obs, scaled_rewards, terminated, truncated, infos
+
+    def _stall_readings(self) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.int64]]:
+        karts = self.get_controlled_karts()
+        distances = np.array([kart.kart.overall_distance for kart in karts], dtype=np.float64)
+        node_idxs = np.zeros(len(karts), dtype=np.int64)
+        if self.stall_detection.min_node_advance is not None:
+            node_idxs[:] = [kart.node_idx for kart in karts]
+            if self.race.config.reverse:
+                # in the driving direction, like the distances
+                node_idxs = len(self.race.geometry.path_nodes) - 1 - node_idxs
+        return distances, node_idxs
+
+    def _reset_stall_detection(self):
+        num_nodes = len(self.race.geometry.path_nodes)
+        if self._stall_detector is None or self._stall_detector.num_nodes != num_nodes:
+            self._stall_detector = StallDetector(
+                self.stall_detection, len(self.possible_agents), num_nodes
+            )
+        self._stall_detector.reset(slice(None), *self._stall_readings())
+        self._rescues[:] = 0
+        self._rescue_pending[:] = False
+
+    def _detect_stalls(self, racing: npt.NDArray[np.bool_]) -> npt.NDArray[np.bool_]:
+        """Runs the window checks, schedules rescues and returns the agents to truncate."""
+        distances, node_idxs = self._stall_readings()
+        velocities = np.array(
+            [kart.kart.velocity for kart in self.get_controlled_karts()], dtype=np.float64
+        )
+        stalled = self._stall_detector.update(
+            racing, distances, np.linalg.norm(velocities, axis=1), node_idxs
+        )
+        if not stalled.any():
+            return stalled
+        track = self.race.config.track
+        if self.stall_detection.rescue:
+            rescued = stalled & (self._rescues < self.stall_detection.max_rescues)
+            if rescued.any():
+                self._rescues += rescued
+                self._rescue_pending |= rescued
+                # the rescued karts start a new window once they are back on the track
+                idxs = np.flatnonzero(rescued)
+                self._stall_detector.reset(idxs, distances[idxs], node_idxs[idxs])
+                self.telemetry.increment("stall_rescues", int(rescued.sum()), track)
+            stalled &= ~rescued
+        if stalled.any():
+            self.telemetry.increment("stall_truncations", int(stalled.sum()), track)
+            if not (racing & ~stalled).any():
+                # the race steps the episode had left, an upper bound of what the checks saved
+                self.telemetry.increment(
+                    "stall_steps_saved", max(self.max_step_cnt - self.steps, 0), track
+                )
+        return stalled
+
+    def _rescue_actions(self, actions: List[pystk.Action]) -> List[pystk.Action]:
+        # copies, the caller's actions (like the viewer's) are left alone
+        actions = list(actions)
+        for i in np.flatnonzero(self._rescue_pending):
+            rescue = pystk.Action()
+            for name in ACTION_FIELDS:
+                setattr(rescue, name, getattr(actions[i], name))
+            rescue.rescue = True
+            actions[i] = rescue
+        self._rescue_pending[:] = False
+        return actions
+
+    def _record_coverage(self, infos: List[StepInfo]):
+        # only the agents still racing, in forward path node order whatever the direction
+        track = self.coverage.track(self.race.config.track, self.race.geometry.path_nodes)
+        active = np.flatnonzero(self._active)
+        karts = [self.controlled_karts[i] for i in active]
+        node_idxs = np.array([kart.node_idx for kart in karts], dtype=np.int64)
+        if self.race.config.reverse:
+            node_idxs = len(track.path_nodes) - 1 - node_idxs
+        track.record(
+            node_idxs,
+            [kart.kart.location for kart in karts],
+            [
+                (
+                    not infos[i][Info.IS_INSIDE_TRACK],
+                    infos[i][Info.BACKWARD],
+                    infos[i][Info.NO_MOVEMENT],
+                )
+                for i in active
+            ],
+        )
+
+    def _record_telemetry(
+        self, rewards: npt.NDArray[np.float32], done: npt.NDArray[np.bool_]
+    ):
+        self._episode_returns += rewards * self._active
+        finished = done & self._active
+        if not finished.any():
+            return
+        track = self.race.config.track
+        for i in np.flatnonzero(finished):
+            kart = self.controlled_karts[i]
+            self.telemetry.record_episode(
+                track,
+                kart.kart.name,
+                (
+                    self._episode_returns[i],
+                    self.steps,
+                    kart.kart.finish_time,
+                    self._get_rank(kart),
+                    kart.out_of_track_count,
+                    kart.backward_count,
+                    kart.no_movement_count,
+                ),
+            )
+        self._active &= ~done
+        if not self._active.any():
+            self.telemetry.record_steps_per_sec(
+                track, self.steps / max(time.time() - self.start_time, 1e-9)
+            )
+
+    def _record_flight(
+        self,
+        actions: List[pystk.Action],
+        rewards: npt.NDArray[np.float32],
+        terminated: npt.NDArray[np.bool_],
+        timings: List[float],
+    ):
+        karts = self.get_controlled_karts()
+        self.flight_recorder.record(
+            self.steps,
+            time.time(),
+            actions,
+            [kart.kart for kart in karts],
+            [
+                (
+                    kart.jump_count,
+                    kart.backward_count,
+                    kart.no_movement_count,
+                    kart.out_of_track_count,
+                )
+                for kart in karts
+            ],
+            rewards,
+            terminated,
+            timings,
+        )
+
+    def step_batch(
+        self,
+        actions: npt.NDArray[Union[np.float64, np.int64]],
+        columnar_infos: bool = False,
+    ) -> Tuple[
+        ObsType,  # (num_agents, height, width, 3) observations
+        npt.NDArray[np.float32],  # (num_agents,) rewards
+        npt.NDArray[np.bool_],  # (num_agents,) terminated flags
+        npt.NDArray[np.bool_],  # (num_agents,) truncated flags
+        Union[List[Mapping[Info, Any]], Dict[Info, np.ndarray]],  # infos
+    ]:
+        """
+        Array native version of `step`. Row `i` of every input and output belongs to
+        `self.possible_agents[i]`.
+
+        :param actions: array of shape (num_agents, 7), one action per row, see `action_class`
+        :param columnar_infos: return the infos as one array per Info key instead of a list of
+            per agent dicts
+        """
+        obs, rewards, terminated, truncated, infos = self._step(
+            self.action_class.get_pystk_actions(actions)
+        )
+        if not self.return_info:
+            infos = [{} for _ in infos]
+        if columnar_infos:
+            infos = stack_infos(infos)
+        return obs, rewards, terminated, truncated, infos
+
     def step(self, actions: Dict[AgentId, ActionType]) -> Tuple[
         Dict[AgentId, ObsType],  # observation dictionary
         Dict[AgentId, float],  # reward dictionary
         Dict[AgentId, bool],  # terminated dictionary
         Dict[AgentId, bool],  # truncated dictionary
-        Dict[AgentId, Dict[Info, Any]],  # info dictionary
+        Dict[AgentId, Mapping[Info, Any]],  # info dictionary
     ]:
-        self.steps += 1
-        delta_t = self.steps * self.race.config.step_size - (
-            time.time() - self.start_time
-        )
-        if delta_t > 0:
-            time.sleep(delta_t)
-        # TODO: take multiple steps? if so, i have to render intermediate steps
-        if self.render_mode == "human":
-            actions = {
-                self.get_controlled_karts()[0].id: self.env_viewer.current_action
-            }
-        else:
-            actions = self._to_stk_action(actions)
-            actions = dict(sorted(actions.items(), key=lambda x: x[0]))
-
-        obs = dict(zip(actions.keys(), self.race.step(list(actions.values()))))
-        infos = {kart.id: kart.step() for kart in self.get_controlled_karts()}
-        self._update_info_dict_with_race_info(infos)
-        rewards = self._get_reward(actions, infos)
-        terminals = self._terminal(infos)
-        truncated = {kart.id: False for kart in self.get_controlled_karts()}
-        self.agents = [
-            kart.id
-            for kart in self.get_controlled_karts()
-            if not (terminals[kart.id] or truncated[kart.id])
+        # agents without an action (usually the ones that are done) get a no-op action
+        stk_actions = [
+            (
+                self.action_class.get_pystk_action(actions[agent])
+                if agent in actions
+                else pystk.Action()
+            )
+            for agent in self.possible_agents
         ]
-        return obs, rewards, terminals, truncated, infos
+        obs, rewards, terminated, truncated, infos = self._step(stk_actions)
+
+        acting = [
+            (i, agent) for i, agent in enumerate(self.possible_agents) if agent in actions
+        ]
+        return (
+            {agent: obs[i] for i, agent in acting},
+            {agent: rewards[i].item() for i, agent in acting},
+            dict(zip(self.possible_agents, terminated.tolist())),
+            dict(zip(self.possible_agents, truncated.tolist())),
+            dict(
+                zip(
+                    self.possible_agents,
+                    infos if self.return_info else [{} for _ in infos],
+                )
+            ),
+        )
 
     def render(
         self, mode: Literal["agent", "human", "rgb_array"] = "rgb_array"
@@ -212,22 +644,81 @@ class RaceEnv(ParallelEnv):
             self.env_viewer.display(obs[0])
         return None
 
-    def reset(
+    def _reset_race(self, seed: Optional[int], options: dict):
+        if seed is not None:
+            self.np_random = np.random.default_rng(seed)
+        # a seeded reset, another track or a random track per episode needs a new race, otherwise
+        # restarting the current one is enough
+        rebuild = (
+            seed is not None
+            or "track" in options
+            or "reverse" in options
+            or (self.race_config.track is None and not self._race_fresh)
+        )
+        if rebuild:
+            if "track" in options or "reverse" in options:
+                # the options stick for the following episodes
+                self.race_config = copy(self.race_config)
+                self.race_config.track = options.get("track", self.race_config.track)
+                self.race_config.reverse = options.get("reverse", self.race_config.reverse)
+            self._build_race(self.race_config.build(self.np_random, seed=seed))
+        elif not self._race_fresh:
+            self.race.reset()
+            self._race_fresh = True
+
+    def reset_batch(
         self, seed: Optional[int] = None, options: Optional[dict] = None
-    ) -> Tuple[Dict[AgentId, ObsType], Dict[AgentId, Dict[Info, Any]]]:
+    ) -> Tuple[ObsType, List[Dict[Info, Any]]]:
+        """
+        Array native version of `reset`, rows follow `self.possible_agents`.
+
+        :param seed: reseeds the env's random stream and rebuilds the race from it
+        :param options: `track` and/or `reverse` to race on for the next episodes
+        """
+        reset_start = time.time()
+        if self.steps > 0 and self._active.any():
+            self.telemetry.record_steps_per_sec(
+                self.race.config.track, self.steps / max(reset_start - self.start_time, 1e-9)
+            )
+        if self.return_info:
+            for kart in self.get_controlled_karts():
+                kart.seal_info()
+        self._reset_race(seed, {} if options is None else options)
         self.steps = 0
-        reset_obs = self.race.reset()
+        reset_obs = self.race.observe()
         for kart in self.get_controlled_karts():
             kart.reset()
-        obs = {
-            kart.id: obs for kart, obs in zip(self.get_controlled_karts(), reset_obs)
-        }
-        info = {kart.id: {} for kart in self.get_controlled_karts()}
         self.agents = copy(self.possible_agents)
-        return obs, info
+        self._active[:] = True
+        self._episode_returns[:] = 0
+        self._discounted_returns[:] = 0
+        self._features_counted_step = -1
+        self._final_infos = [None] * len(self.possible_agents)
+        self._terminated[:] = False
+        self._truncated[:] = False
+        if self.stall_detection is not None:
+            self._reset_stall_detection()
+        self.start_time = time.time()
+        self.telemetry.record_reset(self.race.config.track, self.start_time - reset_start)
+        if self.flight_recorder is not None:
+            self.flight_recorder.mark_reset()
+        return reset_obs, [{} for _ in self.possible_agents]
+
+    def reset(
+        self, seed: Optional[int] = None, options: Optional[dict] = None
+    ) -> Tuple[Dict[AgentId, ObsType], Dict[AgentId, Dict[Info, Any]]]:
+        reset_obs, infos = self.reset_batch(seed, options)
+        return dict(zip(self.possible_agents, reset_obs)), dict(
+            zip(self.possible_agents, infos)
+        )
 
     def close(self):
         self.race.close()
         if self.env_viewer is not None:
             self.env_viewer.close()
-        pystk.clean()
+        if self.flight_recorder is not None:
+            if self._owns_flight_recorder:
+                self.flight_recorder.close()
+            else:
+                self.flight_recorder.flush()
+        session.release()
@@ -0,0 +1,295 @@
+"""
+Throughput autotuner.
+
+Runs short benchmark probes over candidate graphic qualities, step sizes, frame skips and pool
+sizes on the local machine, reports the Pareto-optimal candidates and writes the recommended one
+to a config file that `RaceEnv.from_config_file` loads.
+
+    python -m pystk_gym.tools.autotune --width 128 --height 96 --min-steps-per-sec 500
+    python -m pystk_gym.tools.autotune --width 128 --height 96 --cpu-budget 4 --out env.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..common.actions import MultiDiscreteAction
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.race import RaceConfig
+from ..common.reward import get_reward_fn
+from ..vector.pool import SupervisedPool
+from ..vector.worker import RESPAWNING, WORKER_FAILURE, EnvSpec
+
+DEFAULT_QUALITIES = [GraphicQuality.HD, GraphicQuality.SD, GraphicQuality.LD]
+
+
+class Candidate(NamedTuple):
+    graphic_quality: GraphicQuality
+    step_size: float
+    frame_skip: int
+    num_workers: int
+
+    @property
+    def decision_interval(self) -> float:
+        """Simulated seconds between two actions."""
+        return self.step_size * self.frame_skip
+
+    def to_dict(self) -> Dict[str, Any]:
+        candidate = self._asdict()
+        candidate["graphic_quality"] = self.graphic_quality.name
+        return candidate
+
+
+class ProbeResult(NamedTuple):
+    candidate: Candidate
+    # env steps of all the workers per wall clock second
+    steps_per_sec: float = 0.0
+    # simulated seconds per wall clock second
+    sim_speed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def objectives(self) -> Tuple[float, ...]:
+        """Every objective is maximized: throughput, graphic quality, fine control, few cpus."""
+        candidate = self.candidate
+        return (
+            self.steps_per_sec,
+            -candidate.graphic_quality.value[0],
+            -candidate.decision_interval,
+            -candidate.num_workers,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.candidate.to_dict(),
+            "steps_per_sec": self.steps_per_sec,
+            "sim_speed": self.sim_speed,
+            "error": self.error,
+        }
+
+
+def make_candidates(
+    qualities: Iterable[GraphicQuality] = tuple(DEFAULT_QUALITIES),
+    step_sizes: Iterable[float] = (0.09,),
+    frame_skips: Iterable[int] = (1, 2, 4),
+    num_workers: Optional[Iterable[int]] = None,
+    cpu_budget: Optional[int] = None,
+) -> List[Candidate]:
+    """
+    :param num_workers: pool sizes to try, 1, half and all of the cpu budget if None
+    :param cpu_budget: number of cores the envs may use, all of them if None
+    """
+    cpu_budget = (os.cpu_count() or 1) if cpu_budget is None else cpu_budget
+    if num_workers is None:
+        num_workers = sorted({1, max(cpu_budget // 2, 1), cpu_budget})
+    num_workers = [workers for workers in num_workers if workers <= cpu_budget]
+    return [
+        Candidate(*values)
+        for values in itertools.product(qualities, step_sizes, frame_skips, num_workers)
+    ]
+
+
+def probe(
+    candidate: Candidate,
+    width: int,
+    height: int,
+    race_config: RaceConfig,
+    steps: int = 200,
+    warmup_steps: int = 20,
+    context: Optional[str] = None,
+) -> ProbeResult:
+    """Steps a pool with random actions and measures its throughput, worker startup excluded."""
+    race_config = RaceConfig.from_dict(race_config.to_dict())
+    race_config.step_size = candidate.step_size
+    spec = EnvSpec(
+        GraphicConfig(width, height, candidate.graphic_quality),
+        race_config,
+        get_reward_fn(),
+        {"frame_skip": candidate.frame_skip},
+    )
+    rng = np.random.default_rng(0)
+    nvec = MultiDiscreteAction().space().nvec
+    pool = None
+    try:
+        pool = SupervisedPool(spec, candidate.num_workers, context=context)
+        pool.reset(seed=0)
+        start = time.perf_counter()
+        # env steps actually taken, failed and respawning workers don't count
+        stepped = 0
+        for step in range(warmup_steps + steps):
+            if step == warmup_steps:
+                start = time.perf_counter()
+            actions = rng.integers(
+                0, nvec, size=(candidate.num_workers, spec.num_agents, len(nvec))
+            )
+            *_, infos = pool.step(actions)
+            if step >= warmup_steps:
+                stepped += sum(
+                    RESPAWNING not in info and WORKER_FAILURE not in info for info in infos
+                )
+        elapsed = max(time.perf_counter() - start, 1e-9)
+    except Exception as e:
+        return ProbeResult(candidate, error=repr(e))
+    finally:
+        if pool is not None:
+            pool.close()
+    steps_per_sec = stepped / elapsed
+    return ProbeResult(
+        candidate, steps_per_sec, steps_per_sec * candidate.decision_interval
+    )
+
+
+def pareto_front(results: List[ProbeResult]) -> List[ProbeResult]:
+    """The successful probes no other probe is at least as good as in every objective."""
+    results = [result for result in results if result.ok]
+    if not results:
+        return []
+    objectives = np.array([result.objectives() for result in results])
+    # dominated[i, j]: probe j is at least as good as probe i everywhere and better somewhere
+    at_least = (objectives[None, :, :] >= objectives[:, None, :]).all(axis=2)
+    better = (objectives[None, :, :] > objectives[:, None, :]).any(axis=2)
+    dominated = (at_least & better).any(axis=1)
+    return [result for result, is_dominated in zip(results, dominated) if not is_dominated]
+
+
+def recommend(front: List[ProbeResult], min_steps_per_sec: float = 0.0) -> ProbeResult:
+    """
+    The best looking and finest controlled candidate of the front meeting the throughput target,
+    the fastest one if none does.
+    """
+    assert front, "no probe succeeded"
+    feasible = [result for result in front if result.steps_per_sec >= min_steps_per_sec]
+    if not feasible:
+        return max(front, key=lambda result: result.steps_per_sec)
+    return max(feasible, key=lambda result: result.objectives()[1:] + result.objectives()[:1])
+
+
+def write_config(
+    path: str,
+    result: ProbeResult,
+    width: int,
+    height: int,
+    race_config: RaceConfig,
+    front: Optional[List[ProbeResult]] = None,
+):
+    """Writes a config file `RaceEnv.from_config_file` loads, the pool size is kept alongside."""
+    candidate = result.candidate
+    race_config = RaceConfig.from_dict(race_config.to_dict())
+    race_config.step_size = candidate.step_size
+    config = {
+        "graphic_config": GraphicConfig(width, height, candidate.graphic_quality).to_dict(),
+        "race_config": race_config.to_dict(),
+        "env_kwargs": {"frame_skip": candidate.frame_skip},
+        "pool": {"num_workers": candidate.num_workers},
+        "autotune": {
+            "steps_per_sec": result.steps_per_sec,
+            "sim_speed": result.sim_speed,
+            "pareto_front": [] if front is None else [probe.to_dict() for probe in front],
+        },
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(config, file, indent=2)
+
+
+def autotune(
+    width: int,
+    height: int,
+    race_config: Optional[RaceConfig] = None,
+    candidates: Optional[List[Candidate]] = None,
+    min_steps_per_sec: float = 0.0,
+    steps: int = 200,
+    warmup_steps: int = 20,
+    out_path: Optional[str] = None,
+    context: Optional[str] = None,
+) -> Tuple[ProbeResult, List[ProbeResult], List[ProbeResult]]:
+    """
+    Probes every candidate one after the other, so that they don't compete for the cpus.
+
+    :param width: observation width, envs render at the observation size
+    :param height: observation height
+    :param race_config: race the probes run, lighthouse with the default karts if None
+    :returns: the recommended probe, the Pareto front and all the probes
+    """
+    race_config = RaceConfig(track="lighthouse") if race_config is None else race_config
+    candidates = make_candidates() if candidates is None else candidates
+    results = [
+        probe(candidate, width, height, race_config, steps, warmup_steps, context)
+        for candidate in candidates
+    ]
+    front = pareto_front(results)
+    best = recommend(front, min_steps_per_sec)
+    if out_path is not None:
+        write_config(out_path, best, width, height, race_config, front)
+    return best, front, results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv autotuner")
+    parser.add_argument("--width", type=int, required=True)
+    parser.add_argument("--height", type=int, required=True)
+    parser.add_argument("--min-steps-per-sec", type=float, default=0.0)
+    parser.add_argument("--cpu-budget", type=int, default=None)
+    parser.add_argument(
+        "--qualities",
+        nargs="+",
+        choices=[quality.name for quality in GraphicQuality],
+        default=[quality.name for quality in DEFAULT_QUALITIES],
+    )
+    parser.add_argument("--step-sizes", nargs="+", type=float, default=[0.09])
+    parser.add_argument("--frame-skips", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--workers", nargs="+", type=int, default=None)
+    parser.add_argument("--track", default="lighthouse")
+    parser.add_argument("--num-karts", type=int, default=5)
+    parser.add_argument("--num-karts-controlled", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--out", default="pystk_env.json")
+    args = parser.parse_args()
+
+    candidates = make_candidates(
+        [GraphicQuality[quality] for quality in args.qualities],
+        args.step_sizes,
+        args.frame_skips,
+        args.workers,
+        args.cpu_budget,
+    )
+    best, front, results = autotune(
+        args.width,
+        args.height,
+        RaceConfig(
+            track=args.track,
+            num_karts=args.num_karts,
+            num_karts_controlled=args.num_karts_controlled,
+        ),
+        candidates,
+        min_steps_per_sec=args.min_steps_per_sec,
+        steps=args.steps,
+        out_path=args.out,
+    )
+    print(f"{'quality':>8} {'step':>6} {'skip':>5} {'workers':>8} {'steps/s':>10} {'sim x':>7}")
+    for result in sorted(front, key=lambda result: -result.steps_per_sec):
+        candidate = result.candidate
+        marker = " *" if result is best else ""
+        print(
+            f"{candidate.graphic_quality.name:>8} {candidate.step_size:>6.3f} "
+            f"{candidate.frame_skip:>5} {candidate.num_workers:>8} "
+            f"{result.steps_per_sec:>10.1f} {result.sim_speed:>7.2f}{marker}"
+        )
+    for result in results:
+        if not result.ok:
+            print(f"FAILED {result.candidate.to_dict()}: {result.error}")
+    if best.steps_per_sec < args.min_steps_per_sec:
+        print(f"no candidate reaches {args.min_steps_per_sec} steps/s, wrote the fastest one")
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Merges and renders track coverage files written by `Coverage.save`.
+
+    python -m pystk_gym.tools.coverage merge total.npz worker_*.npz
+    python -m pystk_gym.tools.coverage render total.npz --event off_track --out heatmaps/
+"""
+
+import argparse
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from ..common.coverage import Coverage, TrackCoverage
+
+
+def render_heatmap(coverage: TrackCoverage, event: str = "visits", ax: Optional[Any] = None):
+    """
+    Draws the grid counts of `event` with the track's path drawn over it, path nodes are colored
+    by how often the event happens on them. Needs matplotlib.
+
+    :param ax: matplotlib axes to draw on, a new figure if None
+    :returns: the axes
+    """
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError as e:
+        raise ImportError(
+            "rendering coverage heatmaps needs matplotlib, install it with "
+            "`pip install pystk_gym[analytics]`."
+        ) from e
+
+    if ax is None:
+        _, ax = plt.subplots(figsize=(8, 8))
+    coverage.flush()
+    counts = coverage.grid_counts[TrackCoverage.EVENTS.index(event)]
+    (x_min, z_min), (x_max, z_max) = coverage.bounds
+    # log scale, a few hot cells would otherwise wash out the rest of the track
+    ax.imshow(
+        np.log1p(counts).T,
+        origin="lower",
+        extent=(x_min, x_max, z_min, z_max),
+        cmap="magma",
+        interpolation="nearest",
+    )
+    centers = coverage.path_nodes.mean(axis=1)[:, [0, 2]]
+    ax.plot(centers[:, 0], centers[:, 1], color="white", linewidth=0.8, alpha=0.7)
+    values = coverage.node_counts[0] if event == "visits" else coverage.rates(event)
+    points = ax.scatter(centers[:, 0], centers[:, 1], c=values, s=8, cmap="viridis")
+    ax.figure.colorbar(points, ax=ax, label="visits" if event == "visits" else f"{event} rate")
+    ax.set_title(f"{coverage.track}: {event}")
+    ax.set_xlabel("x")
+    ax.set_ylabel("z")
+    return ax
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv track coverage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser("merge")
+    merge_parser.add_argument("out")
+    merge_parser.add_argument("paths", nargs="+")
+
+    render_parser = subparsers.add_parser("render")
+    render_parser.add_argument("path")
+    render_parser.add_argument("--tracks", nargs="*", default=None)
+    render_parser.add_argument("--event", choices=TrackCoverage.EVENTS, default="visits")
+    render_parser.add_argument("--out", default="coverage")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        merged = Coverage()
+        for path in args.paths:
+            merged.merge(Coverage.load(path))
+        merged.save(args.out)
+        print(f"merged {len(args.paths)} files into {args.out}")
+        return
+
+    import matplotlib.pyplot as plt
+
+    coverage = Coverage.load(args.path)
+    os.makedirs(args.out, exist_ok=True)
+    for name in args.tracks or sorted(coverage.tracks):
+        ax = render_heatmap(coverage.tracks[name], args.event)
+        out = os.path.join(args.out, f"{name}_{args.event}.png")
+        ax.figure.savefig(out, dpi=150, bbox_inches="tight")
+        plt.close(ax.figure)
+        print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
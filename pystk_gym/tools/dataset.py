@@ -0,0 +1,158 @@
+"""
+Dataset reader benchmark: throughput of the streamed, shuffled and prefetched batches of
+`ShardDataset.iter_batches` against batches of uniformly random samples read one by one.
+
+    python -m pystk_gym.tools.dataset --steps 20000 --sequence-length 4
+    python -m pystk_gym.tools.dataset --directory data/lighthouse
+
+Without `--directory` a synthetic dataset is written to a temporary directory first. Its
+shards are still in the page cache then, drop the cache between writing and reading (or
+point `--directory` at a dataset larger than the RAM) to measure reads from disk.
+"""
+
+import argparse
+import tempfile
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from ..common.dataset import DatasetWriter, ShardDataset
+
+
+class Throughput(NamedTuple):
+    mode: str
+    samples: int
+    seconds: float
+    # bytes of the batches handed out, observations included
+    num_bytes: int
+
+    @property
+    def samples_per_sec(self) -> float:
+        return self.samples / max(self.seconds, 1e-9)
+
+    @property
+    def megabytes_per_sec(self) -> float:
+        return self.num_bytes / 2**20 / max(self.seconds, 1e-9)
+
+
+def write_synthetic(
+    directory: str,
+    num_steps: int,
+    num_agents: int = 2,
+    height: int = 96,
+    width: int = 128,
+    episode_length: int = 500,
+    shard_size: int = 4096,
+    seed: int = 0,
+):
+    """Random frames and rewards, every agent races `episode_length` steps per episode."""
+    rng = np.random.default_rng(seed)
+    writer = DatasetWriter(directory, shard_size)
+    frames = rng.integers(0, 256, size=(64, num_agents, height, width, 3), dtype=np.uint8)
+    not_truncated = np.zeros(num_agents, dtype=bool)
+    for step in range(num_steps):
+        writer.add(
+            frames[step % len(frames)],
+            rng.integers(0, 2, size=(num_agents, 7)),
+            rng.normal(size=num_agents).astype(np.float32),
+            np.full(num_agents, (step + 1) % episode_length == 0),
+            not_truncated,
+        )
+    writer.close()
+
+
+def _batch_bytes(batch) -> int:
+    return sum(array.nbytes for array in batch)
+
+
+def measure_stream(
+    dataset: ShardDataset,
+    batch_size: int,
+    sequence_length: Optional[int],
+    num_batches: int,
+    shuffle_buffer: int,
+    prefetch: int,
+    num_threads: int,
+) -> Throughput:
+    samples = num_bytes = 0
+    start = time.perf_counter()
+    for i, batch in enumerate(
+        dataset.iter_batches(
+            batch_size,
+            sequence_length,
+            shuffle_buffer=shuffle_buffer,
+            prefetch=prefetch,
+            num_threads=num_threads,
+            seed=0,
+        )
+    ):
+        if i == num_batches:
+            break
+        samples += len(batch.obs)
+        num_bytes += _batch_bytes(batch)
+    return Throughput("stream", samples, time.perf_counter() - start, num_bytes)
+
+
+def measure_random(
+    dataset: ShardDataset, batch_size: int, sequence_length: Optional[int], num_batches: int
+) -> Throughput:
+    rng = np.random.default_rng(0)
+    num_samples = dataset.num_samples(sequence_length or 1)
+    samples = num_bytes = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        batch = dataset.read(rng.integers(num_samples, size=batch_size), sequence_length or 1)
+        samples += len(batch.obs)
+        num_bytes += _batch_bytes(batch)
+    return Throughput("random", samples, time.perf_counter() - start, num_bytes)
+
+
+def format_throughputs(throughputs: List[Throughput]) -> List[str]:
+    lines = [f"{'mode':>8} {'samples':>9} {'samples/s':>11} {'MB/s':>9}"]
+    for throughput in throughputs:
+        lines.append(
+            f"{throughput.mode:>8} {throughput.samples:>9} "
+            f"{throughput.samples_per_sec:>11.0f} {throughput.megabytes_per_sec:>9.1f}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk dataset reader benchmark")
+    parser.add_argument("--directory", help="dataset to read, a synthetic one if not given")
+    parser.add_argument("--steps", type=int, default=20000, help="steps of the synthetic one")
+    parser.add_argument("--agents", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--sequence-length", type=int, default=None)
+    parser.add_argument("--batches", type=int, default=100)
+    parser.add_argument("--shuffle-buffer", type=int, default=16384)
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = args.directory
+        if directory is None:
+            directory = tmp_dir
+            write_synthetic(directory, args.steps, args.agents)
+        dataset = ShardDataset(directory)
+        throughputs = [
+            measure_stream(
+                dataset,
+                args.batch_size,
+                args.sequence_length,
+                args.batches,
+                args.shuffle_buffer,
+                args.prefetch,
+                args.threads,
+            ),
+            measure_random(dataset, args.batch_size, args.sequence_length, args.batches),
+        ]
+        # the memory maps have to be gone before the temporary directory is removed
+        del dataset
+    print("\n".join(format_throughputs(throughputs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Golden trajectory harness.
+
+Runs a fixed action sequence on a fixed config, hashes the observations, rewards and infos of
+every step and compares the hashes across code versions and execution modes (a single env, an env
+with frame skip and a pooled env), reporting the first step where they diverge.
+
+    python -m pystk_gym.tools.determinism record --out golden.json --track lighthouse --group 4
+    python -m pystk_gym.tools.determinism check --golden golden.json --modes frame_skip pooled
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from ..common.actions import MultiDiscreteAction
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.info import Info
+from ..common.race import ObsType, RaceConfig
+from ..common.reward import get_reward_fn
+from ..envs.race_env import RaceEnv
+from ..vector.pool import SupervisedPool
+from ..vector.worker import EPISODE_RESET, EnvSpec
+
+MODES = ["single", "frame_skip", "pooled"]
+# stands in for the observation of the step that ended the episode, pooled envs already replaced
+# it with the observation of the next episode
+EPISODE_END = "episode_end"
+
+StepHash = Dict[str, str]
+
+
+class Divergence(NamedTuple):
+    step: int
+    components: List[str]
+
+
+def make_actions(num_steps: int, num_agents: int, seed: int) -> npt.NDArray[np.int64]:
+    """A reproducible action sequence of shape (num_steps, num_agents, 7)."""
+    nvec = MultiDiscreteAction().space().nvec
+    return np.random.default_rng(seed).integers(0, nvec, size=(num_steps, num_agents, len(nvec)))
+
+
+def _digest(*arrays: Any) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def hash_step(
+    obs: Optional[ObsType], rewards: npt.NDArray[np.float32], infos: Mapping[Any, Any]
+) -> StepHash:
+    # only the Info fields, flags added by pools are not part of the trajectory
+    info_keys = sorted((key for key in infos if isinstance(key, Info)), key=lambda key: key.name)
+    return {
+        "obs": EPISODE_END if obs is None else _digest(obs),
+        "reward": _digest(np.asarray(rewards, dtype=np.float32)),
+        "info": _digest(*(np.asarray(infos[key]) for key in info_keys)),
+    }
+
+
+def run_env(
+    env: RaceEnv, actions: npt.NDArray, seed: int, repeat: int = 1
+) -> List[StepHash]:
+    """
+    :param repeat: number of `step_batch` calls per action, their rewards are summed so that
+        `repeat=k` on a single env matches `frame_skip=k`
+    """
+    num_agents = len(env.possible_agents)
+    obs, _ = env.reset_batch(seed=seed)
+    hashes = [hash_step(obs, np.zeros(num_agents, dtype=np.float32), {})]
+    for action in actions:
+        total_rewards = np.zeros(num_agents, dtype=np.float32)
+        for _ in range(repeat):
+            obs, rewards, _, _, infos = env.step_batch(action, columnar_infos=True)
+            total_rewards += rewards
+            if not env.agents:
+                break
+        episode_done = not env.agents
+        hashes.append(hash_step(None if episode_done else obs, total_rewards, infos))
+        if episode_done:
+            break
+    return hashes
+
+
+def run_pool(spec: EnvSpec, actions: npt.NDArray, seed: int) -> List[StepHash]:
+    pool = SupervisedPool(spec, num_workers=1)
+    try:
+        obs, _ = pool.reset(seed=seed)
+        hashes = [hash_step(obs[0], np.zeros(spec.num_agents, dtype=np.float32), {})]
+        for action in actions:
+            obs, rewards, _, _, infos = pool.step(action[None])
+            episode_done = bool(infos[0].get(EPISODE_RESET, False))
+            hashes.append(hash_step(None if episode_done else obs[0], rewards[0], infos[0]))
+            if episode_done:
+                break
+        return hashes
+    finally:
+        pool.close()
+
+
+def run_mode(golden: Dict[str, Any], mode: str) -> List[StepHash]:
+    """Replays the trajectory described by a golden file in one of the `MODES`."""
+    graphic_config = GraphicConfig.from_dict(golden["graphic_config"])
+    race_config = RaceConfig.from_dict(golden["race_config"])
+    group = golden["group"]
+    actions = make_actions(
+        golden["num_steps"], race_config.num_karts_controlled, golden["action_seed"]
+    )
+    env_kwargs = {"max_step_cnt": golden["max_step_cnt"]}
+
+    if mode == "pooled":
+        spec = EnvSpec(
+            graphic_config, race_config, get_reward_fn(), {**env_kwargs, "frame_skip": group}
+        )
+        return run_pool(spec, actions, golden["seed"])
+    frame_skip = group if mode == "frame_skip" else 1
+    env = RaceEnv(
+        graphic_config, race_config, get_reward_fn(), frame_skip=frame_skip, **env_kwargs
+    )
+    try:
+        return run_env(env, actions, golden["seed"], repeat=group // frame_skip)
+    finally:
+        env.close()
+
+
+def compare(expected: List[StepHash], actual: List[StepHash]) -> Optional[Divergence]:
+    """The first step where two trajectories differ, None if they are identical."""
+    for step, (expected_step, actual_step) in enumerate(zip(expected, actual)):
+        components = [key for key in expected_step if expected_step[key] != actual_step.get(key)]
+        if components:
+            return Divergence(step, components)
+    if len(expected) != len(actual):
+        return Divergence(min(len(expected), len(actual)), ["length"])
+    return None
+
+
+def record(
+    graphic_config: GraphicConfig,
+    race_config: RaceConfig,
+    num_steps: int,
+    seed: int = 0,
+    action_seed: int = 0,
+    group: int = 1,
+    max_step_cnt: int = 1000,
+    mode: str = "single",
+) -> Dict[str, Any]:
+    """
+    Records a golden trajectory.
+
+    :param group: race steps per action, replayed with frame skip or repeated actions
+    """
+    golden = {
+        "graphic_config": graphic_config.to_dict(),
+        "race_config": race_config.to_dict(),
+        "num_steps": num_steps,
+        "seed": seed,
+        "action_seed": action_seed,
+        "group": group,
+        "max_step_cnt": max_step_cnt,
+    }
+    golden["steps"] = run_mode(golden, mode)
+    return golden
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv determinism harness")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("--out", required=True)
+    record_parser.add_argument("--track", default="lighthouse")
+    record_parser.add_argument("--kart", default="tux")
+    record_parser.add_argument("--reverse", action="store_true")
+    record_parser.add_argument("--num-karts", type=int, default=3)
+    record_parser.add_argument("--num-karts-controlled", type=int, default=2)
+    record_parser.add_argument("--steps", type=int, default=500)
+    record_parser.add_argument("--seed", type=int, default=0)
+    record_parser.add_argument("--action-seed", type=int, default=0)
+    record_parser.add_argument("--group", type=int, default=1)
+    record_parser.add_argument("--max-step-cnt", type=int, default=1000)
+    record_parser.add_argument("--mode", choices=MODES, default="single")
+    record_parser.add_argument("--width", type=int, default=200)
+    record_parser.add_argument("--height", type=int, default=150)
+    record_parser.add_argument(
+        "--quality", choices=[quality.name for quality in GraphicQuality], default="LD"
+    )
+
+    check_parser = subparsers.add_parser("check")
+    check_parser.add_argument("--golden", required=True)
+    check_parser.add_argument("--modes", nargs="+", choices=MODES, default=["single"])
+    args = parser.parse_args()
+
+    if args.command == "record":
+        golden = record(
+            GraphicConfig(args.width, args.height, GraphicQuality[args.quality]),
+            RaceConfig(
+                track=args.track,
+                kart=args.kart,
+                reverse=args.reverse,
+                num_karts=args.num_karts,
+                num_karts_controlled=args.num_karts_controlled,
+            ),
+            args.steps,
+            seed=args.seed,
+            action_seed=args.action_seed,
+            group=args.group,
+            max_step_cnt=args.max_step_cnt,
+            mode=args.mode,
+        )
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(golden, file, indent=1)
+        print(f"recorded {len(golden['steps'])} steps to {args.out}")
+        return
+
+    with open(args.golden, "r", encoding="utf-8") as file:
+        golden = json.load(file)
+    diverged = False
+    for mode in args.modes:
+        divergence = compare(golden["steps"], run_mode(golden, mode))
+        if divergence is None:
+            print(f"{mode}: identical over {len(golden['steps'])} steps")
+        else:
+            diverged = True
+            components = ", ".join(divergence.components)
+            print(f"{mode}: diverges at step {divergence.step} in {components}")
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Reads the flight recorder files of RaceEnv (see `pystk_gym.common.recorder`).
+
+    python -m pystk_gym.tools.flight show flight_0.bin --last 50 --agent 1
+    python -m pystk_gym.tools.flight dump flight_0.bin --out crash.npz
+"""
+
+import argparse
+
+from ..common.recorder import dump_records, format_records, read_records
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv flight recorder reader")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = subparsers.add_parser("show")
+    show_parser.add_argument("path")
+    show_parser.add_argument("--last", type=int, default=100)
+    show_parser.add_argument("--agent", type=int, default=0)
+
+    dump_parser = subparsers.add_parser("dump")
+    dump_parser.add_argument("path")
+    dump_parser.add_argument("--out", default=None)
+    dump_parser.add_argument("--last", type=int, default=None)
+    args = parser.parse_args()
+
+    records = read_records(args.path, args.last)
+    if args.command == "show":
+        print("\n".join(format_records(records, args.agent)))
+        return
+    out = f"{args.path}.dump.npz" if args.out is None else args.out
+    dump_records(records, out)
+    print(f"dumped {len(records)} steps to {out}")
+
+
+if __name__ == "__main__":
+    main()
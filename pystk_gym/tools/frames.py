@@ -0,0 +1,132 @@
+"""
+Frame store benchmark: compression ratio, encode and decode throughput of `FrameStore` per
+codec and keyframe interval, on frames of a real race. Decoding is measured on batches of
+randomly sampled frame stacks, like a replay buffer would draw them.
+
+    python -m pystk_gym.tools.frames --steps 2000 --codecs zlib lz4 --intervals 1 8 16
+"""
+
+import argparse
+import time
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from ..common.frames import FrameStore
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.race import RaceConfig
+from ..common.reward import get_reward_fn
+from ..envs.race_env import RaceEnv
+
+
+class FrameStoreResult(NamedTuple):
+    codec: str
+    keyframe_interval: int
+    compression_ratio: float
+    encode_fps: float
+    # frames per second handed out in stacks, shared frames decoded once
+    decode_fps: float
+
+
+def collect_frames(
+    graphic_config: GraphicConfig, race_config: RaceConfig, num_steps: int, seed: int = 0
+) -> Tuple[npt.NDArray[np.uint8], npt.NDArray[np.bool_]]:
+    """
+    Frames of the first agent under random actions.
+
+    :returns: the frames (num_steps, height, width, 3) and the episode start flags
+    """
+    env = RaceEnv(graphic_config, race_config, get_reward_fn(), return_info=False)
+    rng = np.random.default_rng(seed)
+    nvec = env.action_space(env.possible_agents[0]).nvec
+    frames = np.empty((num_steps, *env.observation_shape), dtype=np.uint8)
+    episode_starts = np.zeros(num_steps, dtype=bool)
+    try:
+        obs, _ = env.reset_batch(seed=seed)
+        episode_starts[0] = True
+        for step in range(num_steps):
+            frames[step] = obs[0]
+            actions = rng.integers(nvec, size=(len(env.possible_agents), len(nvec)))
+            obs, *_ = env.step_batch(actions)
+            if not env.agents and step + 1 < num_steps:
+                obs, _ = env.reset_batch()
+                episode_starts[step + 1] = True
+    finally:
+        env.close()
+    return frames, episode_starts
+
+
+def measure(
+    frames: npt.NDArray[np.uint8],
+    episode_starts: npt.NDArray[np.bool_],
+    codec: str,
+    keyframe_interval: int,
+    batch_size: int = 32,
+    stack_size: int = 4,
+    num_batches: int = 50,
+) -> FrameStoreResult:
+    store = FrameStore(
+        frames.nbytes + (1 << 20), len(frames), keyframe_interval=keyframe_interval, codec=codec
+    )
+    start = time.perf_counter()
+    ids = np.array([store.add(frame, start) for frame, start in zip(frames, episode_starts)])
+    encode_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    out = np.empty((batch_size, stack_size, *frames.shape[1:]), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        # stacks may cross episode starts here, that doesn't change the decoding work
+        ends = rng.integers(stack_size - 1, len(ids), size=batch_size)
+        store.get(ids[ends[:, None] - np.arange(stack_size)[::-1]], out=out)
+    decode_time = time.perf_counter() - start
+    return FrameStoreResult(
+        codec,
+        keyframe_interval,
+        store.compression_ratio,
+        len(frames) / max(encode_time, 1e-9),
+        num_batches * batch_size * stack_size / max(decode_time, 1e-9),
+    )
+
+
+def format_results(results: List[FrameStoreResult]) -> List[str]:
+    lines = [f"{'codec':>6} {'interval':>9} {'ratio':>7} {'encode fps':>11} {'decode fps':>11}"]
+    for result in results:
+        lines.append(
+            f"{result.codec:>6} {result.keyframe_interval:>9} {result.compression_ratio:>6.1f}x "
+            f"{result.encode_fps:>11.0f} {result.decode_fps:>11.0f}"
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk frame store benchmark")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--track", default="lighthouse")
+    parser.add_argument("--width", type=int, default=128)
+    parser.add_argument("--height", type=int, default=96)
+    parser.add_argument(
+        "--quality", choices=[quality.name for quality in GraphicQuality], default="LD"
+    )
+    parser.add_argument("--codecs", nargs="+", default=["zlib"], choices=["zlib", "lz4", "none"])
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 8, 16])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--stack-size", type=int, default=4)
+    args = parser.parse_args()
+
+    frames, episode_starts = collect_frames(
+        GraphicConfig(args.width, args.height, GraphicQuality[args.quality]),
+        RaceConfig(track=args.track, num_karts=1, num_karts_controlled=1),
+        args.steps,
+    )
+    results = [
+        measure(frames, episode_starts, codec, interval, args.batch_size, args.stack_size)
+        for codec in args.codecs
+        for interval in args.intervals
+    ]
+    print("\n".join(format_results(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Track x kart (x reverse) matrix runner.
+
+Spreads the cells over a process pool where every worker keeps one pystk session alive, caches
+passed compatibility checks per pystk data version and race settings and can evaluate a policy
+on every cell.
+
+    python -m pystk_gym.tools.matrix --workers 8 --reverse both --report matrix.json
+    python -m pystk_gym.tools.matrix --policy my_module:policy --max-steps 2000
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from gymnasium.vector.utils import CloudpickleWrapper
+
+from ..common import session
+from ..common.geometry import data_version
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.race import ObsType, RaceConfig
+from ..common.reward import get_reward_fn
+from ..envs.race_env import RaceEnv
+
+# maps a batch of observations (num_agents, height, width, 3) to actions (num_agents, 7)
+PolicyType = Callable[[ObsType], np.ndarray]
+
+
+class Cell(NamedTuple):
+    track: str
+    kart: str
+    reverse: bool
+
+    @property
+    def key(self) -> str:
+        return f"{self.track}/{self.kart}/{'reverse' if self.reverse else 'forward'}"
+
+
+class CellResult(NamedTuple):
+    cell: Cell
+    ok: bool
+    error: Optional[str] = None
+    episode_return: float = 0.0
+    finish_time: float = 0.0
+    steps: int = 0
+    steps_per_sec: float = 0.0
+    duration: float = 0.0
+    cached: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = self._asdict()
+        result["cell"] = self.cell._asdict()
+        return result
+
+
+def make_cells(
+    tracks: Iterable[str] = tuple(RaceConfig.TRACKS),
+    karts: Iterable[str] = tuple(RaceConfig.KARTS),
+    reverse: Iterable[bool] = (False,),
+) -> List[Cell]:
+    return [
+        Cell(track, kart, is_reverse)
+        for track in tracks
+        for kart in karts
+        for is_reverse in reverse
+    ]
+
+
+def _init_worker(graphic_config: GraphicConfig):
+    # keeps one pystk session alive for the life of the worker, envs reuse it
+    session.acquire(graphic_config)
+
+
+def _run_cell(
+    cell: Cell,
+    graphic_config: GraphicConfig,
+    race_kwargs: Dict[str, Any],
+    policy: Optional[CloudpickleWrapper],
+    max_steps: int,
+) -> CellResult:
+    start = time.time()
+    env = None
+    try:
+        race_config = RaceConfig(
+            track=cell.track, kart=cell.kart, reverse=cell.reverse, **race_kwargs
+        )
+        env = RaceEnv(
+            graphic_config, race_config, get_reward_fn(), max_step_cnt=max_steps, return_info=False
+        )
+        obs, _ = env.reset_batch()
+        if policy is None:
+            return CellResult(cell, True, duration=time.time() - start)
+
+        episode_start = time.time()
+        episode_return = 0.0
+        while env.agents:
+            obs, rewards, *_ = env.step_batch(policy.fn(obs))
+            episode_return += float(rewards.mean())
+        elapsed = time.time() - episode_start
+        finish_time = float(np.mean([kart.kart.finish_time for kart in env.controlled_karts]))
+        return CellResult(
+            cell,
+            True,
+            episode_return=episode_return,
+            finish_time=finish_time,
+            steps=env.steps,
+            steps_per_sec=env.steps / max(elapsed, 1e-9),
+            duration=time.time() - start,
+        )
+    except Exception as e:
+        return CellResult(cell, False, error=repr(e), duration=time.time() - start)
+    finally:
+        if env is not None:
+            env.close()
+
+
+def _cache_key(version: str, graphic_config: GraphicConfig, race_kwargs: Dict[str, Any]) -> str:
+    """The pystk data version and a digest of the settings every cell is built with."""
+    settings = json.dumps(
+        {"graphic_config": graphic_config.to_dict(), "race_kwargs": race_kwargs},
+        sort_keys=True,
+        default=repr,
+    )
+    return f"{version}/{hashlib.sha1(settings.encode()).hexdigest()[:12]}"
+
+
+def _run_cells(
+    cells: List[Cell],
+    graphic_config: GraphicConfig,
+    race_kwargs: Dict[str, Any],
+    policy: Optional[CloudpickleWrapper],
+    max_steps: int,
+    num_workers: Optional[int],
+    mp_context: Optional[mp.context.BaseContext],
+) -> Dict[Cell, CellResult]:
+    """
+    Runs the cells on a process pool. A native crash breaks the whole pool, the unfinished cells
+    are then run one at a time on a new one until the crashing cell is found, which fails, and
+    the rest go back to a full pool.
+    """
+    results: Dict[Cell, CellResult] = {}
+    isolate = False
+    while cells:
+        broken = []
+        with ProcessPoolExecutor(
+            max_workers=1 if isolate else num_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(graphic_config,),
+        ) as executor:
+            futures = [
+                executor.submit(_run_cell, cell, graphic_config, race_kwargs, policy, max_steps)
+                for cell in cells
+            ]
+            for cell, future in zip(cells, futures):
+                try:
+                    results[cell] = future.result()
+                except BrokenProcessPool as e:
+                    if isolate and not broken:
+                        # a single worker runs the cells in order, the first broken one crashed it
+                        results[cell] = CellResult(cell, False, error=f"worker crashed: {e!r}")
+                    else:
+                        broken.append(cell)
+        isolate = bool(broken) and not isolate
+        cells = broken
+    return results
+
+
+def _load_cache(cache_path: Optional[str], cache_key: str) -> Dict[str, Dict[str, Any]]:
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, "r", encoding="utf-8") as file:
+        return json.load(file).get(cache_key, {})
+
+
+def _save_cache(cache_path: str, cache_key: str, results: Dict[str, Dict[str, Any]]):
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    cache[cache_key] = results
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as file:
+        json.dump(cache, file, indent=2)
+
+
+def run_matrix(
+    cells: List[Cell],
+    graphic_config: Optional[GraphicConfig] = None,
+    policy: Optional[PolicyType] = None,
+    race_kwargs: Optional[Dict[str, Any]] = None,
+    max_steps: int = 1000,
+    num_workers: Optional[int] = None,
+    cache_path: Optional[str] = None,
+    report_path: Optional[str] = None,
+    mp_context: Optional[mp.context.BaseContext] = None,
+) -> List[CellResult]:
+    """
+    Runs every cell once, either as a compatibility check (build and reset the env) or, when a
+    policy is given, as an evaluation episode.
+
+    :param policy: maps stacked observations to stacked actions, it is cloudpickled so lambdas
+        and closures work
+    :param race_kwargs: extra RaceConfig arguments, like num_karts or num_karts_controlled
+    :param cache_path: json file caching the passed compatibility checks per pystk data version
+        and settings, failures are always run again. It is not used for policy evaluations.
+    :param report_path: json file the consolidated report is written to
+    """
+    graphic_config = GraphicConfig.default_config() if graphic_config is None else graphic_config
+    race_kwargs = {} if race_kwargs is None else race_kwargs
+    version = data_version()
+    cache_key = _cache_key(version, graphic_config, race_kwargs)
+    use_cache = policy is None and cache_path is not None
+    cached = _load_cache(cache_path, cache_key) if use_cache else {}
+
+    results: Dict[Cell, CellResult] = {}
+    pending = []
+    for cell in cells:
+        if cached.get(cell.key, {}).get("ok"):
+            results[cell] = CellResult(cell, True, cached=True)
+        else:
+            pending.append(cell)
+
+    if pending:
+        wrapped_policy = None if policy is None else CloudpickleWrapper(policy)
+        results.update(
+            _run_cells(
+                pending,
+                graphic_config,
+                race_kwargs,
+                wrapped_policy,
+                max_steps,
+                num_workers,
+                mp_context,
+            )
+        )
+
+    ordered = [results[cell] for cell in cells]
+    if use_cache:
+        # failures may be transient, only passed checks are kept
+        cached = {key: entry for key, entry in cached.items() if entry.get("ok")}
+        cached.update({result.cell.key: {"ok": True} for result in ordered if result.ok})
+        _save_cache(cache_path, cache_key, cached)
+    if report_path is not None:
+        write_report(report_path, ordered, version)
+    return ordered
+
+
+def write_report(path: str, results: List[CellResult], version: str = ""):
+    evaluated = [result for result in results if result.ok and result.steps > 0]
+    report = {
+        "version": version or data_version(),
+        "num_cells": len(results),
+        "num_failed": sum(not result.ok for result in results),
+        "mean_return": (
+            float(np.mean([result.episode_return for result in evaluated])) if evaluated else None
+        ),
+        "mean_steps_per_sec": (
+            float(np.mean([result.steps_per_sec for result in evaluated])) if evaluated else None
+        ),
+        "cells": [result.to_dict() for result in results],
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+
+def _load_policy(path: str) -> PolicyType:
+    module, name = path.split(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv track/kart matrix")
+    parser.add_argument("--tracks", nargs="*", default=RaceConfig.TRACKS)
+    parser.add_argument("--karts", nargs="*", default=RaceConfig.KARTS)
+    parser.add_argument("--reverse", choices=["forward", "reverse", "both"], default="forward")
+    parser.add_argument("--policy", help="`module:callable` evaluated on every cell")
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--cache",
+        default=os.path.join(os.path.expanduser("~"), ".cache", "pystk_gym", "matrix.json"),
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--report", default="matrix_report.json")
+    parser.add_argument("--width", type=int, default=600)
+    parser.add_argument("--height", type=int, default=400)
+    parser.add_argument(
+        "--quality", choices=[quality.name for quality in GraphicQuality], default="HD"
+    )
+    args = parser.parse_args()
+
+    reverse = {"forward": (False,), "reverse": (True,), "both": (False, True)}[args.reverse]
+    results = run_matrix(
+        make_cells(args.tracks, args.karts, reverse),
+        GraphicConfig(args.width, args.height, GraphicQuality[args.quality]),
+        policy=None if args.policy is None else _load_policy(args.policy),
+        max_steps=args.max_steps,
+        num_workers=args.workers,
+        cache_path=None if args.no_cache else args.cache,
+        report_path=args.report,
+    )
+    for result in results:
+        if not result.ok:
+            print(f"FAILED {result.cell.key}: {result.error}")
+    print(f"{sum(result.ok for result in results)}/{len(results)} cells passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Long-run memory growth benchmark.
+
+Steps (and resets, and re-creates) RaceEnvs for a configurable number of steps while sampling the
+RSS and tracemalloc snapshots, then reports the growth per 1k steps overall and by allocation site.
+
+    python -m pystk_gym.tools.memory --steps 100000 --env-cycles 10 --threshold-kib 64
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tracemalloc
+from typing import Callable, List, NamedTuple, Optional
+
+import numpy as np
+
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.race import RaceConfig
+from ..common.reward import get_reward_fn
+from ..envs.race_env import RaceEnv
+
+STEPS_PER_UNIT = 1000
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # no procfs, fall back to the peak rss which is still useful to spot growth
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MemorySample(NamedTuple):
+    step: int
+    rss: int
+    traced: int
+
+
+class SiteGrowth(NamedTuple):
+    site: str
+    size_diff: int
+    count_diff: int
+    bytes_per_unit: float
+
+
+class MemoryReport(NamedTuple):
+    steps: int
+    resets: int
+    env_cycles: int
+    samples: List[MemorySample]
+    rss_bytes_per_unit: float
+    traced_bytes_per_unit: float
+    sites: List[SiteGrowth]
+    threshold_bytes_per_unit: float
+
+    @property
+    def passed(self) -> bool:
+        return self.rss_bytes_per_unit <= self.threshold_bytes_per_unit
+
+    def format(self) -> str:
+        lines = [
+            f"steps: {self.steps}, resets: {self.resets}, env cycles: {self.env_cycles}",
+            f"rss growth: {self.rss_bytes_per_unit / 1024:.2f} KiB / {STEPS_PER_UNIT} steps "
+            f"(threshold {self.threshold_bytes_per_unit / 1024:.2f} KiB)",
+            f"traced growth: {self.traced_bytes_per_unit / 1024:.2f} KiB / {STEPS_PER_UNIT} steps",
+        ]
+        if self.sites:
+            lines.append(f"top allocation sites (KiB / {STEPS_PER_UNIT} steps):")
+            lines.extend(
+                f"  {site.bytes_per_unit / 1024:10.2f}  {site.count_diff:+8d} blocks  {site.site}"
+                for site in self.sites
+            )
+        lines.append("PASSED" if self.passed else "FAILED")
+        return "\n".join(lines)
+
+
+def _growth_per_unit(steps: List[int], values: List[int]) -> float:
+    if len(steps) < 2:
+        return 0.0
+    slope = np.polyfit(np.array(steps, dtype=np.float64), np.array(values, dtype=np.float64), 1)[0]
+    return float(slope) * STEPS_PER_UNIT
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+
+
+def run_memory_benchmark(
+    make_env: Callable[[], RaceEnv],
+    steps: int = 100_000,
+    episode_steps: int = 1000,
+    env_cycles: int = 1,
+    sample_every: int = 1000,
+    warmup_steps: int = 2000,
+    threshold_kib: float = 64.0,
+    top: int = 10,
+    trace: bool = True,
+) -> MemoryReport:
+    """
+    :param make_env: creates a fresh env, called once per env cycle
+    :param steps: total number of env steps over all cycles
+    :param episode_steps: the env is reset after this many steps or once all agents are done
+    :param env_cycles: number of times the env is closed and created again
+    :param sample_every: steps between two memory samples
+    :param warmup_steps: steps excluded from the growth estimate (caches, pools, lazy imports)
+    :param threshold_kib: maximum allowed rss growth in KiB per 1k steps
+    :param top: number of allocation sites to report
+    :param trace: also trace python allocations, this slows down the run considerably
+    """
+    if trace:
+        tracemalloc.start()
+    samples: List[MemorySample] = []
+    baseline: Optional[tracemalloc.Snapshot] = None
+    last: Optional[tracemalloc.Snapshot] = None
+    baseline_step = 0
+    total_steps, resets = 0, 0
+    steps_per_cycle = -(-steps // env_cycles)
+
+    for _ in range(env_cycles):
+        env = make_env()
+        env.reset_batch()
+        episode_step = 0
+        for _ in range(min(steps_per_cycle, steps - total_steps)):
+            actions = np.stack(
+                [env.action_space(agent).sample() for agent in env.possible_agents]
+            )
+            env.step_batch(actions)
+            total_steps += 1
+            episode_step += 1
+            if episode_step >= episode_steps or not env.agents:
+                env.reset_batch()
+                resets += 1
+                episode_step = 0
+
+            if total_steps % sample_every == 0:
+                traced = tracemalloc.get_traced_memory()[0] if trace else 0
+                samples.append(MemorySample(total_steps, rss_bytes(), traced))
+                if trace and total_steps >= warmup_steps:
+                    last = _take_snapshot()
+                    if baseline is None:
+                        baseline, baseline_step = last, total_steps
+        env.close()
+
+    if trace:
+        tracemalloc.stop()
+
+    measured = [sample for sample in samples if sample.step >= warmup_steps]
+    measured_steps = [sample.step for sample in measured]
+    sites = []
+    if baseline is not None and last is not None and last is not baseline:
+        units = (measured_steps[-1] - baseline_step) / STEPS_PER_UNIT
+        for stat in last.compare_to(baseline, "lineno")[:top]:
+            frame = stat.traceback[0]
+            sites.append(
+                SiteGrowth(
+                    f"{frame.filename}:{frame.lineno}",
+                    stat.size_diff,
+                    stat.count_diff,
+                    stat.size_diff / units,
+                )
+            )
+
+    return MemoryReport(
+        steps=total_steps,
+        resets=resets,
+        env_cycles=env_cycles,
+        samples=samples,
+        rss_bytes_per_unit=_growth_per_unit(
+            measured_steps, [sample.rss for sample in measured]
+        ),
+        traced_bytes_per_unit=_growth_per_unit(
+            measured_steps, [sample.traced for sample in measured]
+        ),
+        sites=sites,
+        threshold_bytes_per_unit=threshold_kib * 1024,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv memory benchmark")
+    parser.add_argument("--steps", type=int, default=100_000)
+    parser.add_argument("--episode-steps", type=int, default=1000)
+    parser.add_argument("--env-cycles", type=int, default=1)
+    parser.add_argument("--sample-every", type=int, default=1000)
+    parser.add_argument("--warmup-steps", type=int, default=2000)
+    parser.add_argument("--threshold-kib", type=float, default=64.0)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--no-trace", action="store_true")
+    parser.add_argument("--width", type=int, default=600)
+    parser.add_argument("--height", type=int, default=400)
+    parser.add_argument(
+        "--quality", choices=[quality.name for quality in GraphicQuality], default="HD"
+    )
+    parser.add_argument("--num-karts", type=int, default=5)
+    parser.add_argument("--num-karts-controlled", type=int, default=1)
+    args = parser.parse_args()
+
+    graphic_config = GraphicConfig(args.width, args.height, GraphicQuality[args.quality])
+    race_config = RaceConfig(
+        num_karts=args.num_karts, num_karts_controlled=args.num_karts_controlled
+    )
+
+    def make_env() -> RaceEnv:
+        return RaceEnv(
+            graphic_config, race_config, get_reward_fn(), max_step_cnt=args.episode_steps
+        )
+
+    report = run_memory_benchmark(
+        make_env,
+        steps=args.steps,
+        episode_steps=args.episode_steps,
+        env_cycles=args.env_cycles,
+        sample_every=args.sample_every,
+        warmup_steps=args.warmup_steps,
+        threshold_kib=args.threshold_kib,
+        top=args.top,
+        trace=not args.no_trace,
+    )
+    print(report.format())
+    sys.exit(0 if report.passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Worker spawn benchmark: time to the first step of every worker of a pool and of a replacement
+for a crashed worker, with plain spawned processes and with workers forked from the warm
+template process (see `pystk_gym.vector.template`).
+
+    python -m pystk_gym.tools.spawn --workers 8 --contexts spawn template
+"""
+
+import argparse
+import time
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+from ..common.graphics import GraphicConfig, GraphicQuality
+from ..common.race import RaceConfig
+from ..common.reward import get_reward_fn
+from ..vector.pool import SupervisedPool, WorkerHandle
+from ..vector.template import template_context
+from ..vector.worker import EnvSpec
+
+
+class SpawnTiming(NamedTuple):
+    context: str
+    worker: int
+    # seconds from the process start to its env being built and reset
+    ready: float
+    # seconds from the process start to the end of its first step
+    first_step: float
+    respawn: bool = False
+
+
+def _wait_ready(pool: SupervisedPool, handles: List[WorkerHandle]) -> Dict[int, float]:
+    started = {handle.index: handle.since for handle in handles}
+    ready: Dict[int, float] = {}
+    deadline = time.monotonic() + pool.start_timeout
+    while len(ready) < len(handles):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"workers {sorted(set(started) - set(ready))} never got ready")
+        became_ready = pool._poll_starting()
+        now = time.monotonic()
+        for handle in became_ready:
+            ready[handle.index] = now - started[handle.index]
+        if not became_ready:
+            time.sleep(0.002)
+    return ready
+
+
+def measure(spec: EnvSpec, num_workers: int, context: str) -> List[SpawnTiming]:
+    """
+    Starts a pool, steps it once, then kills a worker and steps its replacement once.
+
+    :param context: a multiprocessing start method or "template"
+    """
+    mp_context = template_context(RaceConfig.TRACKS) if context == "template" else context
+    pool = SupervisedPool(spec, num_workers, context=mp_context)
+    actions = np.zeros((num_workers, spec.num_agents, 7), dtype=np.int64)
+    try:
+        ready = _wait_ready(pool, pool.workers)
+        step_start = time.monotonic()
+        pool.step(actions)
+        step_time = time.monotonic() - step_start
+        timings = [
+            SpawnTiming(context, index, ready[index], ready[index] + step_time)
+            for index in range(num_workers)
+        ]
+
+        handle = pool.workers[0]
+        handle.process.kill()
+        handle.process.join()
+        pool.step(actions)  # notices the crash and respawns the worker
+        respawn_ready = _wait_ready(pool, [handle])[0]
+        step_start = time.monotonic()
+        pool.step(actions)
+        step_time = time.monotonic() - step_start
+        timings.append(
+            SpawnTiming(context, 0, respawn_ready, respawn_ready + step_time, respawn=True)
+        )
+        return timings
+    finally:
+        pool.close()
+
+
+def format_timings(timings: List[SpawnTiming]) -> List[str]:
+    lines = [f"{'context':>10} {'kind':>8} {'ready p50':>10} {'ready max':>10} {'first step':>11}"]
+    for context in dict.fromkeys(timing.context for timing in timings):
+        for respawn in (False, True):
+            rows = [
+                timing
+                for timing in timings
+                if timing.context == context and timing.respawn == respawn
+            ]
+            if not rows:
+                continue
+            ready = np.array([timing.ready for timing in rows])
+            first_step = np.array([timing.first_step for timing in rows])
+            lines.append(
+                f"{context:>10} {'respawn' if respawn else 'start':>8} "
+                f"{np.median(ready):>9.2f}s {ready.max():>9.2f}s {np.median(first_step):>10.2f}s"
+            )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="pystk RaceEnv worker spawn benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--contexts",
+        nargs="+",
+        choices=["spawn", "forkserver", "template"],
+        default=["spawn", "template"],
+    )
+    parser.add_argument("--track", default="lighthouse")
+    parser.add_argument("--width", type=int, default=128)
+    parser.add_argument("--height", type=int, default=96)
+    parser.add_argument(
+        "--quality", choices=[quality.name for quality in GraphicQuality], default="LD"
+    )
+    args = parser.parse_args()
+    assert not {"forkserver", "template"} <= set(args.contexts), (
+        "the forkserver is process wide, forkserver and template can't be compared in one run"
+    )
+
+    spec = EnvSpec(
+        GraphicConfig(args.width, args.height, GraphicQuality[args.quality]),
+        RaceConfig(track=args.track),
+        get_reward_fn(),
+    )
+    timings = []
+    for context in args.contexts:
+        timings.extend(measure(spec, args.workers, context))
+    print("\n".join(format_timings(timings)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from ..common.race import ObsType
+from .pool import FAILURE_COUNTERS, SupervisedPool, WorkerHandle
+from .worker import EPISODE_RESET, FINAL_OBSERVATION, WORKER_FAILURE, EnvSpec
+
+
+class AsyncPool(SupervisedPool):
+    """
+    EnvPool style asynchronous pool. `recv` returns the first `batch_size` envs that are ready,
+    together with their env ids, and `send` only steps those envs. Slow tracks, resets and
+    respawns therefore never hold back the other workers.
+
+        pool = AsyncPool(spec, num_workers=16, batch_size=8)
+        pool.async_reset()
+        while True:
+            obs, rewards, terminated, truncated, infos, env_ids = pool.recv()
+            pool.send(policy(obs), env_ids)
+
+    Episodes are reset inside the workers, failures and resets are flagged in the infos the same
+    way as in `SupervisedPool`.
+    """
+
+    def __init__(self, spec: EnvSpec, num_workers: int, batch_size: int, **kwargs):
+        """
+        :param batch_size: number of envs returned by every `recv`
+        :param kwargs: forwarded to `SupervisedPool`
+        """
+        assert 0 < batch_size <= num_workers
+        super().__init__(spec, num_workers, **kwargs)
+        self.batch_size = batch_size
+        # answers that arrived but were not handed out by `recv` yet
+        self._answers: Deque[Tuple[int, str, Any]] = deque()
+
+    def async_reset(self, seed: Optional[int] = None):
+        """Resets every ready env, the envs that are still starting show up once they are ready."""
+        # the workers that are ready answer the reset instead
+        self._answers = deque(answer for answer in self._answers if answer[1] != "ready")
+        for handle in self.workers:
+            if handle.state == "idle":
+                self._send(handle, "reset", self._reset_data(handle, seed))
+
+    def _workers_ready(self, handles: List[WorkerHandle]):
+        for handle in handles:
+            self._answers.append((handle.index, "ready", None))
+
+    def _collect(self):
+        self._workers_ready(self._poll_starting())
+        busy = [handle for handle in self.workers if handle.state == "busy"]
+        if not busy:
+            if not any(handle.state in ("starting", "backoff") for handle in self.workers):
+                self._check_alive()
+                raise RuntimeError("recv called while no env is running, call send first")
+            # only respawning workers left, wait on them instead of spinning
+            self._workers_ready(self._poll_starting(wait_all=True))
+            return
+        needed = self.batch_size - len(self._answers)
+        for index, (status, payload) in self._gather(busy, self.step_timeout, needed).items():
+            handle = self.workers[index]
+            if status == "ok":
+                self._answered(handle)
+                self._answers.append((index, handle.command, payload))
+            else:
+                self._fail(handle, status if status in FAILURE_COUNTERS else "error")
+                self._answers.append((index, WORKER_FAILURE, status))
+
+    def recv(self) -> Tuple[
+        ObsType,  # (batch_size, num_agents, height, width, 3)
+        npt.NDArray[np.float32],  # (batch_size, num_agents)
+        npt.NDArray[np.bool_],  # (batch_size, num_agents)
+        npt.NDArray[np.bool_],  # (batch_size, num_agents)
+        List[Dict[Any, Any]],  # columnar infos per env
+        npt.NDArray[np.int64],  # (batch_size,) env ids
+    ]:
+        answers: List[Tuple[int, str, Any]] = []
+        # answers of envs already in the batch (the restart of a worker that failed in it) go
+        # out with the next one, an env is stepped once per `send`
+        deferred: List[Tuple[int, str, Any]] = []
+        while len(answers) < self.batch_size:
+            if not self._answers:
+                self._collect()
+                continue
+            answer = self._answers.popleft()
+            if any(answer[0] == index for index, *_ in answers):
+                deferred.append(answer)
+            else:
+                answers.append(answer)
+        self._answers.extendleft(reversed(deferred))
+        env_ids = np.array([index for index, *_ in answers], dtype=np.int64)
+        rewards = np.zeros((self.batch_size, self.num_agents), dtype=np.float32)
+        terminated = np.zeros((self.batch_size, self.num_agents), dtype=bool)
+        truncated = np.zeros((self.batch_size, self.num_agents), dtype=bool)
+        infos: List[Dict[Any, Any]] = [{} for _ in range(self.batch_size)]
+        for i, (index, kind, payload) in enumerate(answers):
+            handle = self.workers[index]
+            if kind == "step":
+                rewards[i], terminated[i], truncated[i], infos[i] = payload
+            elif kind == WORKER_FAILURE:
+                truncated[i] = True
+                infos[i][WORKER_FAILURE] = payload
+            else:
+                # a reset or a freshly (re)spawned worker
+                infos[i][EPISODE_RESET] = True
+            handle.needs_final_values = FINAL_OBSERVATION in infos[i]
+            if EPISODE_RESET in infos[i]:
+                handle.reset_options = None
+                self._episode_started(handle)
+        # fancy indexing copies, the slots are free to be written once the envs are sent again
+        return self.frames[env_ids], rewards, terminated, truncated, infos, env_ids
+
+    def send(
+        self,
+        actions: npt.NDArray,
+        env_ids: npt.NDArray[np.int64],
+        values: Optional[npt.NDArray[np.float32]] = None,
+        final_values: Optional[npt.NDArray[np.float32]] = None,
+    ):
+        """
+        :param actions: array of shape (len(env_ids), num_agents, 7)
+        :param env_ids: envs returned by the last `recv` calls
+        :param values: value estimates of the observations of the envs, needed in rollout mode
+        :param final_values: value estimates of the `FINAL_OBSERVATION`s the envs handed out,
+            needed in rollout mode for the envs that did, see `SupervisedPool.step`
+        """
+        env_ids = np.asarray(env_ids)
+        self._check_values([self.workers[env_id] for env_id in env_ids], values, final_values)
+        for i, env_id in enumerate(env_ids.tolist()):
+            handle = self.workers[env_id]
+            # a worker that failed since the recv is respawning and reports back on its own
+            if handle.state == "idle":
+                self._send(
+                    handle,
+                    "step",
+                    self._step_data(
+                        handle,
+                        actions[i],
+                        None if values is None else values[i],
+                        None if final_values is None else final_values[i],
+                    ),
+                )
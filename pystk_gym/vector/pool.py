@@ -0,0 +1,529 @@
+from __future__ import annotations
+
+import ctypes
+import multiprocessing as mp
+import time
+from copy import deepcopy
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+from gymnasium.vector.utils import CloudpickleWrapper
+
+from ..common.coverage import Coverage
+from ..common.normalization import Normalizer
+from ..common.race import ObsType
+from ..common.telemetry import Telemetry
+from .rollout import RolloutConfig
+from .scheduler import TrackScheduler
+from .worker import (
+    EPISODE_RESET,
+    FINAL_OBSERVATION,
+    RESPAWNING,
+    WORKER_FAILURE,
+    EnvSpec,
+    frames_view,
+    worker,
+)
+
+# telemetry counter per kind of worker failure
+FAILURE_COUNTERS = {
+    "crash": "worker_crashes",
+    "timeout": "worker_timeouts",
+    "error": "worker_errors",
+}
+
+
+class WorkerHandle:
+    """Parent side state of one worker process."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.generation = -1
+        self.process: Optional[mp.process.BaseProcess] = None
+        self.conn: Optional[Connection] = None
+        # starting -> idle <-> busy, any failure goes back to starting, after a backoff once it
+        # failed more than once in a row, and to failed for good once it runs out of respawns
+        self.state = "starting"
+        # when the worker was spawned or got its last command
+        self.since = 0.0
+        # failures since the worker last answered a command
+        self.failures = 0
+        # when a worker in backoff is respawned
+        self.respawn_at = 0.0
+        self.command = ""
+        # sent with every step until the env resets, None or the track to switch to
+        self.reset_options: Optional[Dict[str, Any]] = None
+        # the last step handed out a `FINAL_OBSERVATION`, the next one needs its values
+        self.needs_final_values = False
+
+
+class SupervisedPool:
+    """
+    Synchronous pool of RaceEnv worker processes that survives native crashes and hangs.
+
+    Dead workers are detected through their pipe, hung ones through a heartbeat written by a
+    thread in the worker and through per-step deadlines. The episodes of a failed worker are
+    reported as truncated and the worker is respawned with a fresh RaceConfig in the background,
+    the other workers keep stepping in the meantime. Slots that are still respawning are flagged
+    with `RESPAWNING` in their infos and return zero rewards, once the replacement is ready its
+    first observation is returned with the `EPISODE_RESET` flag. A slot whose worker keeps
+    failing without answering a command is respawned with an exponential backoff and given up
+    after `max_respawns`, it is then flagged with `WORKER_FAILURE` on every step.
+    """
+
+    def __init__(
+        self,
+        spec: EnvSpec,
+        num_workers: int,
+        step_timeout: float = 10.0,
+        start_timeout: float = 120.0,
+        heartbeat_interval: float = 0.5,
+        heartbeat_timeout: float = 5.0,
+        context: Optional[Union[str, mp.context.BaseContext]] = None,
+        telemetry: Optional[Telemetry] = None,
+        copy: bool = True,
+        scheduler: Optional[TrackScheduler] = None,
+        rollout: Optional[RolloutConfig] = None,
+        max_respawns: int = 5,
+        respawn_backoff: float = 0.5,
+    ):
+        """
+        :param spec: how every worker builds its env
+        :param step_timeout: deadline for a worker to answer a step or a reset
+        :param start_timeout: deadline for a (re)spawned worker to build its env
+        :param heartbeat_timeout: a busy worker whose heartbeat is older than this is hung
+        :param context: multiprocessing context or start method, the platform default when
+            None. See `pystk_gym.vector.template` for a context with pre-warmed workers.
+        :param telemetry: receives the crash and timeout counters
+        :param copy: return a copy of the shared observations instead of a view into them
+        :param scheduler: keeps every worker on one track for several episodes, the reloads
+            are counted in the telemetry
+        :param rollout: workers collect rollout segments with their returns and advantages, see
+            `step`
+        :param max_respawns: respawns of a slot in a row without its worker answering a command,
+            the slot is given up after that
+        :param respawn_backoff: the first respawn in a row is immediate, the following ones
+            wait `respawn_backoff` seconds, doubled every time
+        """
+        self.spec = spec
+        self.num_workers = num_workers
+        self.num_agents = spec.num_agents
+        self.step_timeout = step_timeout
+        self.start_timeout = start_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.telemetry = Telemetry() if telemetry is None else telemetry
+        self.copy = copy
+        self.scheduler = scheduler
+        self.rollout = rollout
+        self.max_respawns = max_respawns
+        self.respawn_backoff = respawn_backoff
+        # the statistics combined over all workers, see `sync_normalizers`
+        self.normalizer: Optional[Normalizer] = deepcopy(spec.env_kwargs.get("normalizer"))
+        self.closed = False
+        # workers that became ready outside of `step`, which hands out their reset observation
+        self._became_ready: List[WorkerHandle] = []
+
+        self.ctx = (
+            context
+            if isinstance(context, mp.context.BaseContext)
+            else mp.get_context(context)
+        )
+        self._spec = CloudpickleWrapper(spec)
+        self.frames_shape = (num_workers, self.num_agents, *spec.obs_shape)
+        self._frames_buffer = self.ctx.RawArray(ctypes.c_uint8, int(np.prod(self.frames_shape)))
+        self.frames = frames_view(self._frames_buffer, self.frames_shape)
+        self._heartbeats = self.ctx.RawArray(ctypes.c_double, num_workers)
+
+        self.workers = [WorkerHandle(i) for i in range(num_workers)]
+        for handle in self.workers:
+            self._spawn(handle)
+
+    def _spawn(self, handle: WorkerHandle):
+        handle.generation += 1
+        handle.reset_options = None
+        handle.needs_final_values = False
+        start_options = (
+            None if self.scheduler is None else {"track": self.scheduler.track_of(handle.index)}
+        )
+        parent_conn, child_conn = self.ctx.Pipe()
+        handle.process = self.ctx.Process(
+            target=worker,
+            name=f"RaceEnvWorker-{handle.index}",
+            args=(
+                handle.index,
+                handle.generation,
+                self._spec,
+                child_conn,
+                self._frames_buffer,
+                self.frames_shape,
+                self._heartbeats,
+                self.heartbeat_interval,
+                start_options,
+                self.rollout,
+            ),
+            daemon=True,
+        )
+        handle.process.start()
+        child_conn.close()
+        handle.conn = parent_conn
+        handle.state = "starting"
+        handle.since = time.monotonic()
+        self._heartbeats[handle.index] = handle.since
+
+    def _fail(self, handle: WorkerHandle, kind: str):
+        """
+        Kills a crashed, hung or broken worker and starts a replacement, right away unless the
+        slot already failed before without answering a command.
+        """
+        self.telemetry.increment(FAILURE_COUNTERS[kind])
+        if handle.process.is_alive():
+            handle.process.kill()
+        handle.process.join(timeout=1)
+        handle.conn.close()
+        self.frames[handle.index] = 0
+        handle.failures += 1
+        if handle.failures > self.max_respawns:
+            handle.state = "failed"
+            self.telemetry.increment("worker_slots_failed")
+        elif handle.failures == 1:
+            self._spawn(handle)
+        else:
+            handle.state = "backoff"
+            handle.respawn_at = time.monotonic() + self.respawn_backoff * 2 ** (
+                handle.failures - 2
+            )
+
+    def _answered(self, handle: WorkerHandle):
+        """A worker answered its command, it is idle and its slot healthy again."""
+        handle.state = "idle"
+        handle.failures = 0
+
+    def _check_alive(self):
+        if all(handle.state == "failed" for handle in self.workers):
+            raise RuntimeError(
+                f"every worker slot was given up after {self.max_respawns} respawns in a row"
+            )
+
+    def _episode_started(self, handle: WorkerHandle):
+        """Called for every episode a worker starts, lets the scheduler plan its next track."""
+        if self.scheduler is None:
+            return
+        track = self.scheduler.episode_started(handle.index)
+        if track is not None:
+            handle.reset_options = {"track": track}
+            self.telemetry.increment("track_reloads", track=track)
+
+    def _reset_data(self, handle: WorkerHandle, seed: Optional[int]) -> Tuple[Any, Any]:
+        return (None if seed is None else seed + handle.index, handle.reset_options)
+
+    def _poll_starting(self, wait_all: bool = False) -> List[WorkerHandle]:
+        """
+        Checks on the workers that are still building their env.
+
+        :param wait_all: block until every worker is ready or its slot was given up
+        :return: the workers that became ready, their slot holds the reset observation
+        """
+        became_ready = []
+        while True:
+            now = time.monotonic()
+            backoff = [handle for handle in self.workers if handle.state == "backoff"]
+            for handle in backoff:
+                if now >= handle.respawn_at:
+                    self._spawn(handle)
+            starting = [handle for handle in self.workers if handle.state == "starting"]
+            respawn_at = [handle.respawn_at for handle in backoff if handle.state == "backoff"]
+            if not starting and not respawn_at:
+                return became_ready
+            timeout = 0.0
+            if wait_all:
+                timeout = min([self.heartbeat_interval, *(at - now for at in respawn_at)])
+            if starting:
+                ready = wait([handle.conn for handle in starting], timeout=timeout)
+            else:
+                ready = []
+                time.sleep(timeout)
+            now = time.monotonic()
+            for handle in starting:
+                if handle.conn in ready:
+                    try:
+                        status, _ = handle.conn.recv()
+                    except (EOFError, OSError):
+                        status = "crash"
+                    if status == "ready":
+                        handle.state = "idle"
+                        became_ready.append(handle)
+                    else:
+                        self._fail(handle, "error" if status == "error" else "crash")
+                elif not handle.process.is_alive():
+                    self._fail(handle, "crash")
+                elif now - handle.since > self.start_timeout:
+                    self._fail(handle, "timeout")
+            if not wait_all:
+                return became_ready
+
+    def _workers_ready(self, handles: List[WorkerHandle]):
+        """Takes the workers that `_poll_starting` found ready outside of `step`."""
+        self._became_ready.extend(handles)
+
+    def _send(self, handle: WorkerHandle, command: str, data: Any = None):
+        try:
+            handle.conn.send((command, data))
+        except (BrokenPipeError, OSError):
+            # the worker died while idle, `_gather` reports it as a crash
+            pass
+        handle.command = command
+        handle.state = "busy"
+        handle.since = time.monotonic()
+
+    def _gather(
+        self, handles: List[WorkerHandle], timeout: float, count: Optional[int] = None
+    ) -> Dict[int, Tuple[str, Any]]:
+        """
+        Collects the answers of busy workers until all of them (or at least `count`) answered.
+        A worker that misses its deadline (`timeout` after its command was sent), dies or stops
+        beating is reported as "timeout" or "crash" and counts as an answer.
+        """
+        pending = {handle.conn: handle for handle in handles}
+        results: Dict[int, Tuple[str, Any]] = {}
+        while pending and (count is None or len(results) < count):
+            now = time.monotonic()
+            next_deadline = min(handle.since for handle in pending.values()) + timeout
+            for conn in wait(
+                list(pending), timeout=max(0.0, min(next_deadline - now, self.heartbeat_interval))
+            ):
+                handle = pending.pop(conn)
+                try:
+                    results[handle.index] = conn.recv()
+                except (EOFError, OSError):
+                    results[handle.index] = ("crash", None)
+            now = time.monotonic()
+            for conn, handle in list(pending.items()):
+                if not handle.process.is_alive():
+                    results[handle.index] = ("crash", None)
+                elif now - handle.since > timeout:
+                    results[handle.index] = ("timeout", "deadline")
+                elif now - self._heartbeats[handle.index] > self.heartbeat_timeout:
+                    results[handle.index] = ("timeout", "heartbeat")
+                else:
+                    continue
+                del pending[conn]
+        return results
+
+    def _observations(self) -> ObsType:
+        return self.frames.copy() if self.copy else self.frames
+
+    def reset(self, seed: Optional[int] = None) -> Tuple[ObsType, npt.NDArray[np.bool_]]:
+        """
+        Resets every env, waiting for the workers that are still starting.
+
+        :return: observations of shape (num_workers, num_agents, height, width, 3) and the mask
+            of the workers that are ready
+        """
+        self._poll_starting(wait_all=True)
+        self._check_alive()
+        self._became_ready = []
+        busy = []
+        for handle in self.workers:
+            if handle.state == "idle":
+                self._send(handle, "reset", self._reset_data(handle, seed))
+                busy.append(handle)
+        for index, (status, _) in self._gather(busy, self.step_timeout).items():
+            handle = self.workers[index]
+            if status == "ok":
+                self._answered(handle)
+                handle.reset_options = None
+                handle.needs_final_values = False
+                self._episode_started(handle)
+            else:
+                self._fail(handle, status if status in FAILURE_COUNTERS else "error")
+        ready = np.array([handle.state == "idle" for handle in self.workers])
+        return self._observations(), ready
+
+    def _step_data(
+        self,
+        handle: WorkerHandle,
+        actions: npt.NDArray,
+        values: Optional[npt.NDArray[np.float32]],
+        final_values: Optional[npt.NDArray[np.float32]],
+    ) -> Tuple[Any, ...]:
+        """The data of a step command, the arrays are the rows of the worker."""
+        needs_final_values = handle.needs_final_values and self.rollout is not None
+        handle.needs_final_values = False
+        return (
+            actions,
+            handle.reset_options,
+            values,
+            final_values if needs_final_values else None,
+        )
+
+    def _check_values(
+        self,
+        handles: List[WorkerHandle],
+        values: Optional[npt.NDArray[np.float32]],
+        final_values: Optional[npt.NDArray[np.float32]],
+    ):
+        if self.rollout is None:
+            return
+        assert values is not None, "rollout mode needs value estimates"
+        assert final_values is not None or not any(
+            handle.needs_final_values for handle in handles
+        ), "an episode was truncated, the values of its FINAL_OBSERVATION are needed"
+
+    def step(
+        self,
+        actions: npt.NDArray,
+        values: Optional[npt.NDArray[np.float32]] = None,
+        final_values: Optional[npt.NDArray[np.float32]] = None,
+    ) -> Tuple[
+        ObsType,  # (num_workers, num_agents, height, width, 3)
+        npt.NDArray[np.float32],  # (num_workers, num_agents)
+        npt.NDArray[np.bool_],  # (num_workers, num_agents)
+        npt.NDArray[np.bool_],  # (num_workers, num_agents)
+        List[Dict[Any, Any]],  # columnar infos per worker
+    ]:
+        """
+        :param actions: array of shape (num_workers, num_agents, 7)
+        :param values: value estimates of the current observations, (num_workers, num_agents),
+            needed in rollout mode. The infos of a step that completed a worker's segment carry
+            it under `ROLLOUT_SEGMENT`.
+        :param final_values: value estimates of the `FINAL_OBSERVATION`s of the last step,
+            (num_workers, num_agents), needed in rollout mode if the last step had any. The
+            rows of the other workers are ignored.
+        """
+        self._check_values(self.workers, values, final_values)
+        # respawned workers first hand out their reset observation before they are stepped
+        just_started = self._became_ready + self._poll_starting()
+        self._became_ready = []
+        self._check_alive()
+        rewards = np.zeros((self.num_workers, self.num_agents), dtype=np.float32)
+        terminated = np.zeros((self.num_workers, self.num_agents), dtype=bool)
+        truncated = np.zeros((self.num_workers, self.num_agents), dtype=bool)
+        infos: List[Dict[Any, Any]] = [{} for _ in range(self.num_workers)]
+
+        busy = []
+        for handle in self.workers:
+            if handle in just_started and handle.state == "idle":
+                infos[handle.index][EPISODE_RESET] = True
+                self._episode_started(handle)
+            elif handle.state == "idle":
+                self._send(
+                    handle,
+                    "step",
+                    self._step_data(
+                        handle,
+                        actions[handle.index],
+                        None if values is None else values[handle.index],
+                        None if final_values is None else final_values[handle.index],
+                    ),
+                )
+                busy.append(handle)
+            elif handle.state == "failed":
+                infos[handle.index][WORKER_FAILURE] = "failed"
+            else:
+                infos[handle.index][RESPAWNING] = True
+
+        for index, (status, payload) in self._gather(busy, self.step_timeout).items():
+            handle = self.workers[index]
+            if status == "ok":
+                self._answered(handle)
+                rewards[index], terminated[index], truncated[index], infos[index] = payload
+                handle.needs_final_values = FINAL_OBSERVATION in infos[index]
+                if EPISODE_RESET in infos[index]:
+                    handle.reset_options = None
+                    self._episode_started(handle)
+            else:
+                self._fail(handle, status if status in FAILURE_COUNTERS else "error")
+                truncated[index] = True
+                infos[index][WORKER_FAILURE] = status
+        return self._observations(), rewards, terminated, truncated, infos
+
+    def _query(self, command: str, data: Any = None) -> List[Any]:
+        """Sends a query command to every ready worker and returns their answers."""
+        self._workers_ready(self._poll_starting())
+        idle = [handle for handle in self.workers if handle.state == "idle"]
+        for handle in idle:
+            self._send(handle, command, data)
+        payloads = []
+        for index, (status, payload) in self._gather(idle, self.step_timeout).items():
+            handle = self.workers[index]
+            if status == "ok":
+                self._answered(handle)
+                payloads.append(payload)
+            else:
+                self._fail(handle, status if status in FAILURE_COUNTERS else "error")
+        return payloads
+
+    def call(self, name: str, *args) -> List[Any]:
+        """Calls a method of every ready worker's env and returns the results."""
+        return self._query("call", (name, args))
+
+    def collect_telemetry(self) -> Telemetry:
+        """Merges the telemetry of every ready worker's env with the pool counters."""
+        merged = Telemetry(self.telemetry.capacity)
+        merged.merge(self.telemetry)
+        for telemetry in self._query("telemetry"):
+            merged.merge(telemetry)
+        return merged
+
+    def collect_coverage(self) -> Coverage:
+        """
+        Merges the track coverage of every ready worker's env, the envs need a `coverage`
+        collector in `spec.env_kwargs`.
+        """
+        merged = Coverage()
+        for coverage in self._query("coverage"):
+            if coverage is not None:
+                merged.merge(coverage)
+        return merged
+
+    def sync_normalizers(self) -> Optional[Normalizer]:
+        """
+        Merges the normalization statistics the workers gathered since the last sync into the
+        pool's ones and hands them to every worker, to call periodically (e.g. once per
+        rollout). The envs need a `normalizer` in `spec.env_kwargs`, the pool's statistics
+        start from it. Freezing `self.normalizer` freezes the workers with the next sync.
+
+        :returns: the combined statistics, None if the envs don't normalize
+        """
+        # the updates of every worker are merged first, so that the statistics handed out
+        # include them
+        self._merge_normalizer_updates(self._query("normalizer"))
+        if self.normalizer is not None:
+            # workers that became ready in between send their updates now, they are handed
+            # out with the next sync
+            self._merge_normalizer_updates(self._query("normalizer", self.normalizer))
+        return self.normalizer
+
+    def _merge_normalizer_updates(self, updates: List[Optional[Normalizer]]):
+        for update in updates:
+            if update is None:
+                continue
+            if self.normalizer is None:
+                self.normalizer = update
+            else:
+                self.normalizer.merge(update)
+
+    def close(self, timeout: float = 5.0):
+        if self.closed:
+            return
+        self.closed = True
+        for handle in self.workers:
+            if handle.state == "idle":
+                try:
+                    handle.conn.send(("close", None))
+                except (BrokenPipeError, OSError):
+                    pass
+        deadline = time.monotonic() + timeout
+        for handle in self.workers:
+            handle.process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if handle.process.is_alive():
+                handle.process.kill()
+                handle.process.join()
+            handle.conn.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
@@ -0,0 +1,162 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+
+class RolloutConfig(NamedTuple):
+    """Rollout collection mode of the pool workers."""
+
+    length: int
+    gamma: float = 0.99
+    lam: float = 0.95
+
+
+class Segment(NamedTuple):
+    """A fixed length rollout segment of one env, every array has shape (length, num_agents)."""
+
+    rewards: npt.NDArray[np.float32]
+    terminated: npt.NDArray[np.bool_]
+    truncated: npt.NDArray[np.bool_]
+    values: npt.NDArray[np.float32]
+    # the agent was racing at the start of the step, steps after its episode ended are padding
+    valid: npt.NDArray[np.bool_]
+    advantages: npt.NDArray[np.float32]
+    returns: npt.NDArray[np.float32]
+
+
+def compute_gae(
+    rewards: npt.NDArray[np.float32],
+    values: npt.NDArray[np.float32],
+    terminated: npt.NDArray[np.bool_],
+    truncated: npt.NDArray[np.bool_],
+    last_values: npt.NDArray[np.float32],
+    gamma: float = 0.99,
+    lam: float = 0.95,
+    valid: Optional[npt.NDArray[np.bool_]] = None,
+    advantages: Optional[npt.NDArray[np.float32]] = None,
+    final_values: Optional[npt.NDArray[np.float32]] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Generalized advantage estimation with a reverse scan over time, vectorized over the agents.
+
+    Terminated steps don't bootstrap, truncated steps bootstrap from the value of the
+    observation the episode was cut at. Neither carries advantages over the episode boundary.
+
+    :param rewards: array of shape (length, num_agents), same for values and the flags
+    :param last_values: values of the observations following the last step, (num_agents,)
+    :param valid: steps to compute, the others get a zero advantage
+    :param advantages: output array, allocated if None
+    :param final_values: values of the observations the steps ended at, (length, num_agents),
+        only read for the truncated steps. If None, they bootstrap from their own value.
+    """
+    length = len(rewards)
+    advantages = np.empty_like(values, dtype=np.float32) if advantages is None else advantages
+    next_values = np.asarray(last_values, dtype=np.float32)
+    next_advantages = np.zeros_like(next_values)
+    for t in range(length - 1, -1, -1):
+        final = values[t] if final_values is None else final_values[t]
+        bootstrap = np.where(truncated[t], final, next_values) * ~terminated[t]
+        episode_continues = ~(terminated[t] | truncated[t])
+        delta = rewards[t] + gamma * bootstrap - values[t]
+        next_advantages = delta + gamma * lam * episode_continues * next_advantages
+        if valid is not None:
+            next_advantages = next_advantages * valid[t]
+        advantages[t] = next_advantages
+        next_values = values[t]
+    return advantages
+
+
+class RolloutBuffer:
+    """
+    Preallocated segment arrays filled by a worker step by step. The values of the
+    observations a step ended at come with the next step, they complete the segment and
+    bootstrap the truncated episodes.
+    """
+
+    def __init__(self, config: RolloutConfig, num_agents: int):
+        self.config = config
+        shape = (config.length, num_agents)
+        self.rewards = np.zeros(shape, dtype=np.float32)
+        self.terminated = np.zeros(shape, dtype=bool)
+        self.truncated = np.zeros(shape, dtype=bool)
+        self.values = np.zeros(shape, dtype=np.float32)
+        self.final_values = np.zeros(shape, dtype=np.float32)
+        self.valid = np.zeros(shape, dtype=bool)
+        self.advantages = np.zeros(shape, dtype=np.float32)
+        self.t = 0
+        # the last step still waits for the values of the observations it ended at
+        self._awaiting_final_values = False
+
+    @property
+    def full(self) -> bool:
+        return self.t == self.config.length
+
+    def add(
+        self,
+        values: npt.NDArray[np.float32],
+        valid: npt.NDArray[np.bool_],
+        rewards: npt.NDArray[np.float32],
+        terminated: npt.NDArray[np.bool_],
+        truncated: npt.NDArray[np.bool_],
+    ):
+        """
+        :param values: value estimates of the observations the step was taken from
+        :param valid: agents that were racing when the step was taken
+        """
+        t = self.t
+        self.values[t] = values
+        self.valid[t] = valid
+        self.rewards[t] = rewards * valid
+        self.terminated[t] = terminated
+        self.truncated[t] = truncated
+        self.t += 1
+        self._awaiting_final_values = True
+
+    def bootstrap(self, final_values: npt.NDArray[np.float32]):
+        """
+        :param final_values: values of the observations the last step ended at, which are the
+            ones before the reset if the env was reset after it
+        """
+        if self._awaiting_final_values:
+            self.final_values[self.t - 1] = final_values
+            self._awaiting_final_values = False
+
+    def cut(self):
+        """
+        Ends the episodes at the last step, for resets that don't come from the env. No value
+        of the observation they were cut at comes anymore, they bootstrap from the value of
+        the last step's own observation instead.
+        """
+        if self.t > 0:
+            self.truncated[self.t - 1] |= ~self.terminated[self.t - 1]
+            if self._awaiting_final_values:
+                self.final_values[self.t - 1] = self.values[self.t - 1]
+                self._awaiting_final_values = False
+
+    def finish(self, last_values: npt.NDArray[np.float32]) -> Segment:
+        """Computes the advantages and returns of the full segment and starts a new one."""
+        assert self.full
+        compute_gae(
+            self.rewards,
+            self.values,
+            self.terminated,
+            self.truncated,
+            last_values,
+            self.config.gamma,
+            self.config.lam,
+            self.valid,
+            self.advantages,
+            self.final_values,
+        )
+        segment = Segment(
+            self.rewards.copy(),
+            self.terminated.copy(),
+            self.truncated.copy(),
+            self.values.copy(),
+            self.valid.copy(),
+            self.advantages.copy(),
+            (self.advantages + self.values * self.valid).astype(np.float32),
+        )
+        self.t = 0
+        return segment
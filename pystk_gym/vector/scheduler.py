@@ -0,0 +1,119 @@
+import math
+from typing import List, Mapping, Optional, Sequence, Set, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from ..common.race import RaceConfig
+
+
+class TrackScheduler:
+    """
+    Track-affinity episode scheduler for pooled envs.
+
+    Every worker races `episodes_per_track` episodes on its track before it is reassigned, so
+    races are only rebuilt on reassignment instead of on every episode. Reassignments go to the
+    track that is the furthest behind its share of the requested mix, counting the episodes
+    already run and the ones the current assignments will still run. The first assignments
+    are staggered and at most `max_concurrent_reloads` reassignments are pending at once, so
+    the workers don't all rebuild their race at the same moment.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        tracks: Optional[Sequence[str]] = None,
+        weights: Optional[Union[Sequence[float], Mapping[str, float]]] = None,
+        episodes_per_track: int = 8,
+        max_concurrent_reloads: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param tracks: tracks to schedule, all of them if None
+        :param weights: share of the episodes of every track (a sequence following `tracks` or
+            a dict by track name), uniform if None
+        :param episodes_per_track: episodes a worker runs on a track before it is reassigned
+        :param max_concurrent_reloads: reassignments that may be pending at once, enough to
+            keep up with `num_workers / episodes_per_track` reloads per episode if None
+        :param seed: breaks ties between equally behind tracks
+        """
+        self.num_workers = num_workers
+        self.tracks = list(RaceConfig.TRACKS if tracks is None else tracks)
+        self.episodes_per_track = episodes_per_track
+        self.max_concurrent_reloads = (
+            max(1, math.ceil(num_workers / episodes_per_track))
+            if max_concurrent_reloads is None
+            else max_concurrent_reloads
+        )
+        self.rng = np.random.default_rng(seed)
+        self.set_weights(weights)
+
+        self.episodes = np.zeros(len(self.tracks), dtype=np.int64)
+        self.reloads = 0
+        self._current = np.full(num_workers, -1, dtype=np.int64)
+        self._remaining = np.zeros(num_workers, dtype=np.int64)
+        # workers whose next reset switches track
+        self._pending: Set[int] = set()
+
+    def set_weights(self, weights: Optional[Union[Sequence[float], Mapping[str, float]]]):
+        """Changes the requested mix, for curricula. Only new assignments follow it."""
+        if weights is None:
+            weights = np.ones(len(self.tracks))
+        elif isinstance(weights, Mapping):
+            weights = [weights.get(track, 0.0) for track in self.tracks]
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.shape == (len(self.tracks),) and (weights >= 0).all() and weights.sum() > 0
+        self.weights = weights / weights.sum()
+
+    def _pick(self) -> int:
+        assigned = self._current >= 0
+        planned = self.episodes.copy()
+        np.add.at(planned, self._current[assigned], self._remaining[assigned])
+        total = planned.sum() + self.episodes_per_track
+        deficit = self.weights * total - planned
+        deficit[self.weights == 0] = -np.inf
+        behind = np.flatnonzero(deficit >= deficit.max() - 1e-9)
+        return int(self.rng.choice(behind))
+
+    def track_of(self, worker: int) -> str:
+        """The track of a worker, the first call assigns it."""
+        if self._current[worker] < 0:
+            self._current[worker] = self._pick()
+            # spreads the first reassignments evenly over one stint
+            self._remaining[worker] = max(
+                1, math.ceil(self.episodes_per_track * (worker + 1) / self.num_workers)
+            )
+        return self.tracks[self._current[worker]]
+
+    def episode_started(self, worker: int) -> Optional[str]:
+        """
+        Accounts for an episode the worker started on its track.
+
+        :returns: the track the worker's next reset has to switch to, None to stay
+        """
+        self._pending.discard(worker)
+        self.track_of(worker)
+        self.episodes[self._current[worker]] += 1
+        self._remaining[worker] -= 1
+        if self._remaining[worker] > 0:
+            return None
+        if len(self._pending) >= self.max_concurrent_reloads:
+            # too many workers are about to rebuild, stay one more episode
+            self._remaining[worker] = 1
+            return None
+
+        track = self._pick()
+        self._remaining[worker] = self.episodes_per_track
+        if track == self._current[worker]:
+            return None
+        self._current[worker] = track
+        self._pending.add(worker)
+        self.reloads += 1
+        return self.tracks[track]
+
+    def distribution(self) -> npt.NDArray[np.float64]:
+        """Share of the started episodes per track, follows `tracks`."""
+        return self.episodes / max(self.episodes.sum(), 1)
+
+    def assignments(self) -> List[Optional[str]]:
+        return [self.tracks[track] if track >= 0 else None for track in self._current]
@@ -0,0 +1,57 @@
+"""
+Warm template process for pool workers.
+
+`template_context` returns a forkserver multiprocessing context whose server process imports
+numpy, gymnasium, pettingzoo, pystk and pystk_gym once and loads the disk cache of the track
+geometry. Workers are forked from it, so they start with all of that in memory and only run
+`pystk.init` (which creates the GL context and can't be shared across a fork) themselves.
+
+    pool = SupervisedPool(spec, num_workers=16, context=template_context(RaceConfig.TRACKS))
+"""
+
+import multiprocessing as mp
+import os
+from multiprocessing import forkserver
+from typing import Iterable, List, Optional
+
+from ..common import geometry
+
+# read by this module when the template process imports it
+PRELOAD_TRACKS_ENV = "PYSTK_GYM_PRELOAD_TRACKS"
+PRELOAD_MODULES = [
+    "numpy",
+    "gymnasium",
+    "pettingzoo",
+    "pystk",
+    "pystk_gym.envs.race_env",
+    "pystk_gym.vector.worker",
+    "pystk_gym.vector.template",
+]
+
+
+def template_context(
+    tracks: Optional[Iterable[str]] = None,
+    modules: Optional[List[str]] = None,
+    start: bool = True,
+) -> mp.context.BaseContext:
+    """
+    The template is the process wide forkserver, it has to be configured before the first
+    forkserver process is started and keeps the first configuration afterwards.
+
+    :param tracks: tracks whose cached geometry the template loads
+    :param modules: modules the template imports, `PRELOAD_MODULES` if None
+    :param start: start the template now instead of on the first spawn, so that the first
+        workers don't pay for the imports
+    """
+    if tracks is not None:
+        # the template process inherits the environment of the process starting it
+        os.environ[PRELOAD_TRACKS_ENV] = ",".join(tracks)
+    ctx = mp.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD_MODULES if modules is None else modules)
+    if start:
+        forkserver.ensure_running()
+    return ctx
+
+
+if os.environ.get(PRELOAD_TRACKS_ENV):
+    geometry.preload(os.environ[PRELOAD_TRACKS_ENV].split(","))
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import traceback
+from copy import copy
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+from gymnasium.vector.utils import CloudpickleWrapper
+
+from ..common.graphics import GraphicConfig
+from ..common.race import RaceConfig
+from ..envs.race_env import RaceEnv
+from .rollout import RolloutBuffer, RolloutConfig
+
+# flags added by the workers and pools to the columnar infos of an env
+EPISODE_RESET = "episode_reset"
+RESPAWNING = "respawning"
+WORKER_FAILURE = "worker_failure"
+# the rollout segment (see `rollout.Segment`) completed by a step
+ROLLOUT_SEGMENT = "rollout_segment"
+# observations (num_agents, height, width, 3) a step truncated the episode at, when the env was
+# reset right after it and its slot holds the reset observations
+FINAL_OBSERVATION = "final_observation"
+
+
+class EnvSpec:
+    """Everything a worker process needs to build its RaceEnv."""
+
+    def __init__(
+        self,
+        graphic_config: GraphicConfig,
+        race_config: RaceConfig,
+        reward_func: Callable,
+        env_kwargs: Optional[Dict[str, Any]] = None,
+    ):
+        self.graphic_config = graphic_config
+        self.race_config = race_config
+        self.reward_func = reward_func
+        self.env_kwargs = {} if env_kwargs is None else env_kwargs
+
+    @property
+    def num_agents(self) -> int:
+        return self.race_config.num_karts_controlled
+
+    @property
+    def obs_shape(self) -> Tuple[int, int, int]:
+        return (self.graphic_config.height, self.graphic_config.width, 3)
+
+    def race_config_for(self, index: int, generation: int) -> RaceConfig:
+        """
+        A fresh race config for a (re)spawned worker, every worker slot and generation gets its
+        own seed.
+        """
+        race_config = copy(self.race_config)
+        race_config.seed = int(
+            np.random.SeedSequence([self.race_config.seed, index, generation]).generate_state(1)[0]
+        )
+        return race_config
+
+    def make(
+        self, index: int = 0, generation: int = 0, options: Optional[Dict[str, Any]] = None
+    ) -> RaceEnv:
+        """
+        :param options: `track` and/or `reverse` overriding the race config, like the options of
+            `RaceEnv.reset`
+        """
+        race_config = self.race_config_for(index, generation)
+        if options is not None:
+            race_config.track = options.get("track", race_config.track)
+            race_config.reverse = options.get("reverse", race_config.reverse)
+        env_kwargs = self.env_kwargs
+        if isinstance(env_kwargs.get("flight_recorder"), str):
+            # one recorder file per worker slot and generation, like
+            # "flight_{index}_{generation}.bin"
+            path = env_kwargs["flight_recorder"].format(index=index, generation=generation)
+            if generation > 0 and os.path.exists(path):
+                # a path without the generation, the replaced worker's steps are moved aside
+                # instead of being overwritten
+                os.replace(path, f"{path}.{generation - 1}")
+            env_kwargs = {**env_kwargs, "flight_recorder": path}
+        return RaceEnv(self.graphic_config, race_config, self.reward_func, **env_kwargs)
+
+
+def frames_view(frames_buffer, frames_shape: Tuple[int, ...]) -> np.ndarray:
+    """
+    Numpy view of a shared frames buffer of shape (num_slots, num_agents, height, width, 3).
+    The raw buffer is what gets passed to the processes, so that no frames are ever pickled.
+    """
+    return np.frombuffer(frames_buffer, dtype=np.uint8).reshape(frames_shape)
+
+
+def _beat(heartbeats, index: int, interval: float, stop: threading.Event):
+    # runs next to the env, a native call that hangs while holding the GIL stops the beats
+    while not stop.is_set():
+        heartbeats[index] = time.monotonic()
+        stop.wait(interval)
+
+
+def worker(
+    index: int,
+    generation: int,
+    spec: CloudpickleWrapper,
+    conn: Connection,
+    frames_buffer,
+    frames_shape: Tuple[int, ...],
+    heartbeats,
+    heartbeat_interval: float,
+    start_options: Optional[Dict[str, Any]] = None,
+    rollout: Optional[RolloutConfig] = None,
+):
+    """
+    Worker process loop. The env writes its observations to its slot of the shared frames
+    buffer (see `frames_view`), everything else goes through `conn`.
+
+    Commands are `(name, data)` tuples:
+        ("reset", (seed, options))  -> ("ok", None)
+        ("step", (actions, options, values, final_values))
+                                    -> ("ok", (rewards, terminated, truncated, infos))
+        ("telemetry", None)         -> ("ok", telemetry)
+        ("coverage", None)          -> ("ok", coverage)
+        ("normalizer", shared)      -> ("ok", updates since the last sync)
+        ("call", (name, args))      -> ("ok", result)
+        ("close", None)             -> ("ok", None)
+    The env is reset right after the step that ended its episode, which is flagged in the infos.
+    The options of a step (None, or a track to switch to) are used by that reset. If the episode
+    was truncated, the infos also carry the observations it was cut at under
+    `FINAL_OBSERVATION`, the next step then needs their values as `final_values` in rollout
+    mode.
+
+    :param start_options: track and direction the env starts on, see `EnvSpec.make`
+    :param rollout: collect rollout segments, the steps then need the value estimates of the
+        observations they are taken from. A completed segment comes with the step after it.
+    """
+    stop = threading.Event()
+    threading.Thread(
+        target=_beat, args=(heartbeats, index, heartbeat_interval, stop), daemon=True
+    ).start()
+    env = None
+    try:
+        env_spec: EnvSpec = spec.fn
+        env = env_spec.make(index, generation, start_options)
+        obs_slot = frames_view(frames_buffer, frames_shape)[index]
+        buffer = None if rollout is None else RolloutBuffer(rollout, len(env.possible_agents))
+        obs, _ = env.reset_batch()
+        obs_slot[:] = obs
+        conn.send(("ready", None))
+
+        while True:
+            command, data = conn.recv()
+            if command == "reset":
+                seed, options = data
+                obs, _ = env.reset_batch(seed=seed, options=options)
+                if buffer is not None:
+                    buffer.cut()
+                obs_slot[:] = obs
+                conn.send(("ok", None))
+            elif command == "step":
+                actions, options, values, final_values = data
+                segment = None
+                if buffer is not None:
+                    # the observations the last step ended at are the current ones, unless the
+                    # env was reset after it
+                    buffer.bootstrap(values if final_values is None else final_values)
+                    segment = buffer.finish(values) if buffer.full else None
+                    active = set(env.agents)
+                    valid = np.array([agent in active for agent in env.possible_agents])
+                obs, rewards, terminated, truncated, infos = env.step_batch(
+                    np.asarray(actions), columnar_infos=True
+                )
+                if buffer is not None:
+                    buffer.add(values, valid, rewards, terminated, truncated)
+                    if segment is not None:
+                        infos[ROLLOUT_SEGMENT] = segment
+                if not env.agents:
+                    if truncated.any():
+                        infos[FINAL_OBSERVATION] = obs.copy()
+                    obs, _ = env.reset_batch(options=options)
+                    infos[EPISODE_RESET] = True
+                obs_slot[:] = obs
+                conn.send(("ok", (rewards, terminated, truncated, infos)))
+            elif command == "telemetry":
+                conn.send(("ok", env.telemetry))
+            elif command == "coverage":
+                conn.send(("ok", env.coverage))
+            elif command == "normalizer":
+                normalizer = env.normalizer
+                conn.send(("ok", None if normalizer is None else normalizer.sync(data)))
+            elif command == "call":
+                name, args = data
+                conn.send(("ok", getattr(env, name)(*args)))
+            elif command == "close":
+                conn.send(("ok", None))
+                break
+            else:
+                raise RuntimeError(f"unknown worker command {command}")
+    except (KeyboardInterrupt, EOFError):
+        pass
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        stop.set()
+        if env is not None:
+            env.close()
+        conn.close()
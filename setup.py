@@ -23,14 +23,14 @@ setuptools.setup(
     python_requires=">=3.9",
     install_requires=[
         "numpy",
-        "PyQt5",
-        "pygame",
         "gymnasium",
-        "matplotlib",
         "pettingzoo",
         "PySuperTuxKart",
     ],
     extras_require={
+        "viewer": ["pygame"],
+        "analytics": ["matplotlib"],
+        "compression": ["lz4"],
         "dev": ["mypy", "black", "isort", "flake8", "pylint", "pyright", "pytest"]
     },
 )
@@ -0,0 +1,47 @@
+import numpy as np
+
+from pystk_gym.common.actions import ContinuousAction, HybridAction, MultiDiscreteAction
+
+
+def test_continuous_actions_are_clipped():
+    action_class = ContinuousAction()
+    actions = np.array([[1.5, 0.2, -3.0, 0.9, 0.0, 0.6, 0.4], [0.25, 0.7, 0.5, 0, 0, 0, 0]])
+    first, second = action_class.get_pystk_actions(actions)
+    assert (first.acceleration, first.steer) == (1.0, -1.0)
+    assert [getattr(first, name) for name in ["brake", "fire", "drift", "nitro", "rescue"]] == [
+        False,
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert (second.acceleration, second.steer, second.brake) == (0.25, 0.5, True)
+
+    action = action_class.get_pystk_action({"steer": 0.3, "nitro": 1})
+    assert (action.acceleration, action.steer, action.nitro, action.fire) == (0, 0.3, True, False)
+
+
+def test_hybrid_actions_from_parts_and_rows():
+    action_class = HybridAction()
+    continuous = np.array([[0.5, -0.25], [2.0, 0.0]], dtype=np.float32)
+    discrete = np.array([[0, 0, 1, 0, 0], [1, 0, 0, 0, 1]])
+    from_parts = action_class.get_pystk_actions((continuous, discrete))
+    rows = np.array([[0.5, 0, -0.25, 0, 1, 0, 0], [1.0, 1, 0.0, 0, 0, 0, 1]])
+    from_rows = action_class.get_pystk_actions(rows)
+    for left, right in zip(from_parts, from_rows):
+        for name in HybridAction.ACTIONS:
+            assert getattr(left, name) == getattr(right, name)
+    assert from_parts[1].acceleration == 1.0 and from_parts[1].rescue
+
+    sample = action_class.space().sample()
+    action = action_class.get_pystk_action(sample)
+    assert action.steer == np.clip(sample[0][1], -1, 1)
+
+
+def test_multi_discrete_batch_matches_single_actions():
+    action_class = MultiDiscreteAction()
+    actions = np.stack([action_class.space().sample() for _ in range(8)])
+    for row, batched in zip(actions, action_class.get_pystk_actions(actions)):
+        single = action_class.get_pystk_action(row)
+        for name in MultiDiscreteAction.ACTIONS:
+            assert getattr(single, name) == getattr(batched, name)
@@ -0,0 +1,60 @@
+from pystk_gym.common.graphics import GraphicQuality
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.envs.race_env import RaceEnv
+from pystk_gym.tools.autotune import (
+    Candidate,
+    ProbeResult,
+    autotune,
+    pareto_front,
+    probe,
+    recommend,
+)
+
+
+def test_pareto_front():
+    hd = ProbeResult(Candidate(GraphicQuality.HD, 0.09, 1, 1), 100.0)
+    ld = ProbeResult(Candidate(GraphicQuality.LD, 0.09, 1, 1), 300.0)
+    ld_more_workers = ProbeResult(Candidate(GraphicQuality.LD, 0.09, 1, 2), 250.0)
+    failed = ProbeResult(Candidate(GraphicQuality.SD, 0.09, 1, 1), error="crash")
+
+    front = pareto_front([hd, ld, ld_more_workers, failed])
+    assert front == [hd, ld]
+    assert recommend(front, min_steps_per_sec=50) == hd
+    assert recommend(front, min_steps_per_sec=200) == ld
+    assert recommend(front, min_steps_per_sec=1000) == ld
+
+
+def test_autotune_writes_loadable_config(tmp_path):
+    path = str(tmp_path / "env.json")
+    best, front, results = autotune(
+        100,
+        100,
+        RaceConfig(track="lighthouse", num_karts=3, num_karts_controlled=2),
+        [Candidate(GraphicQuality.LD, 0.09, frame_skip, 1) for frame_skip in (1, 2)],
+        steps=10,
+        warmup_steps=2,
+        out_path=path,
+    )
+    assert all(result.ok for result in results)
+    assert best in front
+
+    env = RaceEnv.from_config_file(path)
+    try:
+        assert env.frame_skip == best.candidate.frame_skip
+        assert env.graphic_config.graphic_quality == GraphicQuality.LD
+        obs, _ = env.reset_batch()
+        assert obs.shape == (2, 100, 100, 3)
+    finally:
+        env.close()
+
+
+def test_probe_without_measured_steps():
+    result = probe(
+        Candidate(GraphicQuality.LD, 0.09, 1, 1),
+        100,
+        100,
+        RaceConfig(track="lighthouse", num_karts=1, num_karts_controlled=1),
+        steps=0,
+        warmup_steps=1,
+    )
+    assert result.ok and result.steps_per_sec == 0
@@ -0,0 +1,51 @@
+import numpy as np
+
+from pystk_gym.common.coverage import Coverage, TrackCoverage
+from pystk_gym.common.graphics import GraphicConfig, GraphicQuality
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.common.reward import get_reward_fn
+from pystk_gym.envs.race_env import RaceEnv
+
+
+def test_track_coverage_merge_and_save(tmp_path):
+    path_nodes = np.zeros((10, 2, 3), dtype=np.float32)
+    path_nodes[:, :, 0] = np.arange(10)[:, None] * 10
+    path_nodes[:, 1, 2] = 5
+    # a small buffer, so that the counts are binned in several flushes
+    coverage = TrackCoverage("lighthouse", path_nodes, grid_size=8, buffer_size=3)
+    for step in range(10):
+        coverage.record(
+            [step, step],
+            [[step * 10, 0, 0], [step * 10, 0, 100]],
+            [[False, False, False], [True, step % 2 == 0, False]],
+        )
+
+    total = Coverage(grid_size=8)
+    total.merge(Coverage(grid_size=8))
+    worker = Coverage(grid_size=8)
+    worker.tracks["lighthouse"] = coverage
+    total.merge(worker)
+    total.merge(worker)
+    counts = total.tracks["lighthouse"]
+    assert counts.node_counts.sum(axis=1).tolist() == [40, 20, 10, 0]
+    assert counts.grid_counts.sum(axis=(1, 2)).tolist() == [40, 20, 10, 0]
+    assert counts.rates("off_track").tolist() == [0.5] * 10
+
+    total.save(str(tmp_path / "coverage.npz"))
+    loaded = Coverage.load(str(tmp_path / "coverage.npz"))
+    assert (loaded.tracks["lighthouse"].grid_counts == counts.grid_counts).all()
+
+
+def test_env_coverage():
+    coverage = Coverage()
+    env = RaceEnv(
+        GraphicConfig(100, 100, GraphicQuality.LD),
+        RaceConfig(track="lighthouse", num_karts=3, num_karts_controlled=2),
+        get_reward_fn(),
+        coverage=coverage,
+    )
+    env.reset_batch()
+    for _ in range(10):
+        env.step_batch(np.ones((2, 7), dtype=np.int64))
+    env.close()
+    assert coverage.tracks["lighthouse"].node_counts[0].sum() == 20
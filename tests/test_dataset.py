@@ -0,0 +1,50 @@
+import numpy as np
+
+from pystk_gym.common.dataset import DatasetWriter, ShardDataset
+
+
+def write_steps(directory, num_steps, shard_size):
+    # two agents, the second one finishes every episode 2 steps before the first, the rewards
+    # are the step index (plus 0.5 for the second agent)
+    writer = DatasetWriter(str(directory), shard_size)
+    for step in range(num_steps):
+        position = step % 6
+        obs = np.full((2, 4, 4, 3), step % 256, dtype=np.uint8)
+        writer.add(
+            obs,
+            np.full((2, 7), step),
+            np.array([step, step + 0.5], dtype=np.float32),
+            np.array([position == 5, position == 3]),
+            np.zeros(2, dtype=bool),
+        )
+    writer.close()
+
+
+def test_sequences_stay_in_one_episode(tmp_path):
+    write_steps(tmp_path, 30, shard_size=16)
+    dataset = ShardDataset(str(tmp_path))
+    assert len(dataset.shards) == 2
+    # agent 0 races 6 steps per episode and agent 1 races 4
+    assert dataset.num_samples() == 5 * 6 + 5 * 4
+    for sample in range(dataset.num_samples(3)):
+        sequence = dataset.sample_view(sample, 3)
+        steps = sequence.rewards.astype(int)
+        assert (np.diff(steps) == 1).all()
+        assert steps[0] // 6 == steps[-1] // 6
+        assert not sequence.terminated[:-1].any()
+
+
+def test_iter_batches_covers_every_sample_once(tmp_path):
+    write_steps(tmp_path, 100, shard_size=16)
+    dataset = ShardDataset(str(tmp_path))
+    rewards = []
+    for batch in dataset.iter_batches(
+        8, sequence_length=2, shuffle_buffer=10, num_threads=2, drop_last=False, seed=0
+    ):
+        assert batch.obs.shape[1:] == (2, 4, 4, 3)
+        np.testing.assert_array_equal(batch.obs[:, :, 0, 0, 0], batch.rewards.astype(int) % 256)
+        rewards.extend(map(tuple, batch.rewards.tolist()))
+    assert len(set(rewards)) == len(rewards) == dataset.num_samples(2)
+
+    batch = next(dataset.iter_batches(4, seed=1))
+    assert batch.obs.shape == (4, 4, 4, 3) and batch.actions.shape == (4, 7)
@@ -0,0 +1,38 @@
+from pystk_gym.common.graphics import GraphicConfig, GraphicQuality
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.tools.determinism import compare, record, run_mode
+
+
+def make_golden(group: int = 1):
+    return record(
+        GraphicConfig(100, 100, GraphicQuality.LD),
+        RaceConfig(track="lighthouse", num_karts=3, num_karts_controlled=2),
+        num_steps=40,
+        seed=7,
+        group=group,
+        max_step_cnt=200,
+    )
+
+
+def test_fresh_runs_are_identical():
+    golden = make_golden()
+    assert len(golden["steps"]) == 41
+    assert compare(golden["steps"], run_mode(golden, "single")) is None
+
+
+def test_frame_skip_matches_repeated_actions():
+    golden = make_golden(group=3)
+    assert compare(golden["steps"], run_mode(golden, "frame_skip")) is None
+
+
+def test_pooled_matches_single():
+    golden = make_golden()
+    assert compare(golden["steps"], run_mode(golden, "pooled")) is None
+
+
+def test_compare_reports_first_divergence():
+    steps = [{"obs": "a", "reward": "b", "info": "c"}] * 3
+    changed = steps[:2] + [{"obs": "a", "reward": "x", "info": "c"}]
+    assert compare(steps, steps) is None
+    assert compare(steps, changed) == (2, ["reward"])
+    assert compare(steps, steps[:2]) == (2, ["length"])
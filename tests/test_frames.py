@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from pystk_gym.common.frames import FrameStore
+
+
+def make_frames(num_frames):
+    rng = np.random.default_rng(0)
+    frames = np.zeros((num_frames, 24, 32, 3), dtype=np.uint8)
+    for t in range(num_frames):
+        frames[t, :, : t % 32] = 200
+        frames[t, rng.integers(24)] = rng.integers(256)
+    return frames
+
+
+@pytest.mark.parametrize("keyframe_interval", [1, 4])
+def test_frames_round_trip(keyframe_interval):
+    frames = make_frames(50)
+    store = FrameStore(1 << 20, keyframe_interval=keyframe_interval)
+    ids = np.array([store.add(frame, episode_start=t % 20 == 0) for t, frame in enumerate(frames)])
+    np.testing.assert_array_equal(store.get(ids), frames)
+
+    stacks = ids[np.arange(3, 50)[:, None] - np.arange(4)]
+    np.testing.assert_array_equal(store.get(stacks), frames[stacks])
+    assert store.compression_ratio > 1
+
+
+def test_full_store_drops_the_oldest_frames():
+    frames = make_frames(200)
+    store = FrameStore(4096, keyframe_interval=4)
+    ids = np.array([store.add(frame) for frame in frames])
+    assert 0 < store.first_id < 200
+    alive = store.contains(ids)
+    # the dropped frames are the oldest ones, and the last ones are all there
+    assert not alive[: store.first_id].any() and alive[-10:].all()
+    np.testing.assert_array_equal(store.get(ids[alive]), frames[alive])
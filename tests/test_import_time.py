@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+# cumulative import time of `pystk_gym` in microseconds, as reported by `python -X importtime`
+IMPORT_TIME_BUDGET_US = 1_000_000
+HEAVY_MODULES = ["pygame", "PyQt5", "matplotlib"]
+
+
+def _import_times(module: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_headless_import_skips_viewer():
+    times = _import_times("pystk_gym")
+    imported = [name for name in times if name.split(".")[0] in HEAVY_MODULES]
+    assert not imported, f"headless import pulled in {imported}"
+    assert "pystk_gym.common.viewer" not in times
+
+
+def test_import_time_budget():
+    times = _import_times("pystk_gym")
+    assert times["pystk_gym"] <= IMPORT_TIME_BUDGET_US, (
+        f"`import pystk_gym` took {times['pystk_gym']}us, "
+        f"budget is {IMPORT_TIME_BUDGET_US}us"
+    )
@@ -0,0 +1,29 @@
+from pystk_gym.common.graphics import GraphicConfig, GraphicQuality
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.common.reward import get_reward_fn
+from pystk_gym.envs.race_env import RaceEnv
+from pystk_gym.tools.memory import run_memory_benchmark
+
+
+def test_memory_benchmark_report():
+    def make_env():
+        return RaceEnv(
+            GraphicConfig(100, 100, GraphicQuality.LD),
+            RaceConfig.default_config(),
+            get_reward_fn(),
+            max_step_cnt=50,
+        )
+
+    report = run_memory_benchmark(
+        make_env,
+        steps=400,
+        episode_steps=50,
+        env_cycles=2,
+        sample_every=50,
+        warmup_steps=100,
+        threshold_kib=float("inf"),
+    )
+    assert report.steps == 400
+    assert report.resets >= 6
+    assert len(report.samples) == 8
+    assert report.passed
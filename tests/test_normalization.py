@@ -0,0 +1,52 @@
+import numpy as np
+
+from pystk_gym.common.normalization import Normalizer, RunningMeanStd
+
+
+def test_running_mean_std_merge_matches_numpy():
+    rng = np.random.default_rng(0)
+    data = rng.normal(3.0, 2.0, size=(1000, 4))
+    left, right = RunningMeanStd((4,)), RunningMeanStd((4,))
+    for batch in np.array_split(data[:300], 7):
+        left.update(batch)
+    right.update(data[300:])
+    left.merge(right)
+    assert left.count == 1000
+    np.testing.assert_allclose(left.mean, data.mean(axis=0))
+    np.testing.assert_allclose(left.var, data.var(axis=0))
+
+
+def test_sync_counts_every_sample_once():
+    rng = np.random.default_rng(1)
+    workers = [Normalizer(num_features=2) for _ in range(3)]
+    shared = Normalizer(num_features=2)
+    seen = []
+    for _ in range(4):
+        for normalizer in workers:
+            features = rng.normal(size=(10, 3))
+            normalizer.update_features(features)
+            seen.append(features[:, :2])
+        for normalizer in workers:
+            shared.merge(normalizer.sync(None))
+        for normalizer in workers:
+            normalizer.sync(shared)
+            # every worker continues from the statistics of all samples, its own included
+            assert normalizer.features.count == shared.features.count
+    seen = np.concatenate(seen)
+    assert shared.features.count == len(seen)
+    np.testing.assert_allclose(shared.features.mean, seen.mean(axis=0))
+    np.testing.assert_allclose(shared.features.var, seen.var(axis=0))
+
+
+def test_frozen_normalizer_round_trip(tmp_path):
+    normalizer = Normalizer(num_features=2, clip=None)
+    normalizer.update_features([[1.0, 10.0, 1.0], [3.0, 30.0, 1.0]])
+    normalizer.update_returns([1.0, -1.0])
+    normalizer.save(str(tmp_path / "stats.npz"))
+
+    loaded = Normalizer.load(str(tmp_path / "stats.npz"), frozen=True)
+    loaded.update_features([[100.0, 100.0, 1.0]])
+    assert loaded.frozen and loaded.clip is None and loaded.features.count == 2
+    normalized = loaded.normalize_features([[2.0, 20.0, 1.0]])
+    np.testing.assert_allclose(normalized, [[0.0, 0.0, 1.0]], atol=1e-6)
+    np.testing.assert_allclose(loaded.scale_rewards([2.0]), [2.0], rtol=1e-6)
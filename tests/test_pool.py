@@ -0,0 +1,270 @@
+import time
+
+import numpy as np
+import pytest
+
+from pystk_gym.common.graphics import GraphicConfig, GraphicQuality
+from pystk_gym.common.normalization import Normalizer
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.common.recorder import read_records
+from pystk_gym.common.reward import get_reward_fn
+from pystk_gym.vector.async_pool import AsyncPool
+from pystk_gym.vector.pool import SupervisedPool
+from pystk_gym.vector.rollout import RolloutConfig
+from pystk_gym.vector.scheduler import TrackScheduler
+from pystk_gym.vector.template import template_context
+from pystk_gym.vector.worker import (
+    EPISODE_RESET,
+    FINAL_OBSERVATION,
+    ROLLOUT_SEGMENT,
+    WORKER_FAILURE,
+    EnvSpec,
+)
+
+
+def make_spec() -> EnvSpec:
+    return EnvSpec(
+        GraphicConfig(100, 100, GraphicQuality.LD),
+        RaceConfig(track="lighthouse", num_karts=3, num_karts_controlled=2),
+        get_reward_fn(),
+        {"max_step_cnt": 50},
+    )
+
+
+def test_supervised_pool_respawns_crashed_worker():
+    pool = SupervisedPool(make_spec(), num_workers=2, start_timeout=120)
+    try:
+        obs, ready = pool.reset()
+        assert obs.shape == (2, 2, 100, 100, 3)
+        assert ready.all()
+
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        pool.step(actions)
+        pool.workers[0].process.kill()
+        pool.workers[0].process.join()
+        _, rewards, _, truncated, infos = pool.step(actions)
+        assert truncated[0].all() and not truncated[1].any()
+        assert infos[0][WORKER_FAILURE] == "crash"
+        assert rewards.shape == (2, 2)
+
+        _, ready = pool.reset()
+        assert ready.all()
+        counters = pool.collect_telemetry().snapshot()["counters"]
+        assert {"name": "worker_crashes", "track": "", "value": 1.0} in counters
+    finally:
+        pool.close()
+
+
+def test_pool_gives_up_on_workers_that_never_start():
+    spec = make_spec()
+    # RaceEnv doesn't take the argument, building the env fails on every start
+    spec.env_kwargs["not_an_argument"] = True
+    pool = SupervisedPool(spec, num_workers=2, max_respawns=2, respawn_backoff=0.01)
+    try:
+        with pytest.raises(RuntimeError):
+            pool.reset()
+        assert all(handle.state == "failed" for handle in pool.workers)
+        counters = pool.collect_telemetry().snapshot()["counters"]
+        assert {"name": "worker_slots_failed", "track": "", "value": 2.0} in counters
+    finally:
+        pool.close()
+
+
+def test_async_pool_returns_ready_envs():
+    pool = AsyncPool(make_spec(), num_workers=3, batch_size=2)
+    try:
+        pool.async_reset()
+        seen = set()
+        for _ in range(20):
+            obs, rewards, terminated, truncated, infos, env_ids = pool.recv()
+            assert obs.shape == (2, 2, 100, 100, 3)
+            assert rewards.shape == terminated.shape == truncated.shape == (2, 2)
+            assert len(infos) == 2 and len(set(env_ids.tolist())) == 2
+            seen.update(env_ids.tolist())
+            pool.send(np.zeros((2, 2, 7), dtype=np.int64), env_ids)
+        assert seen == {0, 1, 2}
+    finally:
+        pool.close()
+
+
+def test_pool_keeps_workers_on_their_track():
+    spec = make_spec()
+    spec.race_config.track = None
+    scheduler = TrackScheduler(2, ["lighthouse", "hacienda"], episodes_per_track=3, seed=0)
+    pool = SupervisedPool(spec, num_workers=2, scheduler=scheduler)
+    try:
+        pool.reset()
+        assert sorted(scheduler.assignments()) == ["hacienda", "lighthouse"]
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        for _ in range(300):
+            pool.step(actions)
+        assert scheduler.episodes.sum() > 2
+        assert scheduler.reloads < scheduler.episodes.sum()
+    finally:
+        pool.close()
+
+
+def test_pool_from_template_process():
+    pool = SupervisedPool(make_spec(), num_workers=2, context=template_context(["lighthouse"]))
+    try:
+        obs, ready = pool.reset()
+        assert ready.all() and obs.shape == (2, 2, 100, 100, 3)
+        _, rewards, *_ = pool.step(np.zeros((2, 2, 7), dtype=np.int64))
+        assert rewards.shape == (2, 2)
+    finally:
+        pool.close()
+
+
+def test_pool_collects_rollout_segments():
+    pool = SupervisedPool(make_spec(), num_workers=2, rollout=RolloutConfig(16))
+    try:
+        pool.reset()
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        values = np.zeros((2, 2), dtype=np.float32)
+        segments = []
+        for _ in range(17):
+            *_, infos = pool.step(actions, values)
+            segments += [info[ROLLOUT_SEGMENT] for info in infos if ROLLOUT_SEGMENT in info]
+        assert len(segments) == 2
+        for segment in segments:
+            assert segment.advantages.shape == (16, 2)
+            np.testing.assert_allclose(segment.returns, segment.advantages)
+    finally:
+        pool.close()
+
+
+def test_truncated_rollouts_need_the_values_of_the_final_observation():
+    spec = make_spec()
+    spec.env_kwargs["max_step_cnt"] = 3
+    pool = SupervisedPool(spec, num_workers=2, rollout=RolloutConfig(8))
+    try:
+        pool.reset()
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        values = np.zeros((2, 2), dtype=np.float32)
+        for _ in range(3):
+            *_, truncated, infos = pool.step(actions, values)
+        # the step limit truncated every episode, the slots hold the reset observations
+        assert truncated.all()
+        for info in infos:
+            assert info[FINAL_OBSERVATION].shape == (2, 100, 100, 3)
+        with pytest.raises(AssertionError):
+            pool.step(actions, values)
+        segments = []
+        for _ in range(6):
+            *_, infos = pool.step(actions, values, final_values=np.ones((2, 2), np.float32))
+            segments += [info[ROLLOUT_SEGMENT] for info in infos if ROLLOUT_SEGMENT in info]
+        # reward + gamma * 1 on the truncated steps
+        assert len(segments) == 2
+        for segment in segments:
+            np.testing.assert_allclose(
+                segment.advantages[2], segment.rewards[2] + RolloutConfig(8).gamma
+            )
+    finally:
+        pool.close()
+
+
+def test_async_pool_hands_out_workers_started_during_a_query():
+    pool = AsyncPool(make_spec(), num_workers=2, batch_size=2, start_timeout=120)
+    try:
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        pool.async_reset()
+        *_, env_ids = pool.recv()
+        pool.workers[0].process.kill()
+        pool.workers[0].process.join()
+        pool.send(actions, env_ids)
+        *_, infos, env_ids = pool.recv()
+        assert infos[env_ids.tolist().index(0)][WORKER_FAILURE] == "crash"
+        pool.send(actions, env_ids)
+
+        # the replacement becomes ready while the telemetry is collected
+        deadline = time.monotonic() + 120
+        while pool.workers[0].state != "idle":
+            assert time.monotonic() < deadline
+            pool.collect_telemetry()
+            time.sleep(0.05)
+        *_, infos, env_ids = pool.recv()
+        assert sorted(env_ids.tolist()) == [0, 1]
+        assert EPISODE_RESET in infos[env_ids.tolist().index(0)]
+    finally:
+        pool.close()
+
+
+def test_async_pool_batches_hold_every_env_once():
+    pool = AsyncPool(make_spec(), num_workers=3, batch_size=2, start_timeout=120)
+    try:
+        pool.async_reset()
+        failed = set()
+        restarted = 0
+        deadline = time.monotonic() + 120
+        for step in range(200):
+            *_, infos, env_ids = pool.recv()
+            assert len(set(env_ids.tolist())) == len(env_ids)
+            for env_id, info in zip(env_ids.tolist(), infos):
+                if env_id in failed:
+                    # the first answer after a failure is the restart
+                    assert WORKER_FAILURE not in info and EPISODE_RESET in info
+                    failed.discard(env_id)
+                    restarted += 1
+                elif WORKER_FAILURE in info:
+                    failed.add(env_id)
+            if step > 10 and restarted == 2:
+                break
+            # restarts are also picked up by the queries
+            pool.collect_telemetry()
+            if step in (5, 10):
+                # fails on the next send, the restart may come while the failure is queued
+                env_id = next(
+                    env_id
+                    for env_id, info in zip(env_ids.tolist(), infos)
+                    if WORKER_FAILURE not in info
+                )
+                pool.workers[env_id].process.kill()
+                pool.workers[env_id].process.join()
+            assert time.monotonic() < deadline
+            pool.send(np.zeros((len(env_ids), 2, 7), dtype=np.int64), env_ids)
+        assert restarted == 2
+    finally:
+        pool.close()
+
+
+def test_respawn_keeps_the_flight_recorder_of_the_crashed_worker(tmp_path):
+    spec = make_spec()
+    spec.env_kwargs["flight_recorder"] = str(tmp_path / "flight_{index}.bin")
+    pool = SupervisedPool(spec, num_workers=2, start_timeout=120)
+    try:
+        pool.reset()
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        for _ in range(3):
+            pool.step(actions)
+        pool.workers[0].process.kill()
+        pool.workers[0].process.join()
+        pool.step(actions)
+        _, ready = pool.reset()
+        assert ready.all()
+    finally:
+        pool.close()
+    # the replacement records to a new file, the crashed worker's steps are kept
+    assert read_records(str(tmp_path / "flight_0.bin.0"))["step"].tolist() == [1, 2, 3]
+    assert len(read_records(str(tmp_path / "flight_0.bin"))) == 0
+
+
+def test_sync_normalizers_hands_every_worker_the_pool_statistics():
+    spec = make_spec()
+    spec.env_kwargs["normalizer"] = Normalizer()
+    pool = SupervisedPool(spec, num_workers=2)
+    try:
+        pool.reset()
+        actions = np.zeros((2, 2, 7), dtype=np.int64)
+        for _ in range(2):
+            for _ in range(5):
+                pool.step(actions)
+                pool.call("relative_features")
+            shared = pool.sync_normalizers()
+            # the statistics every worker continues from
+            for normalizer in pool.call("get_normalizer"):
+                assert normalizer.features.count == shared.features.count > 0
+                assert normalizer.returns.count == shared.returns.count
+        # 2 rounds of 5 steps of 2 agents on 2 workers, every sample counted once
+        assert shared.returns.count == 2 * 5 * 2 * 2
+    finally:
+        pool.close()
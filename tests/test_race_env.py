@@ -1,14 +1,49 @@
+import os
+
+import numpy as np
 import pytest
 from pettingzoo.test import parallel_api_test
 
+from pystk_gym.common.actions import ContinuousAction, HybridAction
 from pystk_gym.common.graphics import GraphicConfig
+from pystk_gym.common.info import Info
+from pystk_gym.common.normalization import Normalizer
 from pystk_gym.common.race import RaceConfig
+from pystk_gym.common.reward import get_reward_fn
+from pystk_gym.common.stall import StallConfig
+from pystk_gym.envs.race_env import RaceEnv
+from pystk_gym.tools.matrix import make_cells, run_matrix
+
+
+def test_track_kart_compatiblity():
+    # no cache, every race is built on every run
+    results = run_matrix(make_cells(), cache_path=None)
+    failed = [f"{result.cell.key}: {result.error}" for result in results if not result.ok]
+    assert not failed, failed
+
 
+def test_matrix_does_not_cache_failures(tmp_path):
+    cells = make_cells(RaceConfig.TRACKS[:1], RaceConfig.KARTS[:1])
+    cache_path = str(tmp_path / "matrix.json")
+    # more controlled karts than karts, the cell fails
+    race_kwargs = {"num_karts": 1, "num_karts_controlled": 2}
+    for _ in range(2):
+        (result,) = run_matrix(cells, race_kwargs=race_kwargs, cache_path=cache_path)
+        assert not result.ok and not result.cached
+    (result,) = run_matrix(cells, cache_path=cache_path)
+    assert result.ok and not result.cached
+    (result,) = run_matrix(cells, cache_path=cache_path)
+    assert result.cached
+    # other settings don't share the cached result
+    (result,) = run_matrix(cells, race_kwargs={"num_karts": 2}, cache_path=cache_path)
+    assert result.ok and not result.cached
 
-@pytest.mark.parametrize("track", RaceConfig.TRACKS)
-@pytest.mark.parametrize("kart", RaceConfig.KARTS)
-def test_track_kart_compatiblity(track_kart_env):
-    assert True
+
+def test_matrix_survives_crashing_workers():
+    cells = make_cells(RaceConfig.TRACKS[:3], RaceConfig.KARTS[:1])
+    results = run_matrix(cells, policy=lambda obs: os._exit(1), num_workers=2)
+    assert [result.cell for result in results] == cells
+    assert all(not result.ok and "crashed" in result.error for result in results)
 
 
 @pytest.mark.parametrize(
@@ -17,3 +52,250 @@ def test_track_kart_compatiblity(track_kart_env):
 )
 def test_api(race_env):
     parallel_api_test(race_env, 1000)
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=5, num_karts_controlled=3))],
+)
+def test_step_batch(race_env):
+    num_agents = len(race_env.possible_agents)
+    obs, _ = race_env.reset_batch()
+    assert obs.shape == (num_agents, *race_env.observation_shape)
+
+    actions = np.stack(
+        [race_env.action_space(agent).sample() for agent in race_env.possible_agents]
+    )
+    obs, rewards, terminated, truncated, infos = race_env.step_batch(
+        actions, columnar_infos=True
+    )
+    assert obs.shape == (num_agents, *race_env.observation_shape)
+    assert rewards.shape == (num_agents,) and rewards.dtype == np.float32
+    assert terminated.shape == truncated.shape == (num_agents,)
+    assert terminated.dtype == truncated.dtype == np.bool_
+    assert infos[Info.RANK].shape == (num_agents,)
+
+
+@pytest.mark.parametrize("info_keys", [None, [Info.VELOCITY]])
+def test_lazy_info(info_keys):
+    env = RaceEnv(
+        GraphicConfig.default_config(),
+        RaceConfig.default_config(),
+        get_reward_fn(),
+        return_info=info_keys is not None,
+        info_keys=info_keys,
+    )
+    env.reset()
+    for _ in range(5):
+        actions = {agent: env.action_space(agent).sample() for agent in env.agents}
+        *_, infos = env.step(actions)
+    if info_keys is None:
+        assert all(info == {} for info in infos.values())
+    else:
+        for info in infos.values():
+            assert Info.VELOCITY in info and Info.OUT_OF_TRACK_COUNT in info
+            assert Info.JUMP_COUNT not in info
+    env.close()
+
+
+def test_info_outlives_the_step():
+    info_keys = [Info.LOCATION, Info.VELOCITY, Info.IS_INSIDE_TRACK, Info.DELTA_DIST, Info.RANK]
+    env = RaceEnv(
+        GraphicConfig.default_config(),
+        RaceConfig.default_config(),
+        get_reward_fn(),
+        info_keys=info_keys,
+    )
+    env.reset_batch()
+    actions = np.ones((len(env.possible_agents), 7), dtype=np.int64)
+    *_, infos = env.step_batch(actions)
+    locations = [np.array(kart.kart.location) for kart in env.get_controlled_karts()]
+    for _ in range(5):
+        env.step_batch(actions)
+    for info, location in zip(infos, locations):
+        assert set(info) == set(info_keys) and len(dict(info)) == len(info_keys)
+        # computed from the state of the step the info belongs to
+        np.testing.assert_allclose(info[Info.LOCATION], location)
+    env.close()
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=5, num_karts_controlled=3))],
+)
+def test_relative_features(race_env):
+    race_env.reset_batch()
+    actions = np.zeros((len(race_env.possible_agents), 7), dtype=np.int64)
+    race_env.step_batch(actions)
+
+    features = race_env.relative_features()
+    assert features.shape == (3, 5, len(race_env.race.RELATIVE_FEATURES))
+    assert features.dtype == np.float32
+    # a kart sees itself as an all zero row and every other kart as a valid one
+    assert features[..., -1].sum() == 3 * 4
+
+    nearest = race_env.nearest_relative_features(6)
+    assert nearest.shape == (3, 6, features.shape[-1])
+    assert (nearest[:, :4, -1] == 1).all() and (nearest[:, 4:] == 0).all()
+    assert (np.diff(nearest[:, :4, 6], axis=1) >= 0).all()
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=5, num_karts_controlled=3))],
+)
+def test_normalized_features_and_rewards(graphic_conf, race_conf):
+    normalizer = Normalizer()
+    env = RaceEnv(graphic_conf, race_conf, get_reward_fn(), normalizer=normalizer)
+    env.reset_batch()
+    actions = np.zeros((3, 7), dtype=np.int64)
+    for _ in range(10):
+        env.step_batch(actions)
+        env.relative_features()
+        nearest = env.nearest_relative_features(6)
+    # 4 opponents seen by 3 karts on every step, counted once per step
+    assert normalizer.features.count == 10 * 3 * 4
+    assert normalizer.returns.count == 10 * 3
+    assert (nearest[:, 4:] == 0).all() and (nearest[:, :4, -1] == 1).all()
+    env.close()
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=5, num_karts_controlled=3))],
+)
+def test_observe_only_active_karts(race_env):
+    race_env.reset_batch()
+    race_env.step_batch(np.zeros((3, 7), dtype=np.int64))
+    full = race_env.race.observe()
+    partial = race_env.race.observe(np.array([True, False, True]))
+    assert partial.shape == full.shape
+    assert (partial[1] == 0).all()
+    np.testing.assert_array_equal(partial[[0, 2]], full[[0, 2]])
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=3, num_karts_controlled=2))],
+)
+def test_finished_agents_are_skipped(race_env, monkeypatch):
+    race_env.reset_batch()
+    # the first agent finishes on the first step, the second one races on
+    racing_counts = []
+
+    def terminal(infos):
+        racing_counts.append(len(infos))
+        done = np.zeros(len(infos), dtype=bool)
+        done[0] = len(racing_counts) == 1
+        return done
+
+    monkeypatch.setattr(race_env, "_terminal", terminal)
+    kart_steps = [0, 0]
+    for i, kart in enumerate(race_env.get_controlled_karts()):
+
+        def counted_step(step=kart.step, i=i):
+            kart_steps[i] += 1
+            return step()
+
+        monkeypatch.setattr(kart, "step", counted_step)
+    sent_actions = []
+    race_step = race_env.race.step
+
+    def recorded_step(actions, *args, **kwargs):
+        sent_actions.append(list(actions))
+        return race_step(actions, *args, **kwargs)
+
+    monkeypatch.setattr(race_env.race, "step", recorded_step)
+
+    actions = np.ones((2, 7), dtype=np.int64)
+    _, _, terminated, _, infos = race_env.step_batch(actions)
+    assert terminated.tolist() == [True, False]
+    final_infos = dict(infos[0])
+    for _ in range(3):
+        _, rewards, terminated, _, infos = race_env.step_batch(actions)
+        assert terminated[0] and rewards[0] == 0
+        assert infos[0].keys() == final_infos.keys()
+        for key, value in final_infos.items():
+            np.testing.assert_equal(infos[0][key], value)
+    assert kart_steps == [1, 4]
+    assert racing_counts == [2, 1, 1, 1]
+    assert sent_actions[0][0] is not RaceEnv.IDLE_ACTION
+    assert all(actions[0] is RaceEnv.IDLE_ACTION for actions in sent_actions[1:])
+    assert all(actions[1] is not RaceEnv.IDLE_ACTION for actions in sent_actions)
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=3, num_karts_controlled=2))],
+)
+def test_stalled_agents_are_truncated(graphic_conf, race_conf):
+    env = RaceEnv(
+        graphic_conf,
+        race_conf,
+        get_reward_fn(),
+        stall_detection=StallConfig(window=20, min_progress=1.0, min_speed=None),
+    )
+    env.reset_batch()
+    # no acceleration, the karts never leave the start line
+    actions = np.zeros((2, 7), dtype=np.int64)
+    for step in range(40):
+        _, _, terminated, truncated, _ = env.step_batch(actions)
+        if not env.agents:
+            break
+    assert truncated.all() and not terminated.any()
+    assert 20 <= step < 40
+    snapshot = env.telemetry.snapshot()
+    counters = {counter["name"]: counter["value"] for counter in snapshot["counters"]}
+    assert counters["stall_truncations"] == 2
+    assert counters["stall_steps_saved"] == env.max_step_cnt - env.steps
+    env.close()
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=3, num_karts_controlled=2))],
+)
+def test_finished_agents_keep_their_flags(graphic_conf, race_conf, monkeypatch):
+    env = RaceEnv(
+        graphic_conf,
+        race_conf,
+        get_reward_fn(),
+        stall_detection=StallConfig(window=1000, min_progress=1.0, min_speed=None),
+    )
+    env.reset_batch()
+    # the first agent stalls on the first step, the second one finishes on the fourth
+    stalls, finishes = [True, False], [False]
+
+    def detect_stalls(racing):
+        return np.array(stalls) & racing
+
+    monkeypatch.setattr(env, "_detect_stalls", detect_stalls)
+    monkeypatch.setattr(env, "_terminal", lambda infos: np.full(len(infos), finishes[0]))
+    actions = np.ones((2, 7), dtype=np.int64)
+    for step in range(6):
+        finishes[0] = step >= 3
+        _, _, terminated, truncated, _ = env.step_batch(actions)
+        stalls[0] = False
+        assert truncated.tolist() == [True, False]
+        assert terminated.tolist() == [False, step >= 3]
+    env.reset_batch()
+    finishes[0] = False
+    _, _, terminated, truncated, _ = env.step_batch(actions)
+    assert not terminated.any() and not truncated.any()
+    env.close()
+
+
+@pytest.mark.parametrize(
+    "graphic_conf, race_conf",
+    [(GraphicConfig.default_config(), RaceConfig(num_karts=2, num_karts_controlled=2))],
+)
+@pytest.mark.parametrize("action_class", [ContinuousAction, HybridAction])
+def test_continuous_action_classes(graphic_conf, race_conf, action_class):
+    env = RaceEnv(graphic_conf, race_conf, get_reward_fn(), action_class=action_class)
+    env.reset_batch()
+    actions = {agent: env.action_space(agent).sample() for agent in env.agents}
+    env.step(actions)
+    # batches are rows of ACTIONS for every action class
+    obs, *_ = env.step_batch(np.full((2, 7), 0.5, dtype=np.float32))
+    assert obs.shape == (2, *env.observation_shape)
+    env.close()
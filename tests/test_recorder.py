@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pystk
+
+from pystk_gym.common.graphics import GraphicConfig, GraphicQuality
+from pystk_gym.common.race import RaceConfig
+from pystk_gym.common.recorder import PHASES, FlightRecorder, read_records
+from pystk_gym.common.reward import get_reward_fn
+from pystk_gym.envs.race_env import RaceEnv
+
+
+def test_recorder_keeps_the_last_steps(tmp_path):
+    path = str(tmp_path / "flight.bin")
+    recorder = FlightRecorder(path, num_agents=2, capacity=8)
+    karts = [
+        SimpleNamespace(location=[i, 0, 0], velocity=[0, 0, 1], overall_distance=float(i))
+        for i in range(2)
+    ]
+    for step in range(20):
+        recorder.record(
+            step,
+            0.0,
+            [pystk.Action(), pystk.Action()],
+            karts,
+            np.zeros((2, 4), dtype=np.int32),
+            np.full(2, step, dtype=np.float32),
+            np.zeros(2, dtype=bool),
+            [0.0] * len(PHASES),
+        )
+
+    # readable without the writer, like after a crash
+    records = read_records(path)
+    assert records["step"].tolist() == list(range(12, 20))
+    assert (records["reward"][:, 1] == records["step"]).all()
+    assert read_records(path, last=3)["step"].tolist() == [17, 18, 19]
+
+    dump = np.load(recorder.dump(last=4))
+    assert dump["step"].tolist() == [16, 17, 18, 19]
+    recorder.close()
+
+
+def test_env_flight_recorder(tmp_path):
+    path = str(tmp_path / "flight.bin")
+    env = RaceEnv(
+        GraphicConfig(100, 100, GraphicQuality.LD),
+        RaceConfig(track="lighthouse", num_karts=3, num_karts_controlled=2),
+        get_reward_fn(),
+        flight_recorder=path,
+    )
+    env.reset_batch()
+    for _ in range(5):
+        env.step_batch(np.ones((2, 7), dtype=np.int64))
+    env.close()
+
+    records = read_records(path)
+    assert records["step"].tolist() == [1, 2, 3, 4, 5]
+    assert (records["episode"] == 1).all()
+    assert (records["actions"][..., 2] == 0).all()  # steer 1 is straight ahead
+    assert (records["timings"][:, -1] > 0).all()
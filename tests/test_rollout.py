@@ -0,0 +1,81 @@
+import numpy as np
+
+from pystk_gym.vector.rollout import RolloutBuffer, RolloutConfig, compute_gae
+
+
+def reference_gae(
+    rewards, values, terminated, truncated, last_values, gamma, lam, final_values=None
+):
+    final_values = values if final_values is None else final_values
+    advantages = np.zeros_like(rewards)
+    for agent in range(rewards.shape[1]):
+        advantage, next_value = 0.0, last_values[agent]
+        for t in reversed(range(len(rewards))):
+            if terminated[t, agent]:
+                advantage = rewards[t, agent] - values[t, agent]
+            elif truncated[t, agent]:
+                advantage = rewards[t, agent] + gamma * final_values[t, agent] - values[t, agent]
+            else:
+                delta = rewards[t, agent] + gamma * next_value - values[t, agent]
+                advantage = delta + gamma * lam * advantage
+            advantages[t, agent] = advantage
+            next_value = values[t, agent]
+    return advantages
+
+
+def test_compute_gae_matches_reference():
+    rng = np.random.default_rng(0)
+    rewards = rng.normal(size=(64, 3)).astype(np.float32)
+    values = rng.normal(size=(64, 3)).astype(np.float32)
+    terminated = rng.random((64, 3)) < 0.1
+    truncated = (rng.random((64, 1)) < 0.05) & ~terminated
+    last_values = rng.normal(size=3).astype(np.float32)
+
+    advantages = compute_gae(rewards, values, terminated, truncated, last_values, 0.9, 0.8)
+    expected = reference_gae(rewards, values, terminated, truncated, last_values, 0.9, 0.8)
+    np.testing.assert_allclose(advantages, expected, atol=1e-5)
+
+    final_values = rng.normal(size=(64, 3)).astype(np.float32)
+    advantages = compute_gae(
+        rewards, values, terminated, truncated, last_values, 0.9, 0.8, final_values=final_values
+    )
+    expected = reference_gae(
+        rewards, values, terminated, truncated, last_values, 0.9, 0.8, final_values
+    )
+    np.testing.assert_allclose(advantages, expected, atol=1e-5)
+
+
+def test_rollout_buffer_masks_finished_agents():
+    buffer = RolloutBuffer(RolloutConfig(4, gamma=0.5, lam=1.0), num_agents=2)
+    ones = np.ones(2, dtype=np.float32)
+    buffer.add(ones, np.array([True, True]), ones, np.array([False, True]), np.zeros(2, bool))
+    for _ in range(3):
+        # the second agent finished, its rows are padding until the env resets
+        buffer.add(ones, np.array([True, False]), ones, np.zeros(2, bool), np.zeros(2, bool))
+    assert buffer.full
+    segment = buffer.finish(ones)
+    assert not buffer.full
+    assert segment.advantages[1:, 1].tolist() == [0.0, 0.0, 0.0]
+    assert segment.advantages[0, 1] == 0.0  # reward 1 on a terminal step valued 1
+    np.testing.assert_allclose(segment.returns[:, 0], [1.9375, 1.875, 1.75, 1.5])
+
+
+def test_truncated_steps_bootstrap_from_the_final_observation():
+    buffer = RolloutBuffer(RolloutConfig(2, gamma=0.5, lam=1.0), num_agents=1)
+    ones = np.ones(1, dtype=np.float32)
+    buffer.add(ones, np.array([True]), ones, np.array([False]), np.array([True]))
+    # the value of the observation the episode was cut at, the env was reset after it
+    buffer.bootstrap(np.array([4.0], dtype=np.float32))
+    buffer.add(ones, np.array([True]), ones, np.array([False]), np.array([False]))
+    buffer.bootstrap(np.array([2.0], dtype=np.float32))
+    segment = buffer.finish(np.array([2.0], dtype=np.float32))
+    np.testing.assert_allclose(segment.advantages[:, 0], [2.0, 1.0])
+
+    # a reset from outside cuts the episode without any value of the observation it was cut at
+    buffer.add(ones, np.array([True]), ones, np.array([False]), np.array([False]))
+    buffer.cut()
+    buffer.bootstrap(np.array([4.0], dtype=np.float32))
+    buffer.add(ones, np.array([True]), ones, np.array([False]), np.array([False]))
+    segment = buffer.finish(np.array([2.0], dtype=np.float32))
+    assert segment.truncated[0, 0]
+    np.testing.assert_allclose(segment.advantages[:, 0], [0.5, 1.0])
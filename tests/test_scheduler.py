@@ -0,0 +1,27 @@
+import numpy as np
+
+from pystk_gym.vector.scheduler import TrackScheduler
+
+
+def test_scheduler_follows_the_requested_mix():
+    scheduler = TrackScheduler(
+        8,
+        ["abyss", "hacienda", "lighthouse", "zengarden"],
+        weights={"abyss": 4, "hacienda": 2, "lighthouse": 1, "zengarden": 1},
+        episodes_per_track=5,
+        seed=0,
+    )
+    rng = np.random.default_rng(0)
+    switches = [scheduler.episode_started(int(worker)) for worker in rng.integers(0, 8, 4000)]
+    assert np.allclose(scheduler.distribution(), [0.5, 0.25, 0.125, 0.125], atol=0.01)
+    # a worker stays on its track for several episodes
+    assert sum(track is not None for track in switches) == scheduler.reloads < 4000 / 5
+
+
+def test_scheduler_staggers_reloads():
+    scheduler = TrackScheduler(4, ["abyss", "hacienda"], episodes_per_track=4, seed=0)
+    # every worker starts its episodes in lockstep, the first reloads still happen one by one
+    reloads = []
+    for _ in range(4):
+        reloads.append(sum(scheduler.episode_started(worker) is not None for worker in range(4)))
+    assert max(reloads) <= scheduler.max_concurrent_reloads == 1
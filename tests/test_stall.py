@@ -0,0 +1,34 @@
+import numpy as np
+
+from pystk_gym.common.stall import StallConfig, StallDetector
+
+
+def test_stalled_agents_are_flagged_after_a_full_window():
+    detector = StallDetector(StallConfig(window=5, min_progress=2.0, min_speed=None), 2)
+    detector.reset(slice(None), [0.0, 0.0], [0, 0])
+    racing = np.ones(2, dtype=bool)
+    distances = np.zeros(2)
+    flags = []
+    for _ in range(8):
+        # the first agent drives 1m per step, the second one is wedged
+        distances = distances + [1.0, 0.01]
+        flags.append(detector.update(racing, distances, np.ones(2), np.zeros(2, dtype=np.int64)))
+    flags = np.array(flags)
+    assert not flags[:, 0].any()
+    assert not flags[:4, 1].any() and flags[4:, 1].all()
+
+    # a reset agent gets a new window
+    detector.reset(np.array([1]), distances[1:], [0])
+    assert not detector.update(racing, distances, np.ones(2), np.zeros(2, dtype=np.int64))[1]
+
+
+def test_node_advance_wraps_around_the_lap():
+    config = StallConfig(window=3, min_progress=None, min_speed=None, min_node_advance=2)
+    detector = StallDetector(config, 1, num_nodes=10)
+    detector.reset(slice(None), [0.0], [8])
+    racing = np.ones(1, dtype=bool)
+    for node in (9, 0, 1, 2):
+        assert not detector.update(racing, np.zeros(1), np.zeros(1), np.array([node])).any()
+    for node in (1, 0, 9):
+        stalled = detector.update(racing, np.zeros(1), np.zeros(1), np.array([node]))
+    assert stalled.all()
@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+
+from pystk_gym.common.telemetry import RingBuffer, Telemetry
+
+
+def test_ring_buffer_keeps_latest_rows():
+    buffer = RingBuffer(3)
+    for i in range(5):
+        buffer.append(i)
+    assert len(buffer) == 3
+    np.testing.assert_array_equal(buffer.values()[:, 0], [2, 3, 4])
+
+
+def test_telemetry_export(tmp_path):
+    telemetry = Telemetry(capacity=8)
+    for i in range(4):
+        telemetry.record_episode("abyss", "tux", [i, 100, 0, 1, 0, 0, 0])
+    telemetry.record_episode("xr591", "tux", [10, 50, 0, 2, 0, 0, 0])
+    telemetry.record_reset("abyss", 0.5)
+    telemetry.increment("worker_crashes")
+
+    snapshot = telemetry.snapshot()
+    assert snapshot["tracks"]["abyss"]["return"]["mean"] == 1.5
+    assert snapshot["karts"]["tux"]["length"]["count"] == 5
+
+    telemetry.export(str(tmp_path / "telemetry.json"))
+    with open(tmp_path / "telemetry.json", encoding="utf-8") as file:
+        assert json.load(file)["reset_latency"]["abyss"]["count"] == 1
+    telemetry.export(str(tmp_path / "telemetry.prom"), fmt="prometheus")
+    metrics = (tmp_path / "telemetry.prom").read_text(encoding="utf-8")
+    assert 'pystk_gym_episode_return_mean{track="abyss"} 1.5' in metrics
+    assert "pystk_gym_worker_crashes_total 1.0" in metrics